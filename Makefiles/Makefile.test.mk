@@ -40,7 +40,10 @@ comptests_packages=\
 	easy_logs_tests\
 	easy_algo_tests\
 	duckietown_utils_tests\
+	line_detector_tests\
 	line_detector2_tests\
+	ground_projection_tests\
+	lane_filter_tests\
 	what_the_duck_tests\
 	easy_regression_tests\
 	anti_instagram_tests\
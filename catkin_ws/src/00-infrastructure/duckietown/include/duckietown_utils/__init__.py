@@ -43,6 +43,7 @@ from .file_utils import *
 from .friendly_path_imp import *
 from .fuzzy import *
 from .image_composition import *
+from .image_cache import *
 from .image_conversions import *
 from .image_jpg_create import *
 from .image_rescaling import *
@@ -61,7 +62,10 @@ from .networking import *
 from .parameters import *
 from .path_utils import *
 from .read_package_xml import *
+from .rectification import *
+from .rosbag_header import *
 from .safe_pickling import *
+from .segments_array import *
 from .system_cmd_imp import *
 from .test_hash import *
 from .text_utils import *
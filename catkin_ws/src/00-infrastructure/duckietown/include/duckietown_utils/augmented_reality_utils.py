@@ -4,6 +4,7 @@ from os.path import basename, expanduser, isfile, join, splitext
 from sys import exit
 
 from duckietown_utils import logger, get_duckiefleet_root
+from .rectification import rectify_with_cache
 from .yaml_pretty import yaml_load
 
 
@@ -111,11 +112,9 @@ def load_camera_intrinsics(veh):
     logger.info('Loaded camera intrinsics for {}'.format(veh))
     return intrinsics
 
-def rectify(image, intrinsics):
-    '''Undistort image'''
-    height, width, channels = image.shape
-    rectified_image = np.zeros(np.shape(image))
-    mapx = np.ndarray(shape=(height, width, 1), dtype='float32')
-    mapy = np.ndarray(shape=(height, width, 1), dtype='float32')
-    mapx, mapy = cv2.initUndistortRectifyMap(intrinsics['K'], intrinsics['D'], intrinsics['R'], intrinsics['P'], (width, height), cv2.CV_32FC1, mapx, mapy)
-    return cv2.remap(image, mapx, mapy, cv2.INTER_CUBIC, rectified_image)
+def rectify(image, intrinsics, dst=None):
+    '''Undistort image (the rectification maps are cached).
+    
+    If dst is given, it is used as the output buffer.'''
+    return rectify_with_cache(image, intrinsics['K'], intrinsics['D'], 
+                              intrinsics['R'], intrinsics['P'], dst=dst)
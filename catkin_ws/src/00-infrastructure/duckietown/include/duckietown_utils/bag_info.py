@@ -1,20 +1,195 @@
+from collections import OrderedDict
+import cPickle as pickle  # @UnresolvedImport
 import os
+import struct
 import subprocess
+import threading
 
-from .caching import get_cached
+from .path_utils import expand_all
+from .rosbag_header import BagFormatNotSupported, rosbag_info_native
+from .logging_logger import logger
+from .safe_pickling import safe_pickle_dump
 from .yaml_pretty import yaml_load
 
 
-__all__ = ['rosbag_info', 'rosbag_info_cached']
+__all__ = ['rosbag_info', 'rosbag_info_cached', 'rosbag_info_cached_many']
+
+ROSBAG_INFO_INDEX = '${DUCKIETOWN_ROOT}/caches/rosbag_info_index.pickle'
+
+# the index file is compacted when it has more records than this
+INDEX_MAX_RECORDS = 50
+
 
 def rosbag_info_cached(filename):
-    def f():
-        return rosbag_info(filename)
-    basename = os.path.basename(filename)
-    cache_name = 'rosbag_info/' + basename
-    return get_cached(cache_name, f, quiet=True)
+    """ Returns rosbag_info(filename), using the persistent index. """
+    return rosbag_info_cached_many([filename])[filename]
+
+def rosbag_info_cached_many(filenames, processes=None):
+    """
+        Returns an OrderedDict filename -> rosbag_info(filename).
+        
+        Only the bags that are not in the index, or that changed since
+        they were indexed, are read, using a pool of processes
+        (by default, one for each CPU).
+    """
+    return _get_index().get_many(filenames, processes=processes)
+
+
+class RosbagInfoIndex():
+    """
+        Persistent index of the output of rosbag_info(), as a dict 
+        realpath -> ((size, mtime), info).
+        
+        It is stored in a single file, as a sequence of pickled dicts
+        (records): the new entries are appended as a new record, and the
+        later records override the earlier ones. When there are more
+        than INDEX_MAX_RECORDS records, the file is rewritten with one.
+        
+        Only the bags that could be read are stored, so that the others
+        are tried again the next time.
+    """
+    
+    def __init__(self, filename):
+        self.filename = filename
+        self.entries = None
+        self.num_records = 0
+        self.lock = threading.Lock()
+    
+    def get_many(self, filenames, processes=None):
+        with self.lock:
+            if self.entries is None:
+                self.entries = self._read()
+                
+            paths = OrderedDict()
+            todo = OrderedDict()
+            for filename in filenames:
+                path = os.path.realpath(filename)
+                paths[filename] = path
+                st = os.stat(path)
+                stamp = (st.st_size, st.st_mtime)
+                entry = self.entries.get(path, None)
+                if entry is None or entry[0] != stamp:
+                    todo[path] = stamp
+            
+            # path -> info, for the bags read now
+            path2info = {}
+            if todo:
+                if len(todo) > 1:
+                    logger.info('Indexing %d new or changed bags.' % len(todo))
+                infos = _map(_rosbag_info_or_none, list(todo), processes)
+                new_entries = {}
+                for (path, stamp), info in zip(todo.items(), infos):
+                    path2info[path] = info
+                    if info is not None:
+                        new_entries[path] = (stamp, info)
+                if new_entries:
+                    self._write(new_entries)
+            
+            def get_info(path):
+                if path in path2info:
+                    return path2info[path]
+                return self.entries[path][1]
+            
+            return OrderedDict((filename, get_info(path)) 
+                               for filename, path in paths.items())
+    
+    def _read(self):
+        """ Reads all the records in the file. """
+        entries = {}
+        self.num_records = 0
+        if not os.path.exists(self.filename):
+            return entries
+        try:
+            with open(self.filename, 'rb') as f:
+                while True:
+                    try:
+                        record = pickle.load(f)
+                    except EOFError:
+                        break
+                    entries.update(record)
+                    self.num_records += 1
+        except Exception as e:
+            # for example, a record that another process is still appending
+            msg = 'Ignoring the rest of the index %s: %s' % (self.filename, e)
+            logger.error(msg)
+        return entries
+    
+    def _write(self, new_entries):
+        """ Appends the new entries to the file. """
+        self.entries.update(new_entries)
+        dirname = os.path.dirname(self.filename)
+        if dirname and not os.path.exists(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:  # created by another process
+                pass
+        data = pickle.dumps(new_entries, pickle.HIGHEST_PROTOCOL)
+        # with O_APPEND, the records of concurrent writers are not mixed
+        fd = os.open(self.filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        self.num_records += 1
+        if self.num_records > INDEX_MAX_RECORDS:
+            self._compact()
+    
+    def _compact(self):
+        """ Rewrites the file with a single record. """
+        # merge with what other processes might have appended
+        entries = self._read()
+        entries.update(self.entries)
+        self.entries = entries
+        safe_pickle_dump(entries, self.filename)
+        self.num_records = 1
+
+
+_index = None
+
+def _get_index():
+    global _index
+    if _index is None:
+        _index = RosbagInfoIndex(expand_all(ROSBAG_INFO_INDEX))
+    return _index
+
+def _map(f, args, processes):
+    if processes == 1 or len(args) == 1:
+        return list(map(f, args))
+    import multiprocessing
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(f, args, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+def _rosbag_info_or_none(bag):
+    """ Returns rosbag_info(bag), or None if it failed. """
+    try:
+        return rosbag_info(bag)
+    except Exception as e:
+        # for example, the rosbag command is not available
+        logger.error('Could not read info of %s: %s' % (bag, e))
+        return None
+
+def rosbag_info(bag):
+    """
+        Returns the summary of the bag, as a dictionary with the same
+        structure as the output of "rosbag info --yaml", or None if the
+        file cannot be read.
+        
+        Bags in format 2.0 are read directly (see rosbag_info_native);
+        for the others, the rosbag command is used.
+    """
+    try:
+        return rosbag_info_native(bag)
+    except BagFormatNotSupported:
+        return rosbag_info_cli(bag)
+    except (ValueError, KeyError, IOError, struct.error) as e:
+        logger.warning('Cannot read bag %s: %s' % (bag, e))
+        return None
 
-def rosbag_info(bag): 
+def rosbag_info_cli(bag): 
     stdout = subprocess.Popen(['rosbag', 'info', '--yaml', bag],
                               stdout=subprocess.PIPE).communicate()[0]
 #     try:
@@ -1,3 +1,4 @@
+from collections import OrderedDict
 import os
 
 from duckietown_utils.bag_info import get_image_topic
@@ -19,8 +20,12 @@ def d8n_read_images_interval(filename, t0, t1):
         in the interval [t0, t1], where t0 = 0 indicates
         the first image.
 
+        The images are decoded only the first time; then they are
+        read from the image cache (see d8n_read_images_cached).
     """
-    data = d8n_read_all_images(filename, t0, t1)
+    from .image_cache import d8n_read_images_cached
+    # copy-on-write, because the timestamps are modified
+    data = d8n_read_images_cached(filename, t0=t0, t1=t1, mmap_mode='c')
     logger.info('Read %d images from %s.' % (len(data), filename))
     timestamps = data['timestamp']
     # normalize timestamps
@@ -49,66 +54,105 @@ def d8n_read_all_images(filename, t0=None, t1=None):
     bag = rosbag.Bag(filename)
     topic = get_image_topic(bag)
     bag_proxy = BagReadProxy(bag, t0, t1)
-    # FIXME: this is wrong
-    res = d8n_read_all_images_from_bag(bag_proxy, topic, t0=t0,t1=t1)
+    try:
+        res = d8n_read_all_images_from_bag(bag_proxy, topic)
+    finally:
+        bag.close()
     return res
 
-def d8n_read_all_images_from_bag(bag, topic0, max_images=None):
-    import numpy as np
+def d8n_read_all_images_from_bag(bag, topic0, max_images=None, min_interval=None):
+    """
+        Returns a structured array with fields timestamp and rgb
+        with the images in the topic. See d8n_read_images_from_bag_topics().
+    """
+    res = d8n_read_images_from_bag_topics(bag, [topic0], max_images=max_images,
+                                          min_interval=min_interval)
+    return res[topic0]
 
-    nfound = bag.get_message_count(topic_filters=topic0)
-    logger.info('Found %d images for %s' % (nfound, topic0))    
-    logger.debug('max_images = %d ' % (max_images))    
+def d8n_read_images_from_bag_topics(bag, topics, max_images=None, min_interval=None,
+                                    allocate=None):
+    """
+        Reads the images of several topics in one pass over the bag.
+
+        Only the messages in the given topics are read, and the images 
+        are decimated before they are decoded:
+        
+            max_images: keeps at most this number of images per topic,
+                        equally spaced in the sequence
+            min_interval: keeps an image only if at least these many
+                          seconds passed since the last one kept
         
-    data = []
-    first_timestamp = None
-
-    if max_images is None:
-        interval = None
-    else:
-        interval = int(np.ceil(nfound / max_images))
-        if interval == 0:
-            interval = 1
-        logger.info('Read %s images; interval = %d' % (nfound, interval))
-           
-    for j, (topic, msg, t) in enumerate(bag.read_messages()):
-        if topic == topic0:
-            float_time = t.to_sec()
-            if first_timestamp is None:
-                first_timestamp = float_time
-            
-            if interval is not None:
-                add = (j % interval == 0)
-                if not add:
-                    continue
-                
-            rgb = numpy_from_ros_compressed(msg)
-
-            data.append({'timestamp': float_time, 'rgb': rgb})
-
-            if j % 10 == 0:
-                logger.debug('Read %d images from topic %s' % (j, topic))
-
-    logger.info('Returned %d images' % len(data))
-    if not data:
-        raise ValueError('no data found')
-
-    H, W, _ = rgb.shape  # (480, 640, 3)
-    logger.info('Detected image shape: %s x %s' % (W, H))
-    n = len(data)
-    
-    dtype = [
-        ('timestamp', 'float'),
-        ('rgb', 'uint8', (H, W, 3)),
-    ]
-
-    x = np.zeros((n,), dtype=dtype)
-    logger.info('dtype = %s' % x.dtype)
-
-    for i, v in enumerate(data):
-#         print(i, v['rgb'].shape)
-        x[i]['timestamp'] = v['timestamp']
-        x[i]['rgb'][:] = v['rgb']
-
-    logger.info('dtype = %s, shape=%s' % (x.dtype, x.shape))
-    return x
+        The images are written into a structured array for each topic,
+        allocated when the first image is decoded by calling
+        allocate(n, dtype) (default: numpy.zeros).
+        
+        Returns an OrderedDict topic -> array with fields timestamp and rgb.
+        Raises ValueError if a topic has no images.
+    """
+    import numpy as np
+    if allocate is None:
+        allocate = lambda n, dtype: np.zeros((n,), dtype=dtype)
+
+    # topic -> keep one every these many messages
+    interval = {}
+    # topic -> upper bound to the number of images kept
+    nkeep = {}
+    for topic in topics:
+        nfound = bag.get_message_count(topic_filters=topic)
+        logger.info('Found %d images for %s' % (nfound, topic))
+        if max_images is None:
+            interval[topic] = 1
+        else:
+            interval[topic] = max(1, int(np.ceil(float(nfound) / max_images)))
+            logger.info('Read %s images; interval = %d' % (nfound, interval[topic]))
+        nkeep[topic] = int(np.ceil(float(nfound) / interval[topic]))
+
+    # number of messages seen, number of images kept, time of the last one
+    nseen = dict((topic, 0) for topic in topics)
+    nread = dict((topic, 0) for topic in topics)
+    last_kept = {}
+    arrays = {}
+    for topic, msg, t in bag.read_messages(topics=topics):
+        j = nseen[topic]
+        nseen[topic] += 1
+        if j % interval[topic] != 0:
+            continue
+        float_time = t.to_sec()
+        if min_interval is not None and topic in last_kept:
+            if float_time - last_kept[topic] < min_interval:
+                continue
+        i = nread[topic]
+        if i >= nkeep[topic]:
+            # the bag has more messages than its index says
+            continue
+        
+        rgb = numpy_from_ros_compressed(msg)
+        
+        if not topic in arrays:
+            H, W, _ = rgb.shape  # (480, 640, 3)
+            logger.info('Detected image shape for %s: %s x %s' % (topic, W, H))
+            dtype = [
+                ('timestamp', 'float'),
+                ('rgb', 'uint8', (H, W, 3)),
+            ]
+            arrays[topic] = allocate(nkeep[topic], dtype)
+        x = arrays[topic]
+        if rgb.shape != x.dtype['rgb'].shape:
+            s = ('Image %d of %s has shape %s instead of %s.' % 
+                 (j, topic, rgb.shape, x.dtype['rgb'].shape))
+            raise ValueError(s)
+        x['timestamp'][i] = float_time
+        x['rgb'][i] = rgb
+        nread[topic] += 1
+        last_kept[topic] = float_time
+
+        if i % 10 == 0:
+            logger.debug('Read %d images from topic %s' % (i, topic))
+
+    res = OrderedDict()
+    for topic in topics:
+        logger.info('Returned %d images for %s' % (nread[topic], topic))
+        if not nread[topic]:
+            raise ValueError('no data found for %s' % topic)
+        res[topic] = arrays[topic][:nread[topic]]
+    return res
@@ -1,8 +1,6 @@
 from duckietown_utils import logger
 import time
 
-import numpy as np
-
 from .exceptions import DTBadData
 
 
@@ -29,10 +27,6 @@ class BagReadProxy():
         self.read_to_absolute = read_to
         self.bag = bag
         
-        seen = read_to -read_from
-        total = bag_absolute_t1 - bag_absolute_t0
-        self.fraction = seen / total
-        
     def get_type_and_topic_info(self):
         return self.bag.get_type_and_topic_info()
     
@@ -42,20 +36,55 @@ class BagReadProxy():
         return self.read_to_absolute 
             
     def get_message_count(self, topic_filters=None):
-        """ Returns approximate message count, compensating with ratio. """
-        n = self.bag.get_message_count(topic_filters)
-        n1 = int(np.ceil(self.fraction * n))
-        print('n = %s  fraction = %s  n1 = %s' % (n, self.fraction, n1) )
-        return n1 
+        """ 
+            Returns the number of messages in the interval. 
+        
+            The messages are counted using the index of the bag;
+            no message is read.
+        """
+        if isinstance(topic_filters, str):
+            topic_filters = [topic_filters]
+        start_time, end_time = self._get_interval()
+        connections = list(self.bag._get_connections(topic_filters))
+        n = 0
+        for entry in self.bag._get_entries(connections, start_time, end_time):
+            if self._in_interval(entry.time.to_sec()):
+                n += 1
+        return n
+    
+    def read_messages(self, topics=None, start_time=None, end_time=None, **kwargs):
+        """
+            Same as Bag.read_messages(), restricted to the interval.
+            
+            The interval is passed to the bag, which uses its index
+            to read only the chunks that overlap with it.
+        """
+        start, end = self._get_interval()
+        if start_time is not None:
+            start = max(start, start_time)
+        if end_time is not None:
+            end = min(end, end_time)
+        for topic, msg, _t in self.bag.read_messages(topics=topics, start_time=start,
+                                                     end_time=end, **kwargs):
+            if self._in_interval(_t.to_sec()):
+                yield topic, msg, _t
+    
+    def _get_interval(self):
+        """ 
+            Returns the interval as a pair of Time. 
+        
+            The conversion to Time truncates to the nanosecond, so
+            the interval is enlarged by a small amount; the messages
+            are then filtered with _in_interval(). 
+        """
+        from genpy import Time  # @UnresolvedImport
+        eps = 0.001
+        start_time = Time.from_sec(self.read_from_absolute - eps)
+        end_time = Time.from_sec(self.read_to_absolute + eps)
+        return start_time, end_time
     
-    def read_messages(self, *args, **kwargs):
-        for topic, msg, _t in self.bag.read_messages(*args,**kwargs):
-            t = _t.to_sec()
-            if t < self.read_from_absolute:
-                continue
-            if t > self.read_to_absolute:
-                break
-            yield topic, msg, _t
+    def _in_interval(self, t):
+        return self.read_from_absolute <= t <= self.read_to_absolute 
             
     def close(self):
         self.bag.close()
@@ -9,8 +9,15 @@ from .safe_pickling import safe_pickle_load, safe_pickle_dump
 
 __all__ = [
     'get_cached',
+    'get_cached_filename',
+    'evict_least_recently_used',
 ]
 
+def get_cached_filename(cache_name):
+    """ Returns the file used by get_cached() for cache_name. """
+    cache = '${DUCKIETOWN_ROOT}/caches/%s.cache.pickle' % cache_name
+    return expand_all(cache)
+
 def get_cached(cache_name, f, quiet='not-given'):
     """
         Caches the result of f() in a file called
@@ -18,8 +25,7 @@ def get_cached(cache_name, f, quiet='not-given'):
     """
 
 
-    cache = '${DUCKIETOWN_ROOT}/caches/%s.cache.pickle' % cache_name
-    cache = expand_all(cache)
+    cache = get_cached_filename(cache_name)
 
     if quiet == 'not-given':
         should_be_quiet = False
@@ -54,3 +60,39 @@ def get_cached(cache_name, f, quiet='not-given'):
 #
 #
     return ob
+
+
+def evict_least_recently_used(dirnames, max_size, keep=None):
+    """
+        Deletes the least recently used files in the directories 
+        (by modification time) until their total size is below max_size.
+
+        The file keep is never deleted. The files whose name contains 
+        ".tmp-" are being written, and are ignored.
+    """
+    entries = []
+    for d in dirnames:
+        if not os.path.exists(d):
+            continue
+        for basename in os.listdir(d):
+            if '.tmp-' in basename:
+                continue
+            fn = os.path.join(d, basename)
+            try:
+                st = os.stat(fn)
+            except OSError:  # deleted by another process
+                continue
+            entries.append((st.st_mtime, st.st_size, fn))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, fn in sorted(entries):
+        if total <= max_size:
+            break
+        if fn == keep:
+            continue
+        logger.info('Evicting cached %s' % friendly_path(fn))
+        try:
+            os.unlink(fn)
+        except OSError:
+            pass
+        total -= size
@@ -25,6 +25,9 @@ class DuckietownConstants():
     
     use_cache_for_algos =  False
     
+    # Cache the outputs of the processors and analyzers in easy_regression
+    use_cache_for_regression = True
+    
     enforce_no_tabs = True
     enforce_naming_conventions = True
     
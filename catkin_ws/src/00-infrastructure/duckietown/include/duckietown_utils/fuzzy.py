@@ -360,10 +360,15 @@ def parse_match_spec(s, filters=None):
     
     
 @contract(stuff=dict)
-def fuzzy_match(query, stuff, filters=None, raise_if_no_matches=False):
+def fuzzy_match(query, stuff, filters=None, raise_if_no_matches=False,
+                match_dict=None):
     """
         spec: a string
         logs: an OrderedDict str -> object
+
+        match_dict: optional function Spec -> OrderedDict that is used
+        instead of spec.match_dict(stuff), for collections that can
+        evaluate the query more efficiently (e.g. with an index).
     """
     if not isinstance(stuff, dict):
         msg = 'Expectd an OrderedDict, got %s.' % describe_type(stuff)
@@ -373,7 +378,10 @@ def fuzzy_match(query, stuff, filters=None, raise_if_no_matches=False):
     spec = parse_match_spec(query, filters=filters)
 #     print spec
     try:
-        result = spec.match_dict(stuff)
+        if match_dict is None:
+            result = spec.match_dict(stuff)
+        else:
+            result = match_dict(spec)
     except InvalidQueryForUniverse as e:
         msg = 'The query does not apply to this type of objects.'
         raise_wrapped(DTUserError, e, msg, compact=True)
@@ -0,0 +1,137 @@
+import hashlib
+import os
+
+from .bag_info import get_image_topic
+from .bag_logs import d8n_read_images_from_bag_topics
+from .bag_reading import BagReadProxy
+from .caching import evict_least_recently_used
+from .expand_variables import expand_environment
+from .friendly_path_imp import friendly_path
+from .logging_logger import logger
+from .mkdirs import d8n_mkdirs_thread_safe
+from .path_utils import expand_all
+
+__all__ = [
+    'd8n_read_images_cached',
+    'ImageSequenceCache',
+]
+
+IMAGE_CACHE_DIR = '${DUCKIETOWN_ROOT}/caches/images'
+IMAGE_CACHE_MAX_SIZE = 20 * 1024 ** 3
+
+
+def d8n_read_images_cached(filename, topic=None, t0=None, t1=None,
+                           max_images=None, mmap_mode='r'):
+    """
+        Same as d8n_read_all_images(), but the images are decoded only
+        the first time, and stored in the persistent image cache.
+
+        Returns a structured array with fields timestamp and rgb,
+        memory-mapped with the given mode: the default 'r' is read-only;
+        use 'c' (copy-on-write) to modify the array.
+    """
+    return _get_image_cache().get(filename, topic=topic, t0=t0, t1=t1,
+                                  max_images=max_images, mmap_mode=mmap_mode)
+
+
+class ImageSequenceCache():
+    """
+        Persistent cache of the images of the logs, as .npy files
+        containing the structured arrays returned by
+        d8n_read_images_from_bag_topics().
+
+        There is one file for each log, topic, interval and max_images;
+        the key also includes the size and modification time of the bag,
+        so that the file is created again if the bag changes.
+
+        When the total size of the files exceeds max_size, the least
+        recently used ones are deleted.
+    """
+
+    def __init__(self, dirname, max_size):
+        self.dirname = dirname
+        self.max_size = max_size
+
+    def get(self, filename, topic=None, t0=None, t1=None, max_images=None, mmap_mode='r'):
+        import numpy as np
+        filename = expand_environment(filename)
+        if not os.path.exists(filename):
+            msg = 'File does not exist: %r' % filename
+            raise ValueError(msg)
+
+        import rosbag  # @UnresolvedImport
+        # the bag is opened only if needed, as opening reads its index
+        bag = None
+        try:
+            if topic is None:
+                bag = rosbag.Bag(filename)
+                topic = get_image_topic(bag)
+            fn = self._get_filename(filename, topic, t0, t1, max_images)
+            if os.path.exists(fn):
+                logger.info('Using cached images %s' % friendly_path(fn))
+                # mark it as recently used
+                os.utime(fn, None)
+            else:
+                if bag is None:
+                    bag = rosbag.Bag(filename)
+                self._create(fn, bag, topic, t0, t1, max_images)
+        finally:
+            if bag is not None:
+                bag.close()
+
+        self._evict(keep=fn)
+        return np.load(fn, mmap_mode=mmap_mode)
+
+    def _get_filename(self, filename, topic, t0, t1, max_images):
+        path = os.path.realpath(filename)
+        st = os.stat(path)
+        key = (path, st.st_size, st.st_mtime, topic, t0, t1, max_images)
+        h = hashlib.sha1(str(key)).hexdigest()[:16]
+        log_name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.dirname, '%s-%s.npy' % (log_name, h))
+
+    def _create(self, fn, bag, topic, t0, t1, max_images):
+        import numpy as np
+        d8n_mkdirs_thread_safe(self.dirname)
+        # written with another name, then renamed, so that concurrent
+        # readers never see an incomplete file
+        tmp = '%s.tmp-%s' % (fn, os.getpid())
+
+        allocated = []
+        def allocate(n, dtype):
+            x = np.lib.format.open_memmap(tmp, mode='w+', dtype=dtype, shape=(n,))
+            allocated.append(x)
+            return x
+
+        logger.info('Decoding images to %s' % friendly_path(fn))
+        try:
+            bag_proxy = BagReadProxy(bag, t0, t1)
+            res = d8n_read_images_from_bag_topics(bag_proxy, [topic],
+                                                  max_images=max_images,
+                                                  allocate=allocate)
+            x = res[topic]
+            if len(x) == len(allocated[0]):
+                allocated[0].flush()
+            else:
+                # fewer images than the index said
+                x = np.array(x)
+                del res, allocated[:]
+                with open(tmp, 'wb') as f:
+                    np.save(f, x)
+            os.rename(tmp, fn)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def _evict(self, keep):
+        evict_least_recently_used([self.dirname], self.max_size, keep=keep)
+
+
+_image_cache = None
+
+def _get_image_cache():
+    global _image_cache
+    if _image_cache is None:
+        _image_cache = ImageSequenceCache(expand_all(IMAGE_CACHE_DIR),
+                                          IMAGE_CACHE_MAX_SIZE)
+    return _image_cache
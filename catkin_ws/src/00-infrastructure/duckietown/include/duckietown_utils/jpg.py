@@ -4,6 +4,7 @@
 
 
 import os
+import struct
 
 from PIL import ImageFile  # @UnresolvedImport
 
@@ -22,7 +23,7 @@ def image_cv_from_jpg(data):
     """ Returns an OpenCV BGR image from a string """
     import cv2
     import numpy as np
-    s = np.fromstring(data, np.uint8)
+    s = np.frombuffer(data, np.uint8)
     image_cv = cv2.imdecode(s, cv2.IMREAD_COLOR)
     if image_cv is None:
         msg = 'Could not decode image (cv2.imdecode returned None). '
@@ -31,6 +32,82 @@ def image_cv_from_jpg(data):
     return image_cv
 
 
+def image_cv_from_jpg_resized(data, shape=None, top_cutoff=0, dst=None):
+    """ 
+        Returns an OpenCV BGR image from a string, resized to 
+        shape = (H, W) and without the first top_cutoff rows.
+        
+        If the JPG is at least 2, 4 or 8 times larger than shape, 
+        the decoder itself reduces the image, which is much faster
+        than decoding at full resolution and then resizing.  
+        
+        If given, dst is a (H, W, 3) uint8 buffer reused for the resized 
+        image, when resizing is needed. 
+        
+        The result is a view of the resized image, not a copy.
+    """
+    import cv2
+    import numpy as np
+    s = np.frombuffer(data, np.uint8)
+    flags = cv2.IMREAD_COLOR
+    if shape is not None:
+        size = jpg_get_shape(data)
+        if size is not None:
+            flags = _reduced_decoding_flag(size, shape)
+    image_cv = cv2.imdecode(s, flags)
+    if image_cv is None:
+        msg = 'Could not decode image (cv2.imdecode returned None). '
+        msg += 'This is usual a sign of data corruption.'
+        raise ValueError(msg)
+    if shape is not None and image_cv.shape[:2] != tuple(shape):
+        H, W = shape
+        if dst is not None:
+            image_cv = cv2.resize(image_cv, (W, H), dst, interpolation=cv2.INTER_NEAREST)
+        else:
+            image_cv = cv2.resize(image_cv, (W, H), interpolation=cv2.INTER_NEAREST)
+    return image_cv[top_cutoff:,:,:]
+
+
+def _reduced_decoding_flag(size, shape):
+    """ Returns the imdecode flag for the largest reduction that 
+        still gives an image at least as large as shape. """
+    import cv2
+    H0, W0 = size
+    H, W = shape
+    for factor, name in [(8, 'IMREAD_REDUCED_COLOR_8'),
+                         (4, 'IMREAD_REDUCED_COLOR_4'),
+                         (2, 'IMREAD_REDUCED_COLOR_2')]:
+        # (not available in OpenCV 2)
+        if not hasattr(cv2, name):
+            continue
+        if H0 // factor >= H and W0 // factor >= W:
+            return getattr(cv2, name)
+    return cv2.IMREAD_COLOR
+
+
+def jpg_get_shape(data):
+    """ 
+        Returns the shape (H, W) of a JPG from its header, 
+        without decoding it, or None if the header cannot be parsed.
+    """
+    # start of frame markers (others in the range are DHT, JPG, DAC)
+    sof_markers = set(range(0xC0, 0xD0)) - set([0xC4, 0xC8, 0xCC])
+    try:
+        if struct.unpack_from('>H', data, 0)[0] != 0xFFD8:
+            return None
+        i = 2
+        while True:
+            marker0, marker, length = struct.unpack_from('>BBH', data, i)
+            if marker0 != 0xFF:
+                return None
+            if marker in sof_markers:
+                H, W = struct.unpack_from('>HH', data, i + 5)
+                return H, W
+            i += 2 + length
+    except struct.error:
+        return None
+
+
 def image_cv_from_jpg_fn(fn):
     """ Read a JPG from a file """
     if not os.path.exists(fn):
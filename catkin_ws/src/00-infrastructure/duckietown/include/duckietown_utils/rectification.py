@@ -0,0 +1,99 @@
+"""
+    Cache of the rectification maps used to undistort images.
+
+    cv2.initUndistortRectifyMap is much more expensive than the cv2.remap
+    that uses its result, so the maps are computed once for each camera
+    configuration (K, D, R, P, size) and reused for all the frames.
+"""
+from collections import OrderedDict
+import threading
+
+__all__ = [
+    'get_rectification_maps',
+    'rectify_with_cache',
+    'rectification_maps_cache_clear',
+]
+
+# How many camera configurations to keep in memory
+RECTIFICATION_MAPS_CACHE_SIZE = 8
+
+
+class RectificationMapsCache():
+    """ LRU cache of the maps, keyed by (K, D, R, P, size, m1type) """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.maps = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, K, D, R, P, size, m1type):
+        import numpy as np
+        import cv2
+        key = (tuple(np.array(K, 'float64').flatten()),
+               tuple(np.array(D, 'float64').flatten()),
+               tuple(np.array(R, 'float64').flatten()),
+               tuple(np.array(P, 'float64').flatten()),
+               tuple(size), m1type)
+        with self.lock:
+            if key in self.maps:
+                # mark as most recently used
+                maps = self.maps.pop(key)
+                self.maps[key] = maps
+                return maps
+
+        K, D, R, P = [np.array(_, 'float64') for _ in (K, D, R, P)]
+        maps = cv2.initUndistortRectifyMap(K, D, R, P, tuple(size), m1type)
+
+        with self.lock:
+            self.maps[key] = maps
+            while len(self.maps) > self.max_size:
+                self.maps.popitem(last=False)
+        return maps
+
+    def clear(self):
+        with self.lock:
+            self.maps.clear()
+
+
+_cache = RectificationMapsCache(RECTIFICATION_MAPS_CACHE_SIZE)
+
+
+def get_rectification_maps(K, D, R, P, size, m1type=None):
+    """
+        Returns the pair (map1, map2) computed by cv2.initUndistortRectifyMap,
+        computing it only the first time it is requested.
+
+        size = (width, height)
+
+        By default the maps are in the compact fixed-point format CV_16SC2,
+        which is also the fastest for cv2.remap; use m1type=cv2.CV_32FC1
+        if you need to read the coordinates.
+    """
+    import cv2
+    if m1type is None:
+        m1type = cv2.CV_16SC2
+    return _cache.get(K, D, R, P, size, m1type)
+
+
+def rectify_with_cache(image, K, D, R, P, size=None, interpolation=None, dst=None):
+    """
+        Undistorts the image using cached rectification maps.
+
+        size = (width, height) of the maps; by default the size of the image.
+
+        If dst is given, it is used as the output buffer, so that the
+        same memory can be reused for all the frames of a stream.
+    """
+    import cv2
+    if interpolation is None:
+        interpolation = cv2.INTER_CUBIC
+    if size is None:
+        size = (image.shape[1], image.shape[0])
+    map1, map2 = get_rectification_maps(K, D, R, P, size)
+    if dst is not None:
+        return cv2.remap(image, map1, map2, interpolation, dst)
+    return cv2.remap(image, map1, map2, interpolation)
+
+
+def rectification_maps_cache_clear():
+    _cache.clear()
@@ -0,0 +1,220 @@
+"""
+    Reads the summary of a ROS bag (format 2.0) directly from its index,
+    without the rosbag library.
+
+    The bag header record points to the index at the end of the file,
+    which contains one record for each connection (topic, type) and one
+    for each chunk (time range and number of messages per connection).
+    Only these records and the headers of the chunks are read, so the
+    cost is proportional to the size of the index, not of the bag.
+
+    See http://wiki.ros.org/Bags/Format/2.0
+"""
+from collections import OrderedDict
+import os
+import struct
+
+__all__ = [
+    'rosbag_info_native',
+    'BagFormatNotSupported',
+]
+
+BAG_MAGIC_PREFIX = b'#ROSBAG V'
+BAG_MAGIC_V20 = b'#ROSBAG V2.0\n'
+
+OP_CHUNK = 0x05
+OP_CONNECTION = 0x07
+OP_BAG_HEADER = 0x03
+OP_CHUNK_INFO = 0x06
+
+
+class BagFormatNotSupported(ValueError):
+    """ The file is a bag, but not in format 2.0. """
+
+
+def rosbag_info_native(filename):
+    """
+        Returns the same dictionary as the YAML output of
+        "rosbag info --yaml", that is, the fields
+
+            path, version, duration, start, end, size, messages, indexed,
+            compression, [uncompressed, compressed,] types, topics
+
+        or only path, version, unindexed for a bag without messages.
+
+        Raises ValueError if the file is not a valid bag, and
+        BagFormatNotSupported if it is a bag in another format.
+    """
+    with open(filename, 'rb') as f:
+        magic = f.read(len(BAG_MAGIC_V20))
+        if magic != BAG_MAGIC_V20:
+            if magic.startswith(BAG_MAGIC_PREFIX):
+                msg = 'Unsupported bag format %r' % magic.strip()
+                raise BagFormatNotSupported(msg)
+            raise ValueError('Not a bag file: %s' % filename)
+
+        header, _ = _read_record(f)
+        _check_op(header, OP_BAG_HEADER)
+        index_pos = _uint64(header['index_pos'])
+        conn_count = _uint32(header['conn_count'])
+        chunk_count = _uint32(header['chunk_count'])
+        if index_pos == 0:
+            raise ValueError('The bag is not indexed: %s' % filename)
+
+        f.seek(index_pos)
+        # conn id -> (topic, datatype, md5sum)
+        connections = OrderedDict()
+        for _ in range(conn_count):
+            header, data = _read_record(f)
+            _check_op(header, OP_CONNECTION)
+            conn_header = _read_fields(data)
+            conn = _uint32(header['conn'])
+            connections[conn] = (_str(header['topic']),
+                                 _str(conn_header['type']),
+                                 _str(conn_header['md5sum']))
+
+        # (chunk_pos, start, end, {conn: count})
+        chunks = []
+        for _ in range(chunk_count):
+            header, data = _read_record(f)
+            _check_op(header, OP_CHUNK_INFO)
+            count = _uint32(header['count'])
+            counts = {}
+            for i in range(count):
+                conn, n = struct.unpack_from('<II', data, 8 * i)
+                counts[conn] = n
+            chunks.append((_uint64(header['chunk_pos']),
+                           _time(header['start_time']),
+                           _time(header['end_time']),
+                           counts))
+
+        # compression -> [number of chunks, uncompressed, compressed]
+        compressions = OrderedDict()
+        for chunk_pos, _, _, _ in chunks:
+            f.seek(chunk_pos)
+            header, data_len = _read_record_header(f)
+            _check_op(header, OP_CHUNK)
+            compression = _str(header['compression'])
+            stats = compressions.setdefault(compression, [0, 0, 0])
+            stats[0] += 1
+            stats[1] += _uint32(header['size'])
+            stats[2] += data_len
+
+    info = OrderedDict()
+    info['path'] = filename
+    info['version'] = 2.0
+    if not chunks:
+        info['unindexed'] = True
+        return info
+
+    start = min(c[1] for c in chunks)
+    end = max(c[2] for c in chunks)
+    # same precision as the output of rosbag info
+    info['duration'] = round(end - start, 6)
+    info['start'] = round(start, 6)
+    info['end'] = round(end, 6)
+    info['size'] = os.stat(filename).st_size
+    info['messages'] = sum(sum(c[3].values()) for c in chunks)
+    info['indexed'] = True
+
+    main_compression = sorted(compressions.items(), key=lambda x: x[1][0])[-1][0]
+    info['compression'] = main_compression
+    if any(c != 'none' for c in compressions):
+        info['uncompressed'] = sum(s[1] for s in compressions.values())
+        info['compressed'] = sum(s[2] for s in compressions.values())
+
+    types = OrderedDict()
+    for _, datatype, md5sum in connections.values():
+        types.setdefault(datatype, md5sum)
+    info['types'] = [OrderedDict([('type', datatype), ('md5', md5sum)])
+                     for datatype, md5sum in sorted(types.items())]
+
+    topic_type = {}
+    topic_connections = {}
+    topic_messages = {}
+    for conn, (topic, datatype, _) in connections.items():
+        topic_type.setdefault(topic, datatype)
+        topic_connections[topic] = topic_connections.get(topic, 0) + 1
+        n = sum(c[3].get(conn, 0) for c in chunks)
+        topic_messages[topic] = topic_messages.get(topic, 0) + n
+
+    info['topics'] = []
+    for topic in sorted(topic_type):
+        t = OrderedDict()
+        t['topic'] = topic
+        t['type'] = topic_type[topic]
+        t['messages'] = topic_messages[topic]
+        if topic_connections[topic] > 1:
+            t['connections'] = topic_connections[topic]
+        info['topics'].append(t)
+    return info
+
+
+def _read_record_header(f):
+    """ Returns the header fields and the length of the data, skipping it. """
+    header = _read_fields(_read_sized(f))
+    data_len = _read_uint32(f)
+    return header, data_len
+
+
+def _read_record(f):
+    """ Returns the header fields and the data. """
+    header = _read_fields(_read_sized(f))
+    data = _read_sized(f)
+    return header, data
+
+
+def _read_sized(f):
+    n = _read_uint32(f)
+    data = f.read(n)
+    if len(data) != n:
+        raise ValueError('Truncated bag file.')
+    return data
+
+
+def _read_uint32(f):
+    data = f.read(4)
+    if len(data) != 4:
+        raise ValueError('Truncated bag file.')
+    return struct.unpack('<I', data)[0]
+
+
+def _read_fields(data):
+    """ Parses a sequence of "name=value" fields, each preceded by its length """
+    fields = {}
+    pos = 0
+    while pos < len(data):
+        n, = struct.unpack_from('<I', data, pos)
+        pos += 4
+        field = data[pos:pos + n]
+        pos += n
+        i = field.find(b'=')
+        if i == -1:
+            raise ValueError('Invalid header field %r' % field)
+        fields[_str(field[:i])] = field[i + 1:]
+    return fields
+
+
+def _check_op(header, op):
+    if 'op' not in header or struct.unpack('<B', header['op'])[0] != op:
+        msg = 'Expected a record with op 0x%02x, got header %r' % (op, header)
+        raise ValueError(msg)
+
+
+def _uint32(value):
+    return struct.unpack('<I', value)[0]
+
+
+def _uint64(value):
+    return struct.unpack('<Q', value)[0]
+
+
+def _time(value):
+    secs, nsecs = struct.unpack('<II', value)
+    return secs + nsecs * 1e-9
+
+
+def _str(value):
+    if str is bytes:  # Python 2
+        return value
+    return value.decode('utf-8')
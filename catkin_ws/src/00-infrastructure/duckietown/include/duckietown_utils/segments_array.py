@@ -0,0 +1,95 @@
+"""
+    Array-backed representation of the segments of a
+    duckietown_msgs/SegmentList.
+
+    SEGMENT_DTYPE is a packed structured dtype whose memory layout is exactly
+    the ROS serialization of duckietown_msgs/Segment:
+
+        uint8 color
+        Vector2D[2] pixels_normalized    (float32 x, y)
+        Vector2D normal                  (float32 x, y)
+        geometry_msgs/Point[2] points    (float64 x, y, z)
+
+    so that a whole list of segments is (de)serialized with a single copy
+    instead of creating one Python object per segment.
+"""
+import struct
+
+import numpy as np
+
+__all__ = [
+    'SEGMENT_DTYPE',
+    'segments_array_from_lines',
+    'segments_array_from_segments',
+    'segments_array_serialize',
+    'segments_array_deserialize',
+]
+
+SEGMENT_DTYPE = np.dtype([
+    ('color', '<u1'),
+    ('pixels_normalized', '<f4', (2, 2)),
+    ('normal', '<f4', (2,)),
+    ('points', '<f8', (2, 3)),
+])
+
+assert SEGMENT_DTYPE.itemsize == 1 + 4 * 4 + 4 * 2 + 8 * 6
+
+
+def segments_array_from_lines(lines, normals, color):
+    """
+        Creates the array for the lines found by a line detector.
+
+        lines: (N, 4) array of normalized pixel coordinates x1, y1, x2, y2
+        normals: (N, 2) array
+        color: one of Segment.WHITE, Segment.YELLOW, Segment.RED
+
+        The ground points are left at zero.
+    """
+    n = len(lines)
+    res = np.zeros((n,), SEGMENT_DTYPE)
+    if n > 0:
+        res['color'] = color
+        res['pixels_normalized'] = np.reshape(lines, (n, 2, 2))
+        res['normal'] = np.reshape(normals, (n, 2))
+    return res
+
+
+def segments_array_from_segments(segments):
+    """ Converts a list of Segment messages to an array. """
+    def as_tuple(s):
+        p0, p1 = s.pixels_normalized
+        q0, q1 = s.points
+        return (s.color,
+                ((p0.x, p0.y), (p1.x, p1.y)),
+                (s.normal.x, s.normal.y),
+                ((q0.x, q0.y, q0.z), (q1.x, q1.y, q1.z)))
+    return np.array([as_tuple(s) for s in segments], SEGMENT_DTYPE)
+
+
+def segments_array_serialize(array, buff):
+    """
+        Writes the array to the file-like buff, in the format
+        of the Segment[] field of a serialized SegmentList.
+    """
+    array = np.ascontiguousarray(array, SEGMENT_DTYPE)
+    buff.write(struct.pack('<I', len(array)))
+    buff.write(array.tobytes())
+
+
+def segments_array_deserialize(data, offset=0):
+    """
+        Reads a Segment[] field that starts at the given offset of the
+        serialized message data.
+
+        Returns the tuple (array, end), where end is the offset
+        of the first byte after the field.
+    """
+    n, = struct.unpack_from('<I', data, offset)
+    start = offset + 4
+    end = start + n * SEGMENT_DTYPE.itemsize
+    if len(data) < end:
+        msg = 'Expected %d segments but the buffer is too short (%d < %d).'
+        raise ValueError(msg % (n, len(data), end))
+    # copy, so that the array is writable and does not keep the buffer alive
+    array = np.frombuffer(data, SEGMENT_DTYPE, count=n, offset=start).copy()
+    return array, end
@@ -6,6 +6,14 @@ def jobs_comptests(context):
  
     from . import colors
     from . import fuzzy_match_test
+    from . import segments_array_test
+    from . import bag_index_test
+    from . import rosbag_header_test
+    from . import bag_reading_test
+    from . import bag_logs_test
+    from . import image_cache_test
+    from . import jpg_test
+    from . import rectification_test
     
     from comptests.registrar import jobs_registrar_simple
     jobs_registrar_simple(context)
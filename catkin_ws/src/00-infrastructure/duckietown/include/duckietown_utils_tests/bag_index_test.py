@@ -0,0 +1,126 @@
+import os
+
+from comptests.registrar import comptest, run_module_tests
+
+from duckietown_utils import bag_info
+from duckietown_utils.bag_info import RosbagInfoIndex
+from duckietown_utils.disk_hierarchy import create_tmpdir
+
+
+@comptest
+def bag_index_incremental():
+    d = create_tmpdir()
+    bags = [os.path.join(d, 'bag%d.bag' % i) for i in range(3)]
+    for bag in bags:
+        with open(bag, 'w') as f:
+            f.write('x')
+
+    calls = []
+    def fake_rosbag_info(bag):
+        calls.append(bag)
+        return dict(size=os.stat(bag).st_size)
+
+    original = bag_info.rosbag_info
+    bag_info.rosbag_info = fake_rosbag_info
+    try:
+        index_file = os.path.join(d, 'index.pickle')
+        index = RosbagInfoIndex(index_file)
+        res = index.get_many(bags, processes=1)
+        assert list(res) == bags
+        assert len(calls) == 3
+
+        # nothing changed
+        index.get_many(bags, processes=1)
+        assert len(calls) == 3
+
+        # only the changed file is read again
+        with open(bags[1], 'w') as f:
+            f.write('longer')
+        res = index.get_many(bags, processes=1)
+        assert len(calls) == 4
+        assert res[bags[1]]['size'] == 6
+
+        # the index is persistent
+        index2 = RosbagInfoIndex(index_file)
+        res2 = index2.get_many(bags, processes=1)
+        assert len(calls) == 4
+        assert res2 == res
+    finally:
+        bag_info.rosbag_info = original
+
+
+@comptest
+def bag_index_failures_not_stored():
+    d = create_tmpdir()
+    bags = [os.path.join(d, 'bag%d.bag' % i) for i in range(2)]
+    for bag in bags:
+        with open(bag, 'w') as f:
+            f.write('x')
+
+    calls = []
+    failing = set([bags[1]])
+    def fake_rosbag_info(bag):
+        calls.append(bag)
+        if bag in failing:
+            raise OSError('rosbag: command not found')
+        return dict(size=os.stat(bag).st_size)
+
+    original = bag_info.rosbag_info
+    bag_info.rosbag_info = fake_rosbag_info
+    try:
+        index_file = os.path.join(d, 'index.pickle')
+        index = RosbagInfoIndex(index_file)
+        res = index.get_many(bags, processes=1)
+        assert res[bags[1]] is None
+        assert len(calls) == 2
+
+        # the failed one is tried again, also by the next process
+        failing.clear()
+        index2 = RosbagInfoIndex(index_file)
+        res = index2.get_many(bags, processes=1)
+        assert len(calls) == 3
+        assert res[bags[1]] == dict(size=1)
+        # only the new entry was appended
+        assert index2.num_records == 2
+
+        index3 = RosbagInfoIndex(index_file)
+        res3 = index3.get_many(bags, processes=1)
+        assert len(calls) == 3
+        assert res3 == res
+    finally:
+        bag_info.rosbag_info = original
+
+
+@comptest
+def bag_index_compaction():
+    d = create_tmpdir()
+    calls = []
+    def fake_rosbag_info(bag):
+        calls.append(bag)
+        return dict(name=os.path.basename(bag))
+
+    original = bag_info.rosbag_info
+    bag_info.rosbag_info = fake_rosbag_info
+    try:
+        index_file = os.path.join(d, 'index.pickle')
+        index = RosbagInfoIndex(index_file)
+        bags = []
+        for i in range(bag_info.INDEX_MAX_RECORDS + 5):
+            bag = os.path.join(d, 'bag%d.bag' % i)
+            with open(bag, 'w') as f:
+                f.write('x')
+            bags.append(bag)
+            # one record for each
+            index.get_many([bag], processes=1)
+        assert index.num_records <= bag_info.INDEX_MAX_RECORDS
+
+        index2 = RosbagInfoIndex(index_file)
+        res = index2.get_many(bags, processes=1)
+        assert len(calls) == len(bags)
+        assert [_['name'] for _ in res.values()] == [os.path.basename(_) for _ in bags]
+    finally:
+        bag_info.rosbag_info = original
+
+
+if __name__ == '__main__':
+    run_module_tests()
@@ -0,0 +1,58 @@
+import os
+
+from comptests.registrar import comptest, run_module_tests
+
+from duckietown_utils.bag_logs import d8n_read_images_from_bag_topics
+from duckietown_utils.disk_hierarchy import create_tmpdir
+import numpy as np
+
+
+def write_images_bag(filename, topics, n):
+    """ Writes n images per topic, one every 0.1 s; image i has value i. """
+    import cv2
+    import rosbag  # @UnresolvedImport
+    from genpy import Time  # @UnresolvedImport
+    from sensor_msgs.msg import CompressedImage  # @UnresolvedImport
+    bag = rosbag.Bag(filename, 'w')
+    try:
+        for i in range(n):
+            t = Time.from_sec(1500000000 + i * 0.1)
+            for topic in topics:
+                msg = CompressedImage()
+                msg.format = 'jpeg'
+                image = np.full((24, 32, 3), i, dtype='uint8')
+                msg.data = cv2.imencode('.jpg', image)[1].tostring()
+                bag.write(topic, msg, t)
+            bag.write('/other', msg, t)
+    finally:
+        bag.close()
+
+
+@comptest
+def read_images_decimated():
+    import rosbag  # @UnresolvedImport
+    d = create_tmpdir()
+    fn = os.path.join(d, 'images.bag')
+    topics = ['/a/image/compressed', '/b/image/compressed']
+    write_images_bag(fn, topics, 50)
+
+    bag = rosbag.Bag(fn)
+    res = d8n_read_images_from_bag_topics(bag, topics, max_images=7)
+    assert list(res) == topics
+    for topic in topics:
+        x = res[topic]
+        # one every 8 images
+        assert len(x) == 7, len(x)
+        assert x['rgb'].shape == (7, 24, 32, 3)
+        values = [int(np.round(np.mean(_))) for _ in x['rgb']]
+        assert values == list(range(0, 50, 8)), values
+
+    res = d8n_read_images_from_bag_topics(bag, topics[:1], min_interval=0.95)
+    x = res[topics[0]]
+    assert len(x) == 5, len(x)
+    assert np.all(np.diff(x['timestamp']) > 0.95)
+    bag.close()
+
+
+if __name__ == '__main__':
+    run_module_tests()
@@ -0,0 +1,49 @@
+import os
+
+from comptests.registrar import comptest, run_module_tests
+
+from duckietown_utils.bag_reading import BagReadProxy
+from duckietown_utils.disk_hierarchy import create_tmpdir
+
+
+def write_test_bag(filename, n=100):
+    """ Writes a bag with a message per second on /a and one every 2 s on /b. """
+    import rosbag  # @UnresolvedImport
+    from genpy import Time  # @UnresolvedImport
+    from std_msgs.msg import Int32  # @UnresolvedImport
+    t0 = 1500000000
+    bag = rosbag.Bag(filename, 'w', chunk_threshold=1024)
+    try:
+        for i in range(n):
+            bag.write('/a', Int32(i), Time(t0 + i))
+            if i % 2 == 0:
+                bag.write('/b', Int32(i), Time(t0 + i))
+    finally:
+        bag.close()
+
+
+@comptest
+def bag_read_proxy_interval():
+    import rosbag  # @UnresolvedImport
+    d = create_tmpdir()
+    fn = os.path.join(d, 'test.bag')
+    write_test_bag(fn)
+
+    bag = rosbag.Bag(fn)
+    proxy = BagReadProxy(bag, 10, 20)
+    assert proxy.get_message_count() == 11 + 6
+    assert proxy.get_message_count('/a') == 11
+    assert proxy.get_message_count(['/b']) == 6
+
+    values = [msg.data for _, msg, _ in proxy.read_messages(topics=['/a'])]
+    assert values == list(range(10, 21)), values
+    topics = [topic for topic, _, _ in proxy.read_messages()]
+    assert len(topics) == 17
+
+    proxy = BagReadProxy(bag, 95, None)
+    assert proxy.get_message_count() == 5 + 2
+    proxy.close()
+
+
+if __name__ == '__main__':
+    run_module_tests()
@@ -0,0 +1,83 @@
+import os
+
+from comptests.registrar import comptest, run_module_tests
+
+from duckietown_utils import image_cache
+from duckietown_utils.disk_hierarchy import create_tmpdir
+from duckietown_utils.image_cache import ImageSequenceCache
+from duckietown_utils_tests.bag_logs_test import write_images_bag
+import numpy as np
+
+
+@comptest
+def image_cache_decodes_once():
+    d = create_tmpdir()
+    topic = '/a/image/compressed'
+    bags = []
+    for i in range(3):
+        fn = os.path.join(d, 'log%d.bag' % i)
+        write_images_bag(fn, [topic], 20)
+        bags.append(fn)
+
+    calls = []
+    original = image_cache.d8n_read_images_from_bag_topics
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+    image_cache.d8n_read_images_from_bag_topics = counting
+    try:
+        size = 20 * 24 * 32 * 3
+        cache = ImageSequenceCache(os.path.join(d, 'cache'), max_size=2.5 * size)
+        x = cache.get(bags[0], topic)
+        assert isinstance(x, np.memmap)
+        assert x.shape == (20,) and x['rgb'].shape == (20, 24, 32, 3)
+        y = cache.get(bags[0], topic)
+        assert len(calls) == 1
+        assert np.all(x == y)
+
+        # another slice is another entry
+        z = cache.get(bags[0], topic, t0=1.0, t1=1.5)
+        assert len(z) == 6, len(z)
+        assert len(calls) == 2
+
+        # the least recently used are evicted
+        cache.get(bags[1], topic)
+        cache.get(bags[2], topic)
+        cache.get(bags[0], topic)
+        assert len(calls) == 5, len(calls)
+        files = [_ for _ in os.listdir(cache.dirname) if _.endswith('.npy')]
+        assert sorted(_.split('-')[0] for _ in files) == ['log0', 'log2'], files
+    finally:
+        image_cache.d8n_read_images_from_bag_topics = original
+
+
+@comptest
+def image_cache_hit_does_not_open_bag():
+    import rosbag  # @UnresolvedImport
+    d = create_tmpdir()
+    topic = '/robot/camera_node/image/compressed'
+    fn = os.path.join(d, 'log.bag')
+    write_images_bag(fn, [topic], 5)
+    cache = ImageSequenceCache(os.path.join(d, 'cache'), max_size=10 ** 8)
+    x = cache.get(fn, topic)
+
+    opened = []
+    original = rosbag.Bag
+    def counting(*args, **kwargs):
+        opened.append(args)
+        return original(*args, **kwargs)
+    rosbag.Bag = counting
+    try:
+        y = cache.get(fn, topic)
+        assert not opened, opened
+        # the bag is needed to find the topic
+        z = cache.get(fn)
+        assert len(opened) == 1, opened
+    finally:
+        rosbag.Bag = original
+    assert np.all(x == y)
+    assert np.all(x == z)
+
+
+if __name__ == '__main__':
+    run_module_tests()
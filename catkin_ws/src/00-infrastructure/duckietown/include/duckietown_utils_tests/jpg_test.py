@@ -0,0 +1,86 @@
+from comptests.registrar import comptest, run_module_tests
+
+from duckietown_utils.jpg import (image_cv_from_jpg, image_cv_from_jpg_resized,
+                                  jpg_get_shape)
+import numpy as np
+
+
+def smooth_image(H, W):
+    """ A BGR image without high frequencies, so that decoding it at a
+        reduced resolution gives almost the same as resizing it. """
+    y, x = np.mgrid[0:H, 0:W]
+    image = np.zeros((H, W, 3), 'uint8')
+    image[:, :, 0] = 255 * x / (W - 1)
+    image[:, :, 1] = 255 * y / (H - 1)
+    image[:, :, 2] = 128
+    return image
+
+
+def encode(image, params=()):
+    import cv2
+    ok, data = cv2.imencode('.jpg', image, list(params))
+    assert ok
+    return data.tostring()
+
+
+def decode_resize_crop(data, shape, top_cutoff):
+    """ The reference: full decoding, then cv2.resize, then crop. """
+    import cv2
+    image_cv = image_cv_from_jpg(data)
+    H, W = shape
+    image_cv = cv2.resize(image_cv, (W, H), interpolation=cv2.INTER_NEAREST)
+    return image_cv[top_cutoff:, :, :]
+
+
+@comptest
+def jpg_shape_from_header():
+    import cv2
+    image = smooth_image(60, 80)
+    data = encode(image)
+    assert jpg_get_shape(data) == (60, 80), jpg_get_shape(data)
+    assert jpg_get_shape(data) == image_cv_from_jpg(data).shape[:2]
+
+    if hasattr(cv2, 'IMWRITE_JPEG_PROGRESSIVE'):
+        # a different start of frame marker
+        data = encode(image, [cv2.IMWRITE_JPEG_PROGRESSIVE, 1])
+        assert jpg_get_shape(data) == (60, 80), jpg_get_shape(data)
+
+    assert jpg_get_shape('not a jpg') is None
+    assert jpg_get_shape(data[:10]) is None
+
+
+@comptest
+def jpg_resized_same_as_resize_and_crop():
+    data = encode(smooth_image(60, 80))
+    # not a multiple: decoded at full resolution, then resized
+    shape, top_cutoff = (45, 50), 5
+    expected = decode_resize_crop(data, shape, top_cutoff)
+    res = image_cv_from_jpg_resized(data, shape, top_cutoff)
+    assert res.shape == expected.shape, (res.shape, expected.shape)
+    assert np.array_equal(res, expected)
+
+    dst = np.empty(shape + (3,), 'uint8')
+    res = image_cv_from_jpg_resized(data, shape, top_cutoff, dst=dst)
+    assert np.array_equal(res, expected)
+
+    # same shape: no resizing
+    res = image_cv_from_jpg_resized(data, (60, 80), 0)
+    assert np.array_equal(res, image_cv_from_jpg(data))
+
+
+@comptest
+def jpg_resized_reduced_decoding():
+    data = encode(smooth_image(64, 96))
+    # the decoder reduces the image by 2 and 4
+    for shape in [(32, 48), (16, 24), (15, 20)]:
+        top_cutoff = 4
+        expected = decode_resize_crop(data, shape, top_cutoff)
+        res = image_cv_from_jpg_resized(data, shape, top_cutoff)
+        assert res.shape == expected.shape, (shape, res.shape, expected.shape)
+        diff = np.abs(res.astype('int') - expected.astype('int'))
+        # the decoder averages the pixels instead of picking one
+        assert diff.mean() < 6, (shape, diff.mean())
+
+
+if __name__ == '__main__':
+    run_module_tests()
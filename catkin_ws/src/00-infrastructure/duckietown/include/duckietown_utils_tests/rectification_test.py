@@ -0,0 +1,87 @@
+from comptests.registrar import comptest, run_module_tests
+
+from duckietown_utils.rectification import (RectificationMapsCache,
+    rectification_maps_cache_clear, rectify_with_cache)
+import numpy as np
+
+
+# the default calibration in duckietown/config/baseline/calibration
+# (camera_intrinsic), scaled to 160x120
+SIZE = (160, 120)
+K = np.array([[76.93, 0, 82.42],
+              [0, 78.75, 61.12],
+              [0, 0, 1]])
+D = np.array([-0.2566, 0.0448, -0.0051, 0.0013, 0])
+R = np.eye(3)
+P = np.array([[52.53, 0, 81.81, 0],
+              [0, 63.46, 60.0, 0],
+              [0, 0, 1, 0]])
+
+
+@comptest
+def rectification_maps_cache_lru():
+    import cv2
+    cache = RectificationMapsCache(max_size=2)
+    m1type = cv2.CV_16SC2
+    a = cache.get(K, D, R, P, SIZE, m1type)
+    # same key, also as lists: the same maps
+    assert cache.get(K.tolist(), D.tolist(), R, P, SIZE, m1type) is a
+
+    # any change in the key gives other maps
+    D2 = D * 0.5
+    b = cache.get(K, D2, R, P, SIZE, m1type)
+    assert b is not a
+    assert not np.array_equal(a[0], b[0])
+    c = cache.get(K, D, R, P, SIZE, cv2.CV_32FC1)
+    assert c[0].dtype == np.float32
+
+    # there is space for 2: a, the least recently used, was evicted
+    assert len(cache.maps) == 2
+    assert cache.get(K, D, R, P, SIZE, m1type) is not a
+    cache.clear()
+    assert len(cache.maps) == 0
+
+    cache = RectificationMapsCache(max_size=2)
+    a = cache.get(K, D, R, P, SIZE, m1type)
+    b = cache.get(K, D2, R, P, SIZE, m1type)
+    # a is now the most recently used
+    assert cache.get(K, D, R, P, SIZE, m1type) is a
+    cache.get(K, D, R, P, (80, 60), m1type)
+    assert cache.get(K, D, R, P, SIZE, m1type) is a
+    assert cache.get(K, D2, R, P, SIZE, m1type) is not b
+
+
+def smooth_image(H, W):
+    y, x = np.mgrid[0:H, 0:W]
+    image = np.zeros((H, W, 3), 'uint8')
+    image[:, :, 0] = 127 + 100 * np.sin(x / 7.0)
+    image[:, :, 1] = 127 + 100 * np.cos(y / 5.0)
+    image[:, :, 2] = 255 * (x + y) / (H + W)
+    return image
+
+
+@comptest
+def rectify_with_cache_same_as_remap():
+    import cv2
+    rectification_maps_cache_clear()
+    W, H = SIZE
+    image = smooth_image(H, W)
+    # the uncached path with floating point maps
+    map1, map2 = cv2.initUndistortRectifyMap(K, D, R, P, SIZE, cv2.CV_32FC1)
+    expected = cv2.remap(image, map1, map2, cv2.INTER_CUBIC)
+
+    res = rectify_with_cache(image, K, D, R, P)
+    assert res.shape == expected.shape
+    # the fixed point maps have a precision of 1/32 pixel
+    diff = np.abs(res.astype('int') - expected.astype('int'))
+    assert diff.mean() < 0.5, diff.mean()
+    assert diff.max() <= 10, diff.max()
+
+    dst = np.empty_like(image)
+    res2 = rectify_with_cache(image, K, D, R, P, dst=dst)
+    assert np.array_equal(res, res2)
+    assert np.array_equal(res, dst)
+
+
+if __name__ == '__main__':
+    run_module_tests()
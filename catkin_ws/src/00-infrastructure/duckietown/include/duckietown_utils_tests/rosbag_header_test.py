@@ -0,0 +1,156 @@
+import os
+import struct
+
+from comptests.registrar import comptest, run_module_tests
+
+from duckietown_utils.disk_hierarchy import create_tmpdir
+from duckietown_utils.rosbag_header import (BagFormatNotSupported,
+    rosbag_info_native)
+
+
+def fields(**kwargs):
+    s = b''
+    for k, v in sorted(kwargs.items()):
+        field = k.encode('utf-8') + b'=' + v
+        s += struct.pack('<I', len(field)) + field
+    return s
+
+
+def record(header, data):
+    return (struct.pack('<I', len(header)) + header +
+            struct.pack('<I', len(data)) + data)
+
+
+def op(x):
+    return struct.pack('<B', x)
+
+
+def time(t):
+    secs = int(t)
+    return struct.pack('<II', secs, int(round((t - secs) * 1e9)))
+
+
+def write_synthetic_bag(filename, connections, chunks, compression=b'none'):
+    """
+        Writes a bag in format 2.0 with the given index.
+
+        connections: list of (topic, type, md5sum)
+        chunks: list of (start, end, {conn: count})
+
+        The chunks do not contain actual messages: only the
+        index is read by rosbag_info_native().
+    """
+    magic = b'#ROSBAG V2.0\n'
+    bag_header_len = 4096
+
+    body = b''
+    chunk_positions = []
+    for _ in chunks:
+        chunk_positions.append(len(magic) + bag_header_len + len(body))
+        data = b'\0' * 100
+        header = fields(op=op(0x05), compression=compression,
+                        size=struct.pack('<I', 300))
+        body += record(header, data)
+
+    index = b''
+    for conn, (topic, datatype, md5sum) in enumerate(connections):
+        header = fields(op=op(0x07), conn=struct.pack('<I', conn),
+                        topic=topic.encode('utf-8'))
+        data = fields(topic=topic.encode('utf-8'), type=datatype.encode('utf-8'),
+                      md5sum=md5sum.encode('utf-8'), message_definition=b'')
+        index += record(header, data)
+    for chunk_pos, (start, end, counts) in zip(chunk_positions, chunks):
+        header = fields(op=op(0x06), ver=struct.pack('<I', 1),
+                        chunk_pos=struct.pack('<Q', chunk_pos),
+                        start_time=time(start), end_time=time(end),
+                        count=struct.pack('<I', len(counts)))
+        data = b''.join(struct.pack('<II', c, n) for c, n in sorted(counts.items()))
+        index += record(header, data)
+
+    index_pos = len(magic) + bag_header_len + len(body)
+    header = fields(op=op(0x03), index_pos=struct.pack('<Q', index_pos),
+                    conn_count=struct.pack('<I', len(connections)),
+                    chunk_count=struct.pack('<I', len(chunks)))
+    padding = bag_header_len - (4 + len(header) + 4)
+    bag_header = record(header, b' ' * padding)
+    assert len(bag_header) == bag_header_len
+
+    with open(filename, 'wb') as f:
+        f.write(magic + bag_header + body + index)
+
+
+@comptest
+def rosbag_header_synthetic():
+    d = create_tmpdir()
+    fn = os.path.join(d, 'synthetic.bag')
+    connections = [('/robot/camera_node/image/compressed', 'sensor_msgs/CompressedImage', 'aaa'),
+                   ('/robot/wheels_driver_node/wheels_cmd', 'duckietown_msgs/WheelsCmdStamped', 'bbb'),
+                   ('/robot/camera_node/image/compressed', 'sensor_msgs/CompressedImage', 'aaa')]
+    chunks = [(1500000000.25, 1500000010.5, {0: 10, 1: 3}),
+              (1500000010.5, 1500000020.75, {0: 5, 2: 7})]
+    write_synthetic_bag(fn, connections, chunks)
+
+    info = rosbag_info_native(fn)
+    assert info['version'] == 2.0
+    assert info['start'] == 1500000000.25, info['start']
+    assert info['end'] == 1500000020.75
+    assert info['duration'] == 20.5
+    assert info['messages'] == 25
+    assert info['size'] == os.stat(fn).st_size
+    assert info['compression'] == 'none'
+    assert 'uncompressed' not in info
+    assert [t['type'] for t in info['types']] == ['duckietown_msgs/WheelsCmdStamped',
+                                                 'sensor_msgs/CompressedImage']
+    topics = info['topics']
+    assert [t['topic'] for t in topics] == ['/robot/camera_node/image/compressed',
+                                            '/robot/wheels_driver_node/wheels_cmd']
+    assert topics[0]['messages'] == 22
+    assert topics[0]['connections'] == 2
+    assert topics[1]['messages'] == 3
+    assert 'connections' not in topics[1]
+
+
+@comptest
+def rosbag_header_compressed_and_empty():
+    d = create_tmpdir()
+    fn = os.path.join(d, 'compressed.bag')
+    write_synthetic_bag(fn, [('/a', 'std_msgs/String', 'c')],
+                        [(1500000000, 1500000001, {0: 1})], compression=b'bz2')
+    info = rosbag_info_native(fn)
+    assert info['compression'] == 'bz2'
+    assert info['uncompressed'] == 300
+    assert info['compressed'] == 100
+
+    fn = os.path.join(d, 'empty.bag')
+    write_synthetic_bag(fn, [], [])
+    info = rosbag_info_native(fn)
+    assert info['unindexed'] is True
+    assert 'duration' not in info
+
+
+@comptest
+def rosbag_header_invalid():
+    d = create_tmpdir()
+    fn = os.path.join(d, 'old.bag')
+    with open(fn, 'wb') as f:
+        f.write(b'#ROSBAG V1.2\n' + b'\0' * 100)
+    try:
+        rosbag_info_native(fn)
+    except BagFormatNotSupported:
+        pass
+    else:
+        raise Exception('Expected BagFormatNotSupported')
+
+    fn = os.path.join(d, 'not-a-bag.bag')
+    with open(fn, 'wb') as f:
+        f.write(b'hello')
+    try:
+        rosbag_info_native(fn)
+    except ValueError as e:
+        assert not isinstance(e, BagFormatNotSupported)
+    else:
+        raise Exception('Expected ValueError')
+
+
+if __name__ == '__main__':
+    run_module_tests()
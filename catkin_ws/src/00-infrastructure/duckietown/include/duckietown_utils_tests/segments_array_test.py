@@ -0,0 +1,58 @@
+from io import BytesIO
+import struct
+
+from comptests.registrar import comptest, run_module_tests
+
+from duckietown_utils.segments_array import (SEGMENT_DTYPE,
+    segments_array_deserialize, segments_array_from_lines,
+    segments_array_serialize)
+import numpy as np
+
+
+def serialize_segment(color, pixels, normal, points):
+    """ The ROS serialization of one duckietown_msgs/Segment """
+    return (struct.pack('<B', color) +
+            struct.pack('<4f', *np.array(pixels).flatten()) +
+            struct.pack('<2f', *normal) +
+            struct.pack('<6d', *np.array(points).flatten()))
+
+
+@comptest
+def segments_array_wire_format():
+    lines = np.array([[0.1, 0.2, 0.3, 0.4],
+                      [0.5, 0.6, 0.7, 0.8]])
+    normals = np.array([[1., 0.],
+                        [0., -1.]])
+    array = segments_array_from_lines(lines, normals, 1)
+    array['points'][1] = [[1., 2., 0.], [3., 4., 0.]]
+
+    buff = BytesIO()
+    segments_array_serialize(array, buff)
+    data = buff.getvalue()
+
+    expected = struct.pack('<I', 2)
+    expected += serialize_segment(1, lines[0], normals[0], np.zeros((2, 3)))
+    expected += serialize_segment(1, lines[1], normals[1], array['points'][1])
+    assert data == expected
+
+    # the field can be anywhere in the message
+    prefix = b'header'
+    array2, end = segments_array_deserialize(prefix + data + b'tail', len(prefix))
+    assert end == len(prefix) + len(data)
+    assert array2.dtype == SEGMENT_DTYPE
+    assert array2.tobytes() == array.tobytes()
+    array2['color'] = 0  # it is writable
+
+
+@comptest
+def segments_array_empty():
+    array = segments_array_from_lines(np.zeros((0, 4)), np.zeros((0, 2)), 0)
+    buff = BytesIO()
+    segments_array_serialize(array, buff)
+    assert buff.getvalue() == struct.pack('<I', 0)
+    array2, end = segments_array_deserialize(buff.getvalue())
+    assert len(array2) == 0 and end == 4
+
+
+if __name__ == '__main__':
+    run_module_tests()
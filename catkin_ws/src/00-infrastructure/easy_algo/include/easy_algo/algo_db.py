@@ -3,11 +3,12 @@ import os
 from types import NoneType
 
 from duckietown_utils import (DTConfigException,  DuckietownConstants, check_is_in,
-                              contract, dt_check_isinstance, fuzzy_match, get_cached,
-                              id_from_basename_pattern, import_name, instantiate,
-                              indent, interpret_yaml_file, look_everywhere_for_config_files,
-                              get_config_sources, look_everywhere_for_config_files2)
+                              contract, dt_check_isinstance, expand_all, fuzzy_match,
+                              get_cached, id_from_basename_pattern, import_name,
+                              instantiate, indent, interpret_yaml_file,
+                              get_config_sources)
 
+from .algo_index import ConfigFilesIndex
 from .algo_structures import EasyAlgoInstance, EasyAlgoFamily
 
 
@@ -16,6 +17,9 @@ __all__ = [
     'EasyAlgoDB',
 ]
 
+# Where the index of the configuration files is saved between runs
+EASY_ALGO_INDEX_CACHE = '${DUCKIETOWN_ROOT}/caches/easy_algo_index.pickle'
+
 
 def get_easy_algo_db():
     if EasyAlgoDB._singleton is None:
@@ -25,27 +29,59 @@ def get_easy_algo_db():
     return EasyAlgoDB._singleton
 
 class EasyAlgoDB():
+    """
+        The families and instances are read and validated only when 
+        they are requested: the constructor only lists the names of 
+        the configuration files. 
+        
+        With the default sources, the list and the contents of the files 
+        are cached in EASY_ALGO_INDEX_CACHE, as long as they do not change.
+    """
     _singleton = None 
     
     pattern = '*.easy_algo_family.yaml'
+    patterns = [pattern, '*.family.yaml']
     
     @contract(sources='None|seq(str)')
     def __init__(self, sources=None):
+        cache_filename = None
         if sources is None:
             sources = get_config_sources()
-        self.all_yaml = look_everywhere_for_config_files('*.yaml', sources)
+            cache_filename = expand_all(EASY_ALGO_INDEX_CACHE)
+        self.index = ConfigFilesIndex(sources, cache_filename)
         
-        self.family_name2config = load_family_config(self.all_yaml)
+        # family name -> filename 
+        self.family_name2filename = OrderedDict()
+        for pattern in EasyAlgoDB.patterns:
+            for filename in self.index.filenames(pattern):
+                family_name = id_from_basename_pattern(os.path.basename(filename), pattern)
+                if family_name in self.family_name2filename:
+                    one = self.family_name2filename[family_name]
+                    msg = 'Repeated filename:\n%s\n%s' % (one, filename)
+                    raise DTConfigException(msg)
+                self.family_name2filename[family_name] = filename
+        # family name -> EasyAlgoFamily, with the instances validated
+        self._families = {}
+        
+    @property
+    def family_name2config(self):
+        """ Returns all the families; this reads and validates everything. """
+        return OrderedDict((_, self.get_family(_)) for _ in self.family_name2filename)
     
     def query(self, family_name, query, raise_if_no_matches=False):
-        family = self.get_family(family_name)
-        instances = family.instances
+        instances = self._get_instances(family_name)
         result = fuzzy_match(query, instances, raise_if_no_matches=raise_if_no_matches)
         return result
         
     def get_family(self, x):
-        check_is_in('family', x, self.family_name2config)
-        return self.family_name2config[x]
+        """ Returns the family, after validating all its instances. """
+        if not x in self._families:
+            family = self._get_family_config(x)
+            instances = OrderedDict()
+            for name, i in self._get_instances(x).items():
+                instances[name] = check_validity_instance(family, i)
+            self._families[x] = family._replace(instances=instances)
+        return self._families[x]
     
     def query_and_instance(self, family_name, query, raise_if_no_matches=False):
         results = self.query(family_name, query, raise_if_no_matches=raise_if_no_matches)
@@ -54,20 +90,21 @@ class EasyAlgoDB():
         return stuff
     
     def create_instance(self, family_name, instance_name):
-        family = self.get_family(family_name)
+        """ Reads and instantiates only the requested instance. """
+        family = self._get_family_config(family_name)
         if not family.valid:
             msg = ('Cannot instantiate %r because its family %r is invalid.' %
                     (instance_name, family_name))
             raise DTConfigException(msg)
-            
-        check_is_in('instance', instance_name, family.instances)
-        instance = family.instances[instance_name]
         
-        if not instance.valid:
+        instance = self.get_instance(family_name, instance_name)
+        
+        try:
+            res = instantiate(instance.constructor, instance.parameters)
+        except Exception as e:
             msg = ('Cannot instantiate because it is invalid:\n%s' % 
-                   indent(instance.error_if_invalid, '> '))
+                   indent(str(e), '> '))
             raise DTConfigException(msg)
-        res = instantiate(instance.constructor, instance.parameters)
         
         interface = import_name(family.interface)
         if not isinstance(res, interface):
@@ -76,87 +113,87 @@ class EasyAlgoDB():
             raise DTConfigException(msg)
              
         return res
-        
-#         """ Instantiates an algorithm """
-        
-def load_family_config(all_yaml):
-    """
-        # now, for each family, we look for tests, which have name
-        #  
-        #     ![ID].![family_name]_test.yaml
-        #
-        # and configuration files, which are:
-        #
-        #     ![ID].![family_name].yaml
-        #
-        #   
-    """
-    if not isinstance(all_yaml, dict):
-        msg = 'Expected a dict, got %s' % type(all_yaml).__name__
-        raise ValueError(msg)
-    family_name2config = {}
-    
-    configs = look_everywhere_for_config_files2(EasyAlgoDB.pattern, all_yaml)
-    configs.update(look_everywhere_for_config_files2("*.family.yaml", all_yaml))
     
-    for filename, contents in configs.items():
-        c = interpret_yaml_file(filename, contents, interpret_easy_algo_config)
-
-        if c.family_name in family_name2config:
-            one = family_name2config[c.family_name].filename
-            two = c.filename
-            msg = 'Repeated filename:\n%s\n%s' % (one, two)
+    def get_instance(self, family_name, instance_name):
+        """ Returns the EasyAlgoInstance, read but not validated. """
+        family = self._get_family_config(family_name)
+        basename = family.instances_pattern.replace('*', instance_name)
+        filenames = self.index.filenames_with_basename(basename)
+        if not filenames:
+            check_is_in('instance', instance_name, self._get_instance_names(family))
+        if len(filenames) > 1:
+            msg = 'Repeated filename:\n%s\n%s' % (filenames[0], filenames[1])
             raise DTConfigException(msg)
- 
-        def interpret_instance_spec(filename, data):
-            dt_check_isinstance('data', data, dict)
-
-            basename = os.path.basename(filename)
-            instance_name = id_from_basename_pattern(basename, c.instances_pattern)
-            
-            if c.default_constructor is not None and not 'constructor' in data:
-                description = '(not given)'
-                constructor = c.default_constructor
-                parameters = OrderedDict(data)
-            else:
-                description = data.pop('description')
-                dt_check_isinstance('description', description, str) 
-    
-                constructor = data.pop('constructor')
-                dt_check_isinstance('constructor', constructor, str) 
-    
-                parameters = data.pop('parameters')
-                dt_check_isinstance('parameters', parameters, (dict, NoneType))
-                
-                if parameters is None: parameters = {} 
-
-            return EasyAlgoInstance(family_name=c.family_name, instance_name=instance_name,
-                                    description=description, filename=filename,
-                                    constructor=constructor, parameters=parameters,
-                                    valid=True, error_if_invalid=None)
-             
-        
-        c = check_validity_family(c)
-         
-        instances = {}
-        _ = look_everywhere_for_config_files2(c.instances_pattern, all_yaml)
-        for filename, contents in _.items():
-            i = interpret_yaml_file(filename, contents, interpret_instance_spec, plain_yaml=True)
+        instance = self._read_instance(family, filenames[0])
+        self.index.save()
+        return instance
+    
+    def _get_family_config(self, family_name):
+        """ Returns the family, with instances = None. """
+        check_is_in('family', family_name, self.family_name2filename)
+        filename = self.family_name2filename[family_name]
+        c = self.index.interpret(filename, read_family_config)
+        self.index.save()
+        return check_validity_family(c)
+    
+    def _get_instance_names(self, family):
+        return [id_from_basename_pattern(os.path.basename(_), family.instances_pattern) 
+                for _ in self.index.filenames(family.instances_pattern)]
+    
+    def _get_instances(self, family_name):
+        """ Returns the instances of the family, read but not validated. """
+        family = self._get_family_config(family_name)
+        instances = OrderedDict()
+        for filename in self.index.filenames(family.instances_pattern):
+            i = self._read_instance(family, filename)
             if i.instance_name in instances:
                 one = instances[i.instance_name].filename
                 two = i.filename
                 msg = 'Repeated filename:\n%s\n%s' % (one, two)
                 raise DTConfigException(msg)
-            
-            i = check_validity_instance(c, i)
             instances[i.instance_name] = i
+        self.index.save()
+        return instances
         
-        c = c._replace(instances=instances)
-        
+    def _read_instance(self, family, filename):
+        return self.index.interpret(filename, read_instance_spec, family.family_name,
+                                    family.instances_pattern, family.default_constructor)
         
-        family_name2config[c.family_name] = c
+
+def read_family_config(filename, contents):
+    return interpret_yaml_file(filename, contents, interpret_easy_algo_config)
+
+
+def read_instance_spec(filename, contents, family_name, instances_pattern, default_constructor):
+    
+    def interpret_instance_spec(filename, data):
+        dt_check_isinstance('data', data, dict)
+
+        basename = os.path.basename(filename)
+        instance_name = id_from_basename_pattern(basename, instances_pattern)
         
-    return family_name2config
+        if default_constructor is not None and not 'constructor' in data:
+            description = '(not given)'
+            constructor = default_constructor
+            parameters = OrderedDict(data)
+        else:
+            description = data.pop('description')
+            dt_check_isinstance('description', description, str) 
+
+            constructor = data.pop('constructor')
+            dt_check_isinstance('constructor', constructor, str) 
+
+            parameters = data.pop('parameters')
+            dt_check_isinstance('parameters', parameters, (dict, NoneType))
+            
+            if parameters is None: parameters = {} 
+
+        return EasyAlgoInstance(family_name=family_name, instance_name=instance_name,
+                                description=description, filename=filename,
+                                constructor=constructor, parameters=parameters,
+                                valid=True, error_if_invalid=None)
+    
+    return interpret_yaml_file(filename, contents, interpret_instance_spec, plain_yaml=True)
 
 @contract(f=EasyAlgoFamily, i=EasyAlgoInstance, returns=EasyAlgoInstance)
 def check_validity_instance(f, i):
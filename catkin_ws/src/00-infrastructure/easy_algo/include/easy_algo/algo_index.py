@@ -0,0 +1,123 @@
+from collections import OrderedDict
+import fnmatch
+import os
+
+from duckietown_utils import logger
+from duckietown_utils.friendly_path_imp import friendly_path
+from duckietown_utils.safe_pickling import safe_pickle_dump, safe_pickle_load
+
+__all__ = [
+    'ConfigFilesIndex',
+]
+
+
+class ConfigFilesIndex(object):
+    """
+        Index of the YAML files in the sources, by basename, and cache of
+        the interpretation of the files that were requested.
+
+        Only the names of the files are collected at the beginning;
+        each file is read and interpreted the first time that it is
+        needed. If cache_filename is given, the index is saved there
+        and reused by the next processes as long as the modification
+        times of the directories (for the list of files) and of the
+        files (for their interpretation) did not change.
+    """
+
+    VERSION = 1
+
+    def __init__(self, sources, cache_filename=None):
+        self.sources = list(sources)
+        self.cache_filename = cache_filename
+        self.changed = False
+        data = self._load_cache()
+        if data is None:
+            data = self._scan()
+            self.changed = True
+        # directory -> mtime
+        self.dirs = data['dirs']
+        # basename -> list of filenames
+        self.basename2filenames = data['basename2filenames']
+        # (filename, interpreter name, *args) -> (mtime, result)
+        self.interpreted = data['interpreted']
+        self.save()
+
+    def filenames(self, pattern):
+        """ Returns the files whose basename matches the pattern. """
+        res = []
+        for basename, filenames in self.basename2filenames.items():
+            if fnmatch.fnmatch(basename, pattern):
+                res.extend(filenames)
+        return sorted(res)
+
+    def filenames_with_basename(self, basename):
+        return list(self.basename2filenames.get(basename, []))
+
+    def interpret(self, filename, f, *args):
+        """
+            Returns f(filename, contents, *args), computed only if the file
+            changed since the last time.
+        """
+        key = (filename, f.__name__) + args
+        mtime = os.stat(filename).st_mtime
+        if key in self.interpreted:
+            mtime0, result = self.interpreted[key]
+            if mtime0 == mtime:
+                return result
+        with open(filename) as fi:
+            contents = fi.read()
+        result = f(filename, contents, *args)
+        self.interpreted[key] = (mtime, result)
+        self.changed = True
+        return result
+
+    def save(self):
+        """ Writes the cache file, if anything changed. """
+        if self.cache_filename is None or not self.changed:
+            return
+        data = dict(version=ConfigFilesIndex.VERSION, sources=self.sources,
+                    dirs=self.dirs, basename2filenames=self.basename2filenames,
+                    interpreted=self.interpreted)
+        try:
+            safe_pickle_dump(data, self.cache_filename)
+        except Exception as e:
+            logger.warning('Could not write %s: %s' % (friendly_path(self.cache_filename), e))
+        self.changed = False
+
+    def _load_cache(self):
+        """ Returns the data in the cache file, if still valid, or None. """
+        if self.cache_filename is None or not os.path.exists(self.cache_filename):
+            return None
+        try:
+            data = safe_pickle_load(self.cache_filename)
+        except Exception as e:
+            logger.warning('Ignoring cache %s: %s' % (friendly_path(self.cache_filename), e))
+            return None
+        if data.get('version') != ConfigFilesIndex.VERSION or data['sources'] != self.sources:
+            return None
+        # Adding, removing or renaming a file changes the mtime of its directory
+        for d, mtime in data['dirs'].items():
+            try:
+                if os.stat(d).st_mtime != mtime:
+                    return None
+            except OSError:
+                return None
+        return data
+
+    def _scan(self):
+        logger.debug('Looking for configuration files in %s' % self.sources)
+        dirs = {}
+        basename2filenames = OrderedDict()
+        seen = set()
+        for source in self.sources:
+            for root, _, files in os.walk(source, followlinks=True):
+                dirs[root] = os.stat(root).st_mtime
+                for basename in files:
+                    if not fnmatch.fnmatch(basename, '*.yaml'):
+                        continue
+                    filename = os.path.realpath(os.path.join(root, basename))
+                    if filename in seen:
+                        continue
+                    seen.add(filename)
+                    basename2filenames.setdefault(os.path.basename(filename), []).append(filename)
+        return dict(dirs=dirs, basename2filenames=basename2filenames, interpreted={})
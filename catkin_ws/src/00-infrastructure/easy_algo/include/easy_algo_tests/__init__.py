@@ -2,6 +2,7 @@
 def jobs_comptests(context):  
     from . import summary 
     from . import validity 
+    from . import lazy
     from . import cli 
     
     from comptests.registrar import jobs_registrar_simple
@@ -0,0 +1,113 @@
+import os
+
+from comptests.registrar import comptest, run_module_tests
+
+from duckietown_utils.disk_hierarchy import create_tmpdir, dir_from_data
+from easy_algo.algo_db import EasyAlgoDB
+from easy_algo.algo_index import ConfigFilesIndex
+
+
+class Counted(object):
+    created = 0
+
+    def __init__(self):
+        Counted.created += 1
+
+
+class Broken(Counted):
+
+    def __init__(self):
+        raise Exception('broken constructor')
+
+
+@comptest
+def test_lazy_instances():
+    data = """
+"counted.easy_algo_family.yaml": |
+    description: desc
+    interface: easy_algo_tests.lazy.Counted
+
+"a.counted.yaml": |
+    description: desc
+    constructor: easy_algo_tests.lazy.Counted
+    parameters:
+
+"b.counted.yaml": |
+    description: desc
+    constructor: easy_algo_tests.lazy.Counted
+    parameters:
+
+"broken.counted.yaml": |
+    description: desc
+    constructor: easy_algo_tests.lazy.Broken
+    parameters:
+"""
+    d = dir_from_data(data)
+    Counted.created = 0
+    db = EasyAlgoDB([d])
+    assert Counted.created == 0
+
+    # only the requested instance is created
+    db.create_instance('counted', 'a')
+    assert Counted.created == 1
+
+    assert list(db.query('counted', '*')) == ['a', 'b', 'broken']
+    assert Counted.created == 1
+
+    try:
+        db.create_instance('counted', 'broken')
+        raise Exception()
+    except Exception as e:
+        assert 'broken constructor' in str(e), e
+
+    family = db.get_family('counted')
+    assert family.instances['a'].valid
+    assert not family.instances['broken'].valid
+
+
+def count_lines(filename, contents):  # @UnusedVariable
+    count_lines.calls += 1
+    return len(contents.split('\n'))
+
+
+@comptest
+def test_index_cache():
+    d = dir_from_data("""
+"one.f.yaml": |
+    a
+"two.f.yaml": |
+    a
+    b
+""")
+    cache = os.path.join(create_tmpdir(), 'index.pickle')
+    count_lines.calls = 0
+    index = ConfigFilesIndex([d], cache)
+    filenames = index.filenames('*.f.yaml')
+    assert [os.path.basename(_) for _ in filenames] == ['one.f.yaml', 'two.f.yaml']
+    assert [index.interpret(_, count_lines) for _ in filenames] == [2, 3]
+    assert count_lines.calls == 2
+    index.save()
+
+    # the next process does not read the files again
+    index = ConfigFilesIndex([d], cache)
+    assert [index.interpret(_, count_lines) for _ in filenames] == [2, 3]
+    assert count_lines.calls == 2
+
+    # unless they change
+    with open(filenames[0], 'w') as f:
+        f.write('a\nb\nc\nd')
+    os.utime(filenames[0], (0, 0))
+    index = ConfigFilesIndex([d], cache)
+    assert index.interpret(filenames[0], count_lines) == 4
+    assert count_lines.calls == 3
+
+    # new files are found
+    with open(os.path.join(d, 'three.f.yaml'), 'w') as f:
+        f.write('a')
+    os.utime(d, (0, 0))
+    index = ConfigFilesIndex([d], cache)
+    assert len(index.filenames('*.f.yaml')) == 3
+
+
+if __name__ == '__main__':
+    run_module_tests()
@@ -1,6 +1,6 @@
 from collections import OrderedDict
 from duckietown_utils.bag_info import d8n_get_all_images_topic_bag
-from duckietown_utils.bag_logs import d8n_read_all_images_from_bag
+from duckietown_utils.bag_logs import d8n_read_images_from_bag_topics
 from duckietown_utils.bag_reading import BagReadProxy
 from duckietown_utils.cli import D8AppWithLogs
 from duckietown_utils.exceptions import DTUserError
@@ -69,16 +69,15 @@ def work(log, outd, max_images):
 
     import rosbag  # @UnresolvedImport
     bag = rosbag.Bag(filename)
-    topics = [_ for _, __ in d8n_get_all_images_topic_bag(bag)]
-    bag.close()
-    
-    for topic in topics:
-        bag = rosbag.Bag(filename)
+    try:
         topics = [_ for _, __ in d8n_get_all_images_topic_bag(bag)]
         bag_proxy = BagReadProxy(bag, t0, t1)
-        res = d8n_read_all_images_from_bag(bag_proxy, topic, max_images=max_images)
+        # all the topics in one pass
+        topic2res = d8n_read_images_from_bag_topics(bag_proxy, topics, max_images=max_images)
+    finally:
         bag.close()
-        
+    
+    for topic, res in topic2res.items():
         if len(topics) == 1:
             d0 = outd
         else:
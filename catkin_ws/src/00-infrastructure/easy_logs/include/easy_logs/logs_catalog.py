@@ -0,0 +1,295 @@
+"""
+    An SQLite index of the logs, used to answer the queries of EasyLogsDB.
+
+    The query language is the one of duckietown_utils.fuzzy; the parts
+    of the query that test the log name or the attributes of the logs
+    (e.g. "vehicle:ferrari,length:>30") are compiled to a WHERE clause
+    that uses the indexes; the rest (slices, time slices, "first", ...)
+    is evaluated in Python on the result, with the same semantics
+    as Spec.match_dict().
+
+    The database can be stored in a file, so that it is built only once
+    for the same logs.
+"""
+from collections import OrderedDict
+import copy
+import json
+from operator import itemgetter
+import os
+import re
+import sqlite3
+
+from duckietown_utils import logger
+from duckietown_utils.friendly_path_imp import friendly_path
+
+from duckietown_utils.fuzzy import (And, ByTag, Constant, GT, Index, LT,
+    MatchAll, OnlyFirst, Or, Shuffle, Slice, Spec, Wildcard)
+from duckietown_utils.wildcards import wildcard_to_regexp
+
+from .logs_structure import PhysicalLog
+from .time_slice import MakeTimeSlice
+
+__all__ = [
+    'LogsCatalog',
+]
+
+# The columns of the table are the attributes of PhysicalLog, except
+# bag_info, plus the key of the log in the database.
+KEY = 'key'
+COLUMNS = [_ for _ in PhysicalLog._fields if _ != 'bag_info']
+INDEXED = [KEY, 'vehicle', 'date', 'map_name', 'length', 'valid']
+
+# Specs whose match_dict() only transforms the result of their only child.
+POSTPROCESSING = (Slice, Index, OnlyFirst, Shuffle, MakeTimeSlice)
+
+KIND_NUMERIC = 'numeric'
+KIND_TEXT = 'text'
+# mixed types can only be compared for equality
+KIND_MIXED = 'mixed'
+
+# changes when the structure of the database changes
+CATALOG_VERSION = 1
+
+
+class LogsCatalog(object):
+
+    def __init__(self, logs, filename=None, stamp=None):
+        """
+            logs: OrderedDict str -> PhysicalLog
+
+            If filename is given, the database is stored in that file, and
+            the next processes use it as long as the stamp (a string that
+            changes when the logs change) is the same.
+        """
+        self.logs = logs
+        self.keys = list(logs)
+        self.position = dict((k, i) for i, k in enumerate(self.keys))
+        # True if the database was built, False if it was read
+        self.built = False
+        self.db = None
+        if filename is not None:
+            self.db = self._open(filename, stamp)
+        if self.db is None:
+            self.db = self._build(filename, stamp)
+            self.built = True
+        self.db.create_function('wildcard', 2, _wildcard_match)
+
+    def _open(self, filename, stamp):
+        """ Returns the database in the file, if valid for these logs, or None. """
+        if not os.path.exists(filename):
+            return None
+        try:
+            db = sqlite3.connect(filename)
+            meta = dict(db.execute('SELECT name, value FROM meta'))
+            expected = dict(version=str(CATALOG_VERSION), stamp=stamp, n=str(len(self.keys)))
+            if any(meta.get(k) != v for k, v in expected.items()):
+                db.close()
+                return None
+            self.kinds = json.loads(meta['kinds'])
+        except sqlite3.Error as e:
+            logger.warning('Ignoring catalog %s: %s' % (friendly_path(filename), e))
+            return None
+        return db
+
+    def _build(self, filename, stamp):
+        logs = self.logs
+        n = len(self.keys)
+        values = list(logs.values())
+        if all(isinstance(_, PhysicalLog) for _ in values):
+            get = itemgetter(*[PhysicalLog._fields.index(c) for c in COLUMNS])
+            columns = list(zip(*map(get, values))) or [()] * len(COLUMNS)
+        else:
+            columns = None
+        # column -> kind of the values, None if it cannot be queried
+        self.kinds = {KEY: value_kind(set(map(type, self.keys)))}
+        for i, c in enumerate(COLUMNS):
+            self.kinds[c] = value_kind(set(map(type, columns[i]))) if columns else None
+        # the columns that cannot be queried are left empty
+        columns = [columns[i] if self.kinds[c] is not None else [None] * n
+                   for i, c in enumerate(COLUMNS)]
+
+        if filename is None:
+            db = sqlite3.connect(':memory:')
+        else:
+            logger.info('Creating catalog %s' % friendly_path(filename))
+            # written to a temporary file, so that the other processes
+            # never see an incomplete database
+            tmp = '%s.tmp-%s' % (filename, os.getpid())
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            db = sqlite3.connect(tmp)
+        # no type affinity: values are compared as in Python (5 != '5')
+        fields = ['position INTEGER PRIMARY KEY'] + ['"%s"' % c for c in [KEY] + COLUMNS]
+        db.execute('CREATE TABLE logs (%s)' % ", ".join(fields))
+        rows = zip(range(n), self.keys, *columns)
+        marks = ", ".join(['?'] * (2 + len(COLUMNS)))
+        db.executemany('INSERT INTO logs VALUES (%s)' % marks, rows)
+        for c in INDEXED:
+            db.execute('CREATE INDEX "logs_%s" ON logs ("%s")' % (c, c))
+        meta = dict(version=str(CATALOG_VERSION), stamp=stamp, n=str(n),
+                    kinds=json.dumps(self.kinds))
+        db.execute('CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)')
+        db.executemany('INSERT INTO meta VALUES (?, ?)', meta.items())
+        db.commit()
+
+        if filename is not None:
+            db.close()
+            os.rename(tmp, filename)
+            db = sqlite3.connect(filename)
+        return db
+
+    def __len__(self):
+        return len(self.logs)
+
+    def match_dict(self, spec):
+        """ Same result as spec.match_dict(self.logs). """
+        where = self.compile(spec)
+        if where is not None:
+            sql, params = where
+            cursor = self.db.execute('SELECT position FROM logs WHERE %s ORDER BY position'
+                                     % sql, params)
+            keys = [self.keys[i] for i, in cursor]
+            return OrderedDict((k, self.logs[k]) for k in keys)
+
+        if isinstance(spec, And):
+            # the compilable children are checked together
+            compiled = [_ for _ in spec.children if self.compile(_) is not None]
+            others = [_ for _ in spec.children if self.compile(_) is None]
+            results = [self.match_dict(_) for _ in others]
+            if compiled:
+                results.append(self.match_dict(And(compiled)))
+            results.sort(key=len)
+            keys = [k for k in results[0] if all(k in _ for _ in results[1:])]
+            keys.sort(key=self.position.__getitem__)
+            return OrderedDict((k, self.logs[k]) for k in keys)
+
+        if isinstance(spec, Or):
+            matches = OrderedDict()
+            for option in spec.children:
+                for k, v in self.match_dict(option).items():
+                    if not k in matches:
+                        matches[k] = v
+            return matches
+
+        if isinstance(spec, POSTPROCESSING):
+            spec2 = copy.copy(spec)
+            spec2.children = [Result(self.match_dict(spec.children[0]))]
+            return spec2.match_dict(self.logs)
+
+        return spec.match_dict(self.logs)
+
+    def compile(self, spec):
+        """
+            Compiles a spec that selects logs to a WHERE clause.
+
+            Returns (sql, params) or None if not possible.
+        """
+        if isinstance(spec, MatchAll):
+            return '1', []
+        if isinstance(spec, And):
+            return combine([self.compile(_) for _ in spec.children], 'AND')
+        if isinstance(spec, (Constant, Wildcard)):
+            # these are tested against the key
+            column, value_spec = KEY, spec
+        elif isinstance(spec, ByTag) and spec.tagname in COLUMNS:
+            column, value_spec = spec.tagname, spec.spec
+        else:
+            return None
+        kind = self.kinds[column]
+        if kind is None:
+            return None
+        return compile_value(column, kind, value_spec)
+
+
+class Result(Spec):
+    """ A spec that returns a result computed beforehand. """
+
+    def __init__(self, result):
+        Spec.__init__(self, [])
+        self.result = result
+
+    def match(self, x):
+        raise NotImplementedError()
+
+    def match_dict(self, seq):
+        return self.result
+
+
+def compile_value(column, kind, spec):
+    """
+        Compiles a spec that is tested against the value of a column.
+
+        Returns (sql, params) or None if not possible.
+    """
+    c = '"%s"' % column
+    if isinstance(spec, MatchAll):
+        return '1', []
+    if isinstance(spec, (And, Or)):
+        op = 'AND' if isinstance(spec, And) else 'OR'
+        return combine([compile_value(column, kind, _) for _ in spec.children], op)
+    if isinstance(spec, Constant):
+        if spec.s is None:
+            return '%s IS NULL' % c, []
+        if not is_scalar(spec.s):
+            # for example, a date parsed by YAML
+            return None
+        return '%s = ?' % c, [spec.s]
+    if isinstance(spec, Wildcard) and kind == KIND_TEXT:
+        sql = '%s IS NOT NULL AND wildcard(?, %s)' % (c, c)
+        params = [spec.pattern]
+        prefix = literal_prefix(spec.pattern)
+        if prefix:
+            # so that the index can be used
+            upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            sql = '%s >= ? AND %s < ? AND %s' % (c, c, sql)
+            params = [prefix, upper] + params
+        return sql, params
+    if isinstance(spec, (LT, GT)) and kind == KIND_NUMERIC:
+        # NULL compares as false, as None in LT.match() and GT.match()
+        op = '<' if isinstance(spec, LT) else '>'
+        return '%s %s ?' % (c, op), [spec.value]
+    return None
+
+
+def combine(compiled, op):
+    """ Combines the compiled children of And/Or; None if one is None. """
+    if any(_ is None for _ in compiled):
+        return None
+    if not compiled:
+        return ('1' if op == 'AND' else '0'), []
+    sql = (' %s ' % op).join('(%s)' % s for s, _ in compiled)
+    params = sum([p for _, p in compiled], [])
+    return sql, params
+
+
+def value_kind(types):
+    """
+        Returns KIND_NUMERIC, KIND_TEXT, KIND_MIXED or None (cannot be
+        queried), given the set of the types of the values.
+    """
+    types = types - set([type(None)])
+    if not all(is_scalar_type(_) for _ in types):
+        return None
+    if types <= set([str]):
+        return KIND_TEXT
+    if types <= set([bool, int, long, float]):
+        return KIND_NUMERIC
+    return KIND_MIXED
+
+
+def is_scalar_type(t):
+    return t in [bool, int, long, float, str]
+
+
+def is_scalar(x):
+    return is_scalar_type(type(x))
+
+
+def literal_prefix(pattern):
+    """ Returns the part of a wildcard before the first special character. """
+    m = re.match(r'[\w\-]*', pattern)
+    return m.group(0)
+
+
+def _wildcard_match(pattern, x):
+    return wildcard_to_regexp(pattern).match(x) is not None
@@ -4,12 +4,15 @@ import os
 
 from duckietown_utils import (
     format_time_as_YYYY_MM_DD,
-    friendly_path, fuzzy_match, filters0, get_cached, rosbag_info_cached,
+    friendly_path, fuzzy_match, filters0, get_cached, get_cached_filename,
+    rosbag_info_cached,
+    rosbag_info_cached_many,
     get_duckietown_root, logger,
     look_everywhere_for_bag_files, yaml_load_file, yaml_write_to_file)
 from duckietown_utils import check_isinstance
 from duckietown_utils import require_resource
 
+from .logs_catalog import LogsCatalog
 from .logs_structure import PhysicalLog
 from .time_slice import filters_slice
 
@@ -21,6 +24,11 @@ def get_easy_logs_db_cached_if_possible():
     if EasyLogsDB._singleton is None:
         f = EasyLogsDB
         EasyLogsDB._singleton = get_cached('EasyLogsDB', f)
+        # the catalog is valid as long as the cache file is the same
+        st = os.stat(get_cached_filename('EasyLogsDB'))
+        stamp = '%s-%s' % (st.st_mtime, st.st_size)
+        catalog = os.path.join(get_duckietown_root(), 'caches', 'EasyLogsDB.catalog.sqlite')
+        EasyLogsDB._singleton.set_catalog_file(catalog, stamp)
 
         fn = os.path.join(get_duckietown_root(),'caches','candidate_cloud.yaml')
 
@@ -67,6 +75,40 @@ class EasyLogsDB():
         else:
             check_isinstance(logs, OrderedDict)
         self.logs = logs
+        # created at the first query
+        self._catalog = None
+        self._catalog_file = None
+
+    def __getstate__(self):
+        # the catalog is not pickled
+        state = dict(self.__dict__)
+        state.pop('_catalog', None)
+        state.pop('_catalog_file', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._catalog = None
+        self._catalog_file = None
+
+    def set_catalog_file(self, filename, stamp):
+        """
+            Stores the catalog in filename, to be reused by the next
+            processes as long as the stamp is the same.
+        """
+        self._catalog_file = (filename, stamp, self.logs)
+        self._catalog = None
+
+    def get_catalog(self):
+        """ Returns the LogsCatalog that indexes self.logs. """
+        if self._catalog is None or self._catalog.logs is not self.logs:
+            # the file is valid only for the logs that were loaded
+            if self._catalog_file is not None and self._catalog_file[2] is self.logs:
+                filename, stamp, _ = self._catalog_file
+                self._catalog = LogsCatalog(self.logs, filename, stamp)
+            else:
+                self._catalog = LogsCatalog(self.logs)
+        return self._catalog
 
     def query(self, query, raise_if_no_matches=True):
         """
@@ -78,8 +120,10 @@ class EasyLogsDB():
         filters = OrderedDict()
         filters.update(filters_slice)
         filters.update(filters0)
+        catalog = self.get_catalog()
         result = fuzzy_match(query, self.logs, filters=filters,
-                             raise_if_no_matches=raise_if_no_matches)
+                             raise_if_no_matches=raise_if_no_matches,
+                             match_dict=catalog.match_dict)
         return result
 
 def read_stats(pl):
@@ -90,7 +134,7 @@ def read_stats(pl):
         return pl._replace(valid=False, error_if_invalid='Not indexed')
 
     # print yaml.dump(info)
-    length = info['duration']
+    length = info.get('duration', None)
     if length is None:
         return pl._replace(valid=False, error_if_invalid='Empty bag.')
 
@@ -157,7 +201,12 @@ def load_all_logs(which='*'):
                         bag_info=None,
                         valid=True,
                         error_if_invalid=None)
-        l = read_stats(l)
         logs[l.log_name]= l
 
+    # index all the new bags at once, in parallel
+    rosbag_info_cached_many([l.filename for l in logs.values()])
+
+    for log_name, l in list(logs.items()):
+        logs[log_name] = read_stats(l)
+
     return logs
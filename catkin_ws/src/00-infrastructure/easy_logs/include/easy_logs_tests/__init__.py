@@ -3,6 +3,7 @@
 def jobs_comptests(context):  
     from . import summary 
     from . import slicing
+    from . import catalog
 
     from comptests.registrar import jobs_registrar_simple
     jobs_registrar_simple(context)
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+import os
+
+from comptests.registrar import comptest, run_module_tests
+
+from duckietown_utils import filters0, parse_match_spec
+from duckietown_utils.disk_hierarchy import create_tmpdir
+from easy_logs.logs_catalog import LogsCatalog
+from easy_logs.logs_db import EasyLogsDB
+from easy_logs.logs_structure import PhysicalLog
+from easy_logs.time_slice import filters_slice
+
+
+def synthetic_logs(n):
+    logs = OrderedDict()
+    vehicles = ['ferrari', 'mercedes', None]
+    for i in range(n):
+        vehicle = vehicles[i % 3]
+        valid = i % 5 != 0
+        length = float(i) if valid else None
+        log_name = '201712%02d_%s_%d' % (i % 28 + 1, vehicle, i)
+        logs[log_name] = PhysicalLog(log_name=log_name, filename=None,
+                                     map_name='map%d' % (i % 2), description=None,
+                                     vehicle=vehicle, date=log_name[:8], length=length,
+                                     t0=0 if valid else None, t1=length, size=i,
+                                     bag_info=None, has_camera=valid, valid=valid,
+                                     error_if_invalid=None if valid else 'invalid')
+    return logs
+
+
+@comptest
+def catalog_same_as_fuzzy():
+    logs = synthetic_logs(200)
+    catalog = LogsCatalog(logs)
+    filters = OrderedDict()
+    filters.update(filters_slice)
+    filters.update(filters0)
+    queries = ['*', '20171201*', '*ferrari*', 'vehicle:ferrari',
+               'vehicle:null', 'vehicle:ferr*', 'valid:false',
+               'vehicle:mercedes,length:>50,length:<120', 'map_name:map1,valid:true',
+               'vehicle:ferrari+vehicle:mercedes', 'vehicle:ferrari/[3:10]',
+               'vehicle:ferrari,length:>50/first', 'length:<20/{1:3}',
+               'length:<20/{1:3}/[1]', 'contains:mercedes,size:>100']
+    for query in queries:
+        spec = parse_match_spec(query, filters=filters)
+        expected = spec.match_dict(logs)
+        result = catalog.match_dict(spec)
+        assert list(result.items()) == list(expected.items()), query
+
+    # these are answered with the indexes only
+    for query in ['vehicle:mercedes,length:>50,length:<120', '20171201*']:
+        spec = parse_match_spec(query, filters=filters)
+        assert catalog.compile(spec) is not None, query
+
+
+@comptest
+def catalog_query():
+    db = EasyLogsDB(synthetic_logs(30))
+    res = db.query('vehicle:ferrari,valid:true/[1:3]')
+    assert list(res) == ['20171207_ferrari_6', '20171210_ferrari_9'], list(res)
+    res = db.query('zzz*', raise_if_no_matches=False)
+    assert not res
+
+
+@comptest
+def catalog_file():
+    logs = synthetic_logs(100)
+    filename = os.path.join(create_tmpdir(), 'catalog.sqlite')
+    catalog = LogsCatalog(logs, filename, 'stamp1')
+    assert catalog.built
+    spec = parse_match_spec('vehicle:ferrari,length:>50')
+    expected = list(catalog.match_dict(spec))
+    assert expected
+
+    # reused by the next process
+    catalog2 = LogsCatalog(logs, filename, 'stamp1')
+    assert not catalog2.built
+    assert list(catalog2.match_dict(spec)) == expected
+    assert catalog2.kinds == catalog.kinds
+
+    # the logs changed
+    logs3 = synthetic_logs(50)
+    catalog3 = LogsCatalog(logs3, filename, 'stamp2')
+    assert catalog3.built
+    assert list(catalog3.match_dict(spec)) == list(spec.match_dict(logs3))
+    assert not LogsCatalog(logs3, filename, 'stamp2').built
+
+
+if __name__ == '__main__':
+    run_module_tests()
@@ -1,7 +1,8 @@
 from UserDict import UserDict
 from contextlib import contextmanager
+import functools
 import rospy
-import threading
+from std_msgs.msg import String  # @UnresolvedImport
 
 from duckietown_utils import DTConfigException
 from duckietown_utils import DuckietownConstants
@@ -13,13 +14,22 @@ from duckietown_utils import yaml_dump
 from .node_description.configuration import PROCESS_THREADED, PROCESS_SYNCHRONOUS
 from .node_description.configuration import load_configuration_package_node
 from .user_config.decide import get_user_configuration
+from .utils.metrics import (format_metrics, MetricsFileSink, MetricsHTTPServer,
+    MetricsTopicSink)
+from .utils.parameter_updates import (ParameterSubscriptionNotSupported,
+    ParameterWatcher, RospyParameterServer)
 from .utils.timing import ProcessingTimingStats
+from .utils.worker_pool import SubscriptionWorkerPool
 
 
 __all__ = [
     'EasyNode',
 ]
 
+# Values of the parameter en_update_params_mode
+UPDATE_PARAMS_SUBSCRIBE = 'subscribe'
+UPDATE_PARAMS_POLL = 'poll'
+
 
 class EasyNode():
 
@@ -62,6 +72,7 @@ class EasyNode():
         self._init_publishers()
         self._init_parameters()
         self._init_subscriptions()
+        self._init_metrics()
         self.info(self._configuration)
 
     def _init_subscriptions(self):
@@ -76,8 +87,13 @@ class EasyNode():
                 self.sub = sub
                 self.pts = ProcessingTimingStats()
 
-            def init_threaded(self):
-                self.thread_lock = threading.Lock()
+            def init_threaded(self, node, subscription):
+                process = functools.partial(node._sub_callback_threaded, subscription, self)
+                self.pool = SubscriptionWorkerPool(subscription.name, process, self.pts,
+                                                   workers=subscription.workers,
+                                                   queue_length=subscription.queue_length,
+                                                   policy=subscription.policy,
+                                                   deadline=subscription.deadline)
 
         class Callback():
             def __init__(self, node, subscription):
@@ -99,7 +115,33 @@ class EasyNode():
 
             self.info('Subscribed to %s' % s.topic)
             if s.process == PROCESS_THREADED:
-                sp.init_threaded()
+                sp.init_threaded(self, s)
+
+    def _init_metrics(self):
+        """ Exports the statistics of the subscriptions, if configured. """
+        self._metrics_sinks = []
+        if self.config.en_metrics_file:
+            self._metrics_sinks.append(MetricsFileSink(self.config.en_metrics_file))
+        if self.config.en_metrics_port:
+            self._metrics_sinks.append(MetricsHTTPServer(self.config.en_metrics_port))
+        if self.config.en_metrics_topic:
+            publisher = rospy.Publisher('~metrics', String, queue_size=1)  # @UndefinedVariable
+            self._metrics_sinks.append(MetricsTopicSink(publisher))
+        if not self._metrics_sinks:
+            return
+        duration = rospy.Duration.from_sec(self.config.en_metrics_interval)  # @UndefinedVariable
+        rospy.Timer(duration, self._export_metrics)  # @UndefinedVariable
+
+    def _export_metrics(self, _event):
+        subscription2pts = {}
+        for name in self._configuration.subscriptions:
+            subscription2pts[name] = getattr(self.subscribers, name).pts
+        text = format_metrics(rospy.get_name(), subscription2pts)  # @UndefinedVariable
+        for sink in self._metrics_sinks:
+            try:
+                sink.write(text)
+            except Exception as e:
+                self.info('Could not export the metrics to %s: %s' % (type(sink).__name__, e))
 
     def _sub_callback(self, subscription, subscriber_proxy, data):
         subscriber_proxy.pts.received_message(data)
@@ -110,51 +152,43 @@ class EasyNode():
                 subscriber_proxy.pts.decided_to_process(data)
                 self._call_callback(callback_name, subscription, data)
             elif subscription.process == PROCESS_THREADED:
-                # Start a daemon thread to process the image
-                target = self._sub_callback_threaded
-                args = (callback_name, subscription, subscriber_proxy, data)
-                thread = threading.Thread(target=target, args=args)
-                thread.setDaemon(True)
-                thread.start()
+                # Queue it for the workers of the subscription
+                subscriber_proxy.pool.submit(data)
             else:
                 assert False, subscription.process
         else:
             subscriber_proxy.pts.decided_to_skip()
             self.info('No callback %r defined.' % callback_name)
 
-    def _get_context(self, subscription):
+    def _get_context(self, subscription, data):
         class Context():
-            def __init__(self, node, subscription):
+            def __init__(self, node, subscription, data):
                 self.node = node
                 self.subscription = subscription
                 self.sp = getattr(node.subscribers, subscription.name)
+                # the workers of a subscription process different messages at the same time
+                self.t_acquired = data.header.stamp.to_sec()
 
             @contextmanager
             def phase(self, name):
-                with self.sp.pts.phase(name):
+                with self.sp.pts.phase(name, t_acquired=self.t_acquired):
                     yield
 
             def get_stats(self):
                 return self.sp.pts.get_stats()
 
-        context = Context(self, subscription)
+        context = Context(self, subscription, data)
         return context
 
-    def _sub_callback_threaded(self, callback_name, subscription, subscriber_proxy, data):
-        if not subscriber_proxy.thread_lock.acquire(False):
-            # TODO self.stats.skipped()
-            subscriber_proxy.pts.decided_to_skip()
-            return
-        try:
-            subscriber_proxy.pts.decided_to_process(data)
-            self._call_callback(callback_name, subscription, data)
-        finally:
-            # Release the thread lock
-            subscriber_proxy.thread_lock.release()
+    def _sub_callback_threaded(self, subscription, subscriber_proxy, data):
+        """ Called by the workers of the subscription. """
+        callback_name = 'on_received_%s' % subscription.name
+        subscriber_proxy.pts.decided_to_process(data)
+        self._call_callback(callback_name, subscription, data)
 
     def _call_callback(self, callback_name, subscription, data):
         c = getattr(self, callback_name)
-        context = self._get_context(subscription)
+        context = self._get_context(subscription, data)
         try:
             c(context, data)
         finally:
@@ -216,9 +250,26 @@ class EasyNode():
             
         self. _on_parameters_changed(first_time=True, values=values)
 
-        duration = self.config.en_update_params_interval
-        duration = rospy.Duration.from_sec(duration)  # @UndefinedVariable
-        rospy.Timer(duration, self._update_parameters)  # @UndefinedVariable
+        mode = self.config.en_update_params_mode
+        if mode == UPDATE_PARAMS_SUBSCRIBE:
+            try:
+                server = RospyParameterServer()
+            except ParameterSubscriptionNotSupported as e:
+                self.info('Cannot subscribe to the parameters (%s); polling instead.' % e)
+                mode = UPDATE_PARAMS_POLL
+            else:
+                self._parameter_watcher = ParameterWatcher(server, values, self._update_parameters_changed,
+                                                           min_interval=self.config.en_update_params_interval)
+                self._parameter_watcher.start()
+
+        if mode == UPDATE_PARAMS_POLL:
+            duration = self.config.en_update_params_interval
+            duration = rospy.Duration.from_sec(duration)  # @UndefinedVariable
+            rospy.Timer(duration, self._update_parameters)  # @UndefinedVariable
+        elif mode != UPDATE_PARAMS_SUBSCRIBE:
+            msg = 'Invalid value %r for en_update_params_mode; ' % mode
+            msg += 'expected %r or %r.' % (UPDATE_PARAMS_SUBSCRIBE, UPDATE_PARAMS_POLL)
+            raise DTConfigException(msg)
 
     def _on_parameters_changed(self, first_time, values):
         try:
@@ -236,16 +287,20 @@ class EasyNode():
              
         
     def _update_parameters(self, _event):
+        """ Polls the parameter server. """
         changed = self._get_changed_parameters()
 #         self.info('Parameters changed: %s' % sorted(changed))
         if changed:
-            for k, v in changed.items():
-                setattr(self.config, k, v)
-            self._on_parameters_changed(False, changed)
+            self._update_parameters_changed(changed)
         else:
             pass
             # self.info('No change in parameters.')
 
+    def _update_parameters_changed(self, changed):
+        for k, v in changed.items():
+            setattr(self.config, k, v)
+        self._on_parameters_changed(False, changed)
+
     def _get_changed_parameters(self):
         parameters = self._configuration.parameters
         changed = {}
@@ -5,6 +5,8 @@ from types import NoneType
 from duckietown_utils import DTConfigException, contract, format_table_plus, wrap_line_length,\
     indent, remove_table_field, get_ros_package_path, import_name, locate_files, raise_wrapped, yaml_load
 
+from ..utils.worker_pool import POLICY_LATEST, POLICY_VALUES
+
 
 # import yaml
 __all__ = [
@@ -14,13 +16,22 @@ __all__ = [
 
 EasyNodeConfig = namedtuple('EasyNodeConfig', 'filename package_name node_type_name description parameters subscriptions contracts publishers')
 EasyNodeParameter = namedtuple('EasyNodeParameter', 'name desc type has_default default')
-EasyNodeSubscription = namedtuple('EasyNodeSubscription', 'name desc type topic queue_size process latch timeout')
+EasyNodeSubscription = namedtuple('EasyNodeSubscription', 'name desc type topic queue_size process latch timeout '
+                                  'workers queue_length policy deadline')
 EasyNodePublisher = namedtuple('EasyNodePublisher', 'name desc type topic queue_size latch')
 
 PROCESS_THREADED = 'threaded'
 PROCESS_SYNCHRONOUS = 'synchronous'
 PROCESS_VALUES = [PROCESS_THREADED, PROCESS_SYNCHRONOUS]
 
+# Options of the threaded subscriptions, with their default values 
+THREADED_DEFAULTS = OrderedDict([
+    ('workers', 1),
+    ('queue_length', 0),
+    ('policy', POLICY_LATEST),
+    ('deadline', None),
+])
+
 
 
 # type = int, bool, float, or None (anything)
@@ -251,6 +262,7 @@ def load_configuration_subscription(name, data):
         if not process in PROCESS_VALUES:
             msg = 'Invalid value of process %r not in %r.' % (process, PROCESS_VALUES)
             raise DTConfigException(msg)
+        threaded = load_threaded_options(process, data)
 
     except KeyError as e:
         msg = 'Could not find field %r.' % e
@@ -266,7 +278,42 @@ def load_configuration_subscription(name, data):
     T = message_class_from_string(type_)
 
     return EasyNodeSubscription(name=name, desc=desc, topic=topic, timeout=timeout,
-                                type=T, queue_size=queue_size, latch=latch, process=process)
+                                type=T, queue_size=queue_size, latch=latch, process=process,
+                                **threaded)
+
+def load_threaded_options(process, data):
+#         process: threaded
+#         workers: 1
+#         queue_length: 1
+#         policy: latest
+#         deadline: 0.5
+    options = OrderedDict()
+    for k, default in THREADED_DEFAULTS.items():
+        if k in data and process != PROCESS_THREADED:
+            msg = 'The option %r can only be used with process: %s.' % (k, PROCESS_THREADED)
+            raise DTConfigException(msg)
+        options[k] = data.pop(k, default)
+    if process != PROCESS_THREADED:
+        return dict((k, None) for k in options)
+
+    workers = options['workers']
+    if not isinstance(workers, int) or workers < 1:
+        msg = 'Invalid number of workers %r.' % workers
+        raise DTConfigException(msg)
+    queue_length = options['queue_length']
+    if not isinstance(queue_length, int) or queue_length < 0:
+        msg = 'Invalid queue_length %r.' % queue_length
+        raise DTConfigException(msg)
+    if not options['policy'] in POLICY_VALUES:
+        msg = 'Invalid value of policy %r not in %r.' % (options['policy'], POLICY_VALUES)
+        raise DTConfigException(msg)
+    deadline = options['deadline']
+    if deadline is not None:
+        if not isinstance(deadline, (int, float)) or deadline <= 0:
+            msg = 'Invalid deadline %r.' % deadline
+            raise DTConfigException(msg)
+        options['deadline'] = float(deadline)
+    return options
 
 
 def load_configuration_publisher(name, data):
@@ -367,6 +414,10 @@ def format_enc_subscriptions(enc, descriptions):
             options.append('latch = %s ' %  p.latch)
         if p.timeout is not None:
             options.append('timeout = %s ' %  p.timeout)
+        if p.process == PROCESS_THREADED:
+            for k in THREADED_DEFAULTS:
+                if getattr(p, k) is not None:
+                    options.append('%s = %s' % (k, getattr(p, k)))
 
         options = '\n'.join(options)
         table.append([p.name, p.type.__name__, p.topic, options, p.process, desc])
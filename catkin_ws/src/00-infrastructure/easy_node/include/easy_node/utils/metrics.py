@@ -0,0 +1,186 @@
+"""
+    Export of the ProcessingTimingStats of a node in the Prometheus
+    text format (version 0.0.4), so that the statistics can be collected
+    and graphed without scraping the logs.
+
+    The text can be written to a file (e.g. for the textfile collector
+    of node_exporter), served over HTTP, or published on a ROS topic.
+"""
+import BaseHTTPServer  # @UnresolvedImport
+import os
+import threading
+
+from duckietown_utils import logger
+from duckietown_utils.mkdirs import d8n_mkdirs_thread_safe
+from duckietown_utils.path_utils import expand_all
+
+
+__all__ = [
+    'format_metrics',
+    'MetricsFileSink',
+    'MetricsHTTPServer',
+    'MetricsTopicSink',
+]
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+QUANTILES = [0.5, 0.95, 0.99]
+
+# (metric name, key in ProcessingTimingStats.stats, help)
+PHASE_METRICS = [
+    ('easy_node_phase_wall_seconds', 'wall', 'Wall time of the phase.'),
+    ('easy_node_phase_clock_seconds', 'clock', 'CPU time of the phase.'),
+    ('easy_node_phase_latency_seconds', 'latency',
+     'Time from the acquisition of the message to the end of the phase.'),
+]
+
+MESSAGE_EVENTS = ['received', 'processed', 'skipped']
+
+
+def format_metrics(node_name, subscription2pts):
+    """
+        Returns the statistics in the Prometheus text format.
+
+        subscription2pts: dict subscription name -> ProcessingTimingStats
+    """
+    metrics = Metrics()
+
+    for subscription, pts in sorted(subscription2pts.items()):
+        labels = [('node', node_name), ('subscription', subscription)]
+        stats = pts.stats
+        for event in MESSAGE_EVENTS:
+            stat = stats[event]
+            l = labels + [('event', event)]
+            metrics.add('easy_node_messages_total', 'counter',
+                        'Number of messages.', l, stat.num())
+            metrics.add('easy_node_messages_per_second', 'gauge',
+                        'Rate of the messages, over the last ones.', l, stat.rate())
+
+        for reason in pts.drop_reasons:
+            metrics.add('easy_node_dropped_total', 'counter',
+                        'Number of messages dropped by the worker pool.',
+                        labels + [('reason', reason)], pts.get_num_dropped(reason))
+        if stats['queue'].num():
+            metrics.add('easy_node_queue_length', 'gauge',
+                        'Number of messages waiting for a worker.',
+                        labels, pts.get_queue_length())
+
+        for phase_name in pts.phase_names:
+            for name, key, help_ in PHASE_METRICS:
+                stat = stats[(phase_name, key)]
+                l = labels + [('phase', phase_name)]
+                for q in QUANTILES:
+                    metrics.add(name, 'summary', help_, l + [('quantile', q)], stat.quantile(q))
+                metrics.add(name + '_sum', None, None, l, stat.sum_values())
+                metrics.add(name + '_count', None, None, l, stat.num_values())
+
+    return metrics.format()
+
+
+class Metrics():
+    """ Collects the samples, grouped by metric as the format requires. """
+
+    def __init__(self):
+        # family name -> (type, help, list of lines)
+        self.families = {}
+        self.order = []
+        self.last_family = None
+
+    def add(self, name, type_, help_, labels, value):
+        if type_ is not None:
+            self.last_family = name
+            if not name in self.families:
+                self.families[name] = (type_, help_, [])
+                self.order.append(name)
+        # the _sum and _count of a summary go with its family
+        _, _, lines = self.families[self.last_family]
+        lines.append('%s{%s} %s' % (name, format_labels(labels), format_value(value)))
+
+    def format(self):
+        s = ''
+        for name in self.order:
+            type_, help_, lines = self.families[name]
+            s += '# HELP %s %s\n' % (name, help_)
+            s += '# TYPE %s %s\n' % (name, type_)
+            for line in lines:
+                s += line + '\n'
+        return s
+
+
+def format_labels(labels):
+    return ','.join('%s="%s"' % (k, escape_label_value(v)) for k, v in labels)
+
+
+def escape_label_value(v):
+    v = v if isinstance(v, basestring) else repr(v)  # @UndefinedVariable
+    return v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(v):
+    if v is None:
+        return 'NaN'
+    return repr(float(v))
+
+
+class MetricsFileSink():
+    """
+        Writes the metrics to a file, replacing it atomically so that
+        the readers never see a partial file.
+    """
+
+    def __init__(self, filename):
+        self.filename = expand_all(filename)
+        d8n_mkdirs_thread_safe(os.path.dirname(self.filename))
+
+    def write(self, text):
+        tmp = '%s.tmp-%s' % (self.filename, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.rename(tmp, self.filename)
+
+
+class MetricsTopicSink():
+    """ Publishes the metrics with a publisher of std_msgs/String. """
+
+    def __init__(self, publisher):
+        self.publisher = publisher
+
+    def write(self, text):
+        self.publisher.publish(text)
+
+
+class MetricsHTTPServer():
+    """
+        Serves the last metrics written, at any path (e.g. /metrics),
+        in a separate thread.
+    """
+
+    def __init__(self, port, address=''):
+        self.text = ''
+        server = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = server.text.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # @ReservedAssignment
+                logger.debug('metrics: ' + format % args)
+
+        self.httpd = BaseHTTPServer.HTTPServer((address, port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       name='metrics-http-%s' % port)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def write(self, text):
+        self.text = text
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,164 @@
+from copy import deepcopy
+import threading
+import time
+
+
+__all__ = [
+    'ParameterWatcher',
+    'RospyParameterServer',
+    'LocalParameterServer',
+    'ParameterSubscriptionNotSupported',
+]
+
+
+class ParameterSubscriptionNotSupported(Exception):
+    """ The parameter server cannot notify the changes; use polling. """
+
+
+class RospyParameterServer():
+    """
+        The ROS parameter server, using the subscription API of the master:
+        the master calls paramUpdate() on the node when a subscribed
+        parameter changes, and rospy stores the new value in its
+        parameter cache; we intercept the updates of the cache.
+    """
+
+    def __init__(self):
+        try:
+            import rospy  # @UnresolvedImport
+            from rospy.impl.paramserver import get_param_server_cache  # @UnresolvedImport
+        except ImportError as e:
+            raise ParameterSubscriptionNotSupported(str(e))
+        if not hasattr(rospy, 'get_param_cached'):
+            msg = 'This version of rospy does not have get_param_cached().'
+            raise ParameterSubscriptionNotSupported(msg)
+        self.rospy = rospy
+        self.cache = get_param_server_cache()
+        self.callbacks = []
+
+        update = self.cache.update
+
+        def update_and_notify(key, value):
+            try:
+                update(key, value)
+            except KeyError:
+                # the value was not in the cache (it was not set when we
+                # subscribed); we want to know about it anyway
+                pass
+            # the master uses the canonical names with a trailing slash
+            name = key.rstrip('/')
+            for callback in list(self.callbacks):
+                callback(name, value)
+
+        self.cache.update = update_and_notify
+
+    def resolve_name(self, name):
+        return self.rospy.resolve_name(name)
+
+    def get_param(self, name):
+        return self.rospy.get_param(name)
+
+    def subscribe(self, names, callback):
+        """ Calls callback(name, value) when one of the parameters changes. """
+        self.callbacks.append(callback)
+        for name in names:
+            # subscribes to the parameter
+            try:
+                self.rospy.get_param_cached(name)
+            except KeyError:
+                # The parameter is not set (e.g. its value is None);
+                # the subscription is registered anyway.
+                pass
+
+
+class LocalParameterServer():
+    """ An in-process stand-in for the ROS parameter server, for tests. """
+
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+        self.subscribers = []
+        self.num_get_param = 0
+
+    def resolve_name(self, name):
+        return name
+
+    def get_param(self, name):
+        self.num_get_param += 1
+        return deepcopy(self.values[name])
+
+    def set_param(self, name, value):
+        self.values[name] = deepcopy(value)
+        # like the ROS master, it notifies also if the value is the same
+        for names, callback in self.subscribers:
+            if name in names:
+                callback(name, deepcopy(value))
+
+    def subscribe(self, names, callback):
+        self.subscribers.append((set(names), callback))
+
+
+class ParameterWatcher():
+    """
+        Subscribes to the parameters in the server, and calls
+
+            on_changed(changed)
+
+        where changed is a dict name -> value with only the parameters
+        whose value is different from the last one delivered.
+
+        The changes that arrive within batch_delay seconds are delivered
+        together, and the deliveries are at least min_interval seconds
+        apart; on_changed() is called from a separate thread.
+    """
+
+    def __init__(self, server, values, on_changed, min_interval, batch_delay=0.05):
+        """ values: dict name -> current value """
+        self.server = server
+        self.values = dict(values)
+        self.on_changed = on_changed
+        self.min_interval = min_interval
+        self.batch_delay = batch_delay
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.timer = None
+        self.last_delivery = None
+        # resolved name -> name
+        self.resolved = dict((server.resolve_name('~' + _), _) for _ in values)
+
+    def start(self):
+        self.server.subscribe(list(self.resolved), self._notified)
+
+    def stop(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+    def _notified(self, resolved_name, value):
+        if not resolved_name in self.resolved:
+            return
+        name = self.resolved[resolved_name]
+        with self.lock:
+            self.pending[name] = value
+            if self.timer is None:
+                delay = self.batch_delay
+                if self.last_delivery is not None:
+                    next_delivery = self.last_delivery + self.min_interval
+                    delay = max(delay, next_delivery - time.time())
+                self.timer = threading.Timer(delay, self._deliver)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def _deliver(self):
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+            self.timer = None
+            self.last_delivery = time.time()
+            changed = {}
+            for name, value in pending.items():
+                if value != self.values[name]:
+                    changed[name] = value
+                    self.values[name] = value
+        if changed:
+            self.on_changed(changed)
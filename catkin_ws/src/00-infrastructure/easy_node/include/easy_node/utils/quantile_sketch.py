@@ -0,0 +1,106 @@
+import math
+
+
+__all__ = ['QuantileSketch']
+
+
+class QuantileSketch():
+    """
+        A streaming estimate of the quantiles of a sequence of numbers,
+        in fixed memory.
+
+        The values are counted in buckets whose bounds grow geometrically
+        (as in DDSketch), so that the quantiles have a relative error of
+        at most relative_accuracy. At most max_bins buckets are kept for
+        each sign; if there are more, the buckets of the values closest
+        to zero are merged, which only affects the low quantiles.
+
+        Two sketches with the same parameters can be merged, for example
+        to combine the statistics of several nodes or runs.
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_bins=512):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        # key -> count, for the positive values and for the absolute
+        # values of the negative values
+        self.positive = {}
+        self.negative = {}
+        self.zero = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def add(self, v):
+        if v > 0:
+            self._add_to(self.positive, self._key(v), 1)
+        elif v < 0:
+            self._add_to(self.negative, self._key(-v), 1)
+        else:
+            self.zero += 1
+        self.count += 1
+        if self.min is None or v < self.min:
+            self.min = v
+        if self.max is None or v > self.max:
+            self.max = v
+
+    def merge(self, other):
+        """ Adds the values counted by the other sketch. """
+        if other.gamma != self.gamma:
+            msg = ('Cannot merge sketches with different accuracy (%s, %s).' %
+                   (self.relative_accuracy, other.relative_accuracy))
+            raise ValueError(msg)
+        for key, n in other.positive.items():
+            self._add_to(self.positive, key, n)
+        for key, n in other.negative.items():
+            self._add_to(self.negative, key, n)
+        self.zero += other.zero
+        self.count += other.count
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def quantile(self, q):
+        """ Returns the estimate of the q-quantile (0 <= q <= 1), or None if empty. """
+        if not 0 <= q <= 1:
+            raise ValueError('Invalid quantile %r.' % q)
+        if self.count == 0:
+            return None
+        if q == 0:
+            return self.min
+        if q == 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return self._clip(-self._value(key))
+        seen += self.zero
+        if seen > rank:
+            return 0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._clip(self._value(key))
+        return self.max
+
+    def _key(self, v):
+        return int(math.ceil(math.log(v) / self.log_gamma))
+
+    def _value(self, key):
+        # the point of the bucket (gamma^(key-1), gamma^key] with the smallest relative error
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def _clip(self, v):
+        return min(max(v, self.min), self.max)
+
+    def _add_to(self, bins, key, n):
+        bins[key] = bins.get(key, 0) + n
+        if len(bins) > self.max_bins:
+            # merges the two buckets closest to zero
+            keys = sorted(bins)
+            bins[keys[1]] += bins.pop(keys[0])
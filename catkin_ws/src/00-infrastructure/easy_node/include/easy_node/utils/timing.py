@@ -1,10 +1,13 @@
-from collections import defaultdict
+from collections import defaultdict, deque
 from contextlib import contextmanager
+import heapq
 import rospy
 import time
 
 from duckietown_utils.text_utils import seconds_as_ms
 
+from .quantile_sketch import QuantileSketch
+
 
 __all__ = ['ProcessingTimingStats']
 
@@ -49,6 +52,10 @@ class ProcessingTimingStats():
                 ...
                 
         A call to reset() resets all counters.
+        
+        The memory used does not grow with the number of messages
+        (see SingleStat), and the statistics of several instances
+        (e.g. from different nodes or runs) can be combined with merge().
     """
     
     def __init__(self):
@@ -59,8 +66,9 @@ class ProcessingTimingStats():
         self.events = []
         self.last_msg_received = None
         self.last_msg_being_processed = None
-        self.stats = defaultdict(lambda: SingleStat())
+        self.stats = defaultdict(SingleStat)
         self.phase_names = []
+        self.drop_reasons = []
         
     def received_message(self, msg):
         self.stats['received'].sample()
@@ -73,8 +81,44 @@ class ProcessingTimingStats():
     def decided_to_skip(self):
         self.stats['skipped'].sample()
     
+    def dropped(self, reason):
+        """ A message was dropped by the worker pool (e.g. "queue full", "deadline"). """
+        if not reason in self.drop_reasons:
+            self.drop_reasons.append(reason)
+        self.stats[('dropped', reason)].sample()
+        self.decided_to_skip()
+        
+    def queue_length(self, n):
+        """ Number of messages waiting for a worker. """
+        self.stats['queue'].sample(n)
+        
+    def get_queue_length(self):
+        return self.stats['queue'].last_value() or 0
+    
+    def get_num_dropped(self, reason):
+        return self.stats[('dropped', reason)].num()
+    
+    def merge(self, other):
+        """ Adds the statistics of another ProcessingTimingStats. """
+        for key, stat in other.stats.items():
+            self.stats[key].merge(stat)
+        for phase_name in other.phase_names:
+            if not phase_name in self.phase_names:
+                self.phase_names.append(phase_name)
+        for reason in other.drop_reasons:
+            if not reason in self.drop_reasons:
+                self.drop_reasons.append(reason)
+    
     @contextmanager
-    def phase(self, phase_name): 
+    def phase(self, phase_name, t_acquired=None): 
+        """
+            t_acquired is the acquisition time of the message being processed;
+            by default, the one of the last message that we decided to process,
+            which is not the right one if several messages are processed
+            at the same time.
+        """
+        if t_acquired is None:
+            t_acquired = self.last_msg_being_processed
         if not phase_name in self.phase_names:
             self.phase_names.append(phase_name)
             
@@ -88,7 +132,7 @@ class ProcessingTimingStats():
             t2 = rospy.get_time()   # @UndefinedVariable
             delta_clock = c2 - c1
             delta_wall = t2 - t1
-            latency_from_acquisition = t2 - self.last_msg_being_processed
+            latency_from_acquisition = t2 - t_acquired
 
         self.stats[(phase_name, 'clock')].sample(delta_clock)
         self.stats[(phase_name, 'wall')].sample(delta_wall)
@@ -111,6 +155,13 @@ class ProcessingTimingStats():
                 skipped_percentage, 
             )
         
+        if self.drop_reasons or self.stats['queue'].num():
+            dropped = ", ".join('%s %d' % (reason, self.get_num_dropped(reason))
+                                for reason in self.drop_reasons)
+            s += '\nqueue %d (max %d) dropped: %s' % (self.get_queue_length(), 
+                                                      self.stats['queue'].max_value() or 0, 
+                                                      dropped or 'none')
+        
         for phase_name in self.phase_names:
             stats_clock = self.stats[(phase_name, 'clock')]
             stats_wall = self.stats[(phase_name, 'wall')]
@@ -119,8 +170,10 @@ class ProcessingTimingStats():
             total_latency = seconds_as_ms(stats_latency.last_value())
             delta_wall = seconds_as_ms(stats_wall.last_value())
             delta_clock = seconds_as_ms(stats_clock.last_value())
-            msg = ('%20s | total latency %10s | delta wall %10s | delta clock %10s' %
-                   (phase_name, total_latency, delta_wall, delta_clock))
+            p50, p95, p99 = [seconds_as_ms(stats_wall.quantile(_)) for _ in [0.5, 0.95, 0.99]]
+            msg = ('%20s | total latency %10s | delta wall %10s | delta clock %10s'
+                   ' | wall p50 %10s p95 %10s p99 %10s' %
+                   (phase_name, total_latency, delta_wall, delta_clock, p50, p95, p99))
             s += '\n' + msg
         return s
 #                 acquired | total latency 49737091899.9ms | delta wall     None clock     None
@@ -134,40 +187,98 @@ class ProcessingTimingStats():
 #               pub_image | total latency 49737091909.8ms | delta wall    0.1ms clock    0.1ms
 #    pub_edge/pub_segment | total latency 49737091910.8ms | delta wall    1.1ms clock    1.1ms
    
+# Number of recent samples used to compute the rate
+RECENT_SAMPLES = 100
+
 class SingleStat():
+    """
+        Statistics of the samples of one quantity, in fixed memory:
+        the number of samples, the last, maximum and total value, the times 
+        of the last RECENT_SAMPLES samples (for the rate) and a 
+        QuantileSketch of the values.
+    """
     
     def __init__(self):
-        self.times = []
-        self.values = []
+        self.n = 0
+        self.t_first = None
+        self.t_last = None
+        self.recent_times = deque(maxlen=RECENT_SAMPLES)
+        self.last = None
+        self.max = None
+        self.sum = 0.0
+        self.sketch = QuantileSketch()
     
     def sample(self, v=None):
         t = rospy.get_time()  # @UndefinedVariable
-        self.times.append(t)
-        self.values.append(v)
+        self.n += 1
+        if self.t_first is None:
+            self.t_first = t
+        self.t_last = t
+        self.recent_times.append(t)
+        self.last = v
+        if v is not None:
+            if self.max is None or v > self.max:
+                self.max = v
+            self.sum += v
+            self.sketch.add(v)
+
+    def merge(self, other):
+        """ Adds the samples of another SingleStat. """
+        if other.n == 0:
+            return
+        if self.t_last is None or other.t_last >= self.t_last:
+            self.last = other.last
+            self.t_last = other.t_last
+        if self.t_first is None or other.t_first < self.t_first:
+            self.t_first = other.t_first
+        self.n += other.n
+        times = heapq.merge(self.recent_times, other.recent_times)
+        self.recent_times = deque(times, maxlen=RECENT_SAMPLES)
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        self.sum += other.sum
+        self.sketch.merge(other.sketch)
 
     def last_value(self):
-        if self.values:
-            return self.values[-1]
-        else:
-            return None
+        return self.last
+    
+    def max_value(self):
+        return self.max
+    
+    def sum_values(self):
+        return self.sum
+    
+    def num_values(self):
+        """ Returns the number of samples that had a value. """
+        return self.sketch.count
+    
+    def quantile(self, q):
+        """ Returns an estimate of the q-quantile of the values, or None. """
+        return self.sketch.quantile(q)
     
     def num(self):
         """ Returns the number of samples. """
-        return len(self.times)
+        return self.n
+    
+    def rate(self):
+        """ Returns the samples per second, in the window of the recent samples. """
+        n = len(self.recent_times)
+        if n == 0:
+            return 0.0
+        duration = rospy.get_time() - self.recent_times[0]  # @UndefinedVariable
+        if duration <= 0:
+            return 0.0
+        return n / duration
     
     def fps(self):
         """ Returns the frames per second as a string. """
-        n = self.num()
-        if n == 0:
-            return '0 fps'
-        else:
-            duration = self.duration()
-            f = n / duration
-            return '%.1f fps' % f
+        return '%.1f fps' % self.rate()
              
     def duration(self):
+        if self.t_first is None:
+            return 0.0
         delta = rospy.get_time()  # @UndefinedVariable
-        return delta - self.times[0]
+        return delta - self.t_first
     
 def get_percentage(i, n):
     if n == 0: 
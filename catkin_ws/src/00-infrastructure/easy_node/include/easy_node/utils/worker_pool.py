@@ -0,0 +1,93 @@
+from collections import deque
+import threading
+import time
+import traceback
+
+from duckietown_utils import logger
+
+
+__all__ = [
+    'SubscriptionWorkerPool',
+    'POLICY_LATEST',
+    'POLICY_FIFO',
+    'POLICY_VALUES',
+]
+
+# When the queue is full, the oldest waiting message is replaced by the new one
+POLICY_LATEST = 'latest'
+# When the queue is full, the new message is dropped
+POLICY_FIFO = 'fifo'
+POLICY_VALUES = [POLICY_LATEST, POLICY_FIFO]
+
+
+class SubscriptionWorkerPool():
+    """
+        Processes the messages of a threaded subscription with a fixed
+        number of worker threads.
+
+        At most queue_length messages wait for a free worker; when the
+        queue is full, the policy decides which message is dropped.
+        A message that waited more than deadline seconds (None for no
+        deadline) is dropped instead of being processed.
+
+        The queue length and the dropped messages are recorded in the
+        ProcessingTimingStats pts.
+    """
+
+    def __init__(self, name, process, pts, workers=1, queue_length=0,
+                 policy=POLICY_LATEST, deadline=None):
+        """ process(data) is called by the workers. """
+        if not policy in POLICY_VALUES:
+            msg = 'Invalid policy %r not in %r.' % (policy, POLICY_VALUES)
+            raise ValueError(msg)
+        self.name = name
+        self.process = process
+        self.pts = pts
+        self.queue_length = queue_length
+        self.policy = policy
+        self.deadline = deadline
+        self.cond = threading.Condition()
+        # (time received, data)
+        self.queue = deque()
+        self.idle = 0
+        self.threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._work, name='%s-%d' % (name, i))
+            t.setDaemon(True)
+            t.start()
+            self.threads.append(t)
+
+    def submit(self, data):
+        """ Called by the subscriber for each message; it does not block. """
+        with self.cond:
+            # the messages taken by idle workers do not wait in the queue
+            capacity = self.queue_length + self.idle
+            if len(self.queue) < capacity:
+                self.queue.append((time.time(), data))
+                self.cond.notify()
+            elif self.policy == POLICY_LATEST and self.queue:
+                self.queue.popleft()
+                self.queue.append((time.time(), data))
+                self.pts.dropped('queue full')
+            else:
+                self.pts.dropped('queue full')
+            self.pts.queue_length(len(self.queue))
+
+    def _work(self):
+        while True:
+            with self.cond:
+                while not self.queue:
+                    self.idle += 1
+                    self.cond.wait()
+                    self.idle -= 1
+                t_received, data = self.queue.popleft()
+                self.pts.queue_length(len(self.queue))
+
+            if self.deadline is not None and time.time() - t_received > self.deadline:
+                self.pts.dropped('deadline')
+                continue
+            try:
+                self.process(data)
+            except Exception:
+                msg = 'Error while processing a message of %s:\n%s' % (self.name, traceback.format_exc())
+                logger.error(msg)
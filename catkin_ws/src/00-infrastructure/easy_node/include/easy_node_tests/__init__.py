@@ -3,6 +3,10 @@
 def jobs_comptests(context):  
     from . import summary 
     from . import test_configuration 
+    from . import parameter_updates
+    from . import worker_pool
+    from . import quantile_sketch
+    from . import metrics
     
 
     from comptests.registrar import jobs_registrar_simple
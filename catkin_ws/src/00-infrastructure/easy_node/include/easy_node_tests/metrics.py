@@ -0,0 +1,131 @@
+from collections import defaultdict
+import os
+import shutil
+import tempfile
+
+from comptests.registrar import comptest, run_module_tests
+
+from easy_node.utils.metrics import format_metrics, MetricsFileSink
+
+
+class Stat():
+    """ Same interface as SingleStat, with given values. """
+
+    def __init__(self, values=(), rate=0.0):
+        self.values = list(values)
+        self._rate = rate
+
+    def num(self):
+        return len(self.values)
+
+    def num_values(self):
+        return len(self.values)
+
+    def sum_values(self):
+        return sum(self.values)
+
+    def rate(self):
+        return self._rate
+
+    def quantile(self, q):
+        if not self.values:
+            return None
+        values = sorted(self.values)
+        return values[int(q * (len(values) - 1))]
+
+
+class PTS():
+    """ Same interface as ProcessingTimingStats. """
+
+    def __init__(self):
+        self.stats = defaultdict(Stat)
+        self.phase_names = []
+        self.drop_reasons = []
+
+    def get_num_dropped(self, reason):
+        return self.stats[('dropped', reason)].num()
+
+    def get_queue_length(self):
+        return 1
+
+
+def get_pts():
+    pts = PTS()
+    pts.stats['received'] = Stat([None] * 10, rate=30.0)
+    pts.stats['processed'] = Stat([None] * 8, rate=24.0)
+    pts.stats['skipped'] = Stat([None] * 2, rate=6.0)
+    pts.drop_reasons = ['queue full']
+    pts.stats[('dropped', 'queue full')] = Stat([None] * 2)
+    pts.stats['queue'] = Stat([0, 1])
+    pts.phase_names = ['decoding', 'detection "lines"']
+    pts.stats[('decoding', 'wall')] = Stat([0.01, 0.02, 0.03])
+    pts.stats[('detection "lines"', 'wall')] = Stat([0.1])
+    return pts
+
+
+def parse(text):
+    """ Returns the dict line without value -> value, and the types. """
+    samples = {}
+    types = {}
+    for line in text.split('\n'):
+        if not line:
+            continue
+        if line.startswith('# TYPE '):
+            _, _, name, type_ = line.split(' ')
+            types[name] = type_
+            continue
+        if line.startswith('#'):
+            continue
+        key, value = line.rsplit(' ', 1)
+        assert not key in samples, key
+        samples[key] = float(value)
+    return samples, types
+
+
+@comptest
+def metrics_format():
+    text = format_metrics('/duckiebot/line_detector_node2', dict(image=get_pts()))
+    samples, types = parse(text)
+
+    l = 'node="/duckiebot/line_detector_node2",subscription="image"'
+    assert samples['easy_node_messages_total{%s,event="received"}' % l] == 10
+    assert samples['easy_node_messages_per_second{%s,event="processed"}' % l] == 24.0
+    assert samples['easy_node_dropped_total{%s,reason="queue full"}' % l] == 2
+    assert samples['easy_node_queue_length{%s}' % l] == 1
+    lp = l + ',phase="decoding"'
+    assert samples['easy_node_phase_wall_seconds{%s,quantile="0.5"}' % lp] == 0.02
+    assert samples['easy_node_phase_wall_seconds_count{%s}' % lp] == 3
+    assert abs(samples['easy_node_phase_wall_seconds_sum{%s}' % lp] - 0.06) < 1e-9
+    # no samples
+    s = samples['easy_node_phase_clock_seconds{%s,quantile="0.99"}' % lp]
+    assert s != s  # NaN
+    # escaped
+    lp = l + ',phase="detection \\"lines\\""'
+    assert samples['easy_node_phase_wall_seconds{%s,quantile="0.95"}' % lp] == 0.1
+
+    assert types['easy_node_messages_total'] == 'counter'
+    assert types['easy_node_queue_length'] == 'gauge'
+    assert types['easy_node_phase_latency_seconds'] == 'summary'
+    # each family is declared once
+    assert text.count('# TYPE easy_node_phase_wall_seconds ') == 1
+
+
+@comptest
+def metrics_file_sink():
+    d = tempfile.mkdtemp()
+    try:
+        fn = os.path.join(d, 'sub', 'node.prom')
+        sink = MetricsFileSink(fn)
+        text = format_metrics('node', dict(image=get_pts()))
+        sink.write(text)
+        sink.write(text)
+        with open(fn) as f:
+            assert f.read() == text
+        # no temporary files left
+        assert os.listdir(os.path.dirname(fn)) == ['node.prom']
+    finally:
+        shutil.rmtree(d)
+
+
+if __name__ == '__main__':
+    run_module_tests()
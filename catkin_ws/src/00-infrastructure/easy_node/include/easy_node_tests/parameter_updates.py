@@ -0,0 +1,137 @@
+from contextlib import contextmanager
+import sys
+import time
+import types
+
+from comptests.registrar import comptest, run_module_tests
+
+from easy_node.utils.parameter_updates import (LocalParameterServer, ParameterWatcher,
+    RospyParameterServer)
+
+
+def wait_for(condition, timeout=2.0):
+    t0 = time.time()
+    while not condition():
+        if time.time() - t0 > timeout:
+            raise Exception('Timeout')
+        time.sleep(0.01)
+
+
+@comptest
+def parameter_updates_batched():
+    values = {'a': 1, 'b': [1, 2], 'c': 'x'}
+    server = LocalParameterServer(dict(('~' + k, v) for k, v in values.items()))
+    calls = []
+    watcher = ParameterWatcher(server, values, calls.append, min_interval=0.3, batch_delay=0.05)
+    watcher.start()
+
+    # the same value is not a change
+    server.set_param('~c', 'x')
+    server.set_param('~a', 2)
+    server.set_param('~b', [1, 2, 3])
+    server.set_param('~a', 3)
+    wait_for(lambda: len(calls) == 1)
+    assert calls[0] == {'a': 3, 'b': [1, 2, 3]}, calls
+    t1 = time.time()
+
+    # the next changes are delivered not before min_interval
+    server.set_param('~c', 'y')
+    wait_for(lambda: len(calls) == 2)
+    assert time.time() - t1 >= 0.2
+    assert calls[1] == {'c': 'y'}
+
+    # changed and changed back before the delivery
+    server.set_param('~a', 4)
+    server.set_param('~a', 3)
+    time.sleep(0.5)
+    assert len(calls) == 2
+
+    # parameters that are not watched are ignored
+    server.set_param('~other', 1)
+    time.sleep(0.1)
+    assert len(calls) == 2
+
+    # no polling
+    assert server.num_get_param == 0
+    watcher.stop()
+
+
+class FakeParamServerCache():
+    """ Like rospy.impl.paramserver.ParamServerCache, with flat keys. """
+
+    def __init__(self):
+        self.d = {}
+
+    def set(self, key, value):
+        self.d[key] = value
+
+    def update(self, key, value):
+        if not key in self.d:
+            raise KeyError(key)
+        self.d[key] = value
+
+
+@contextmanager
+def fake_rospy(values):
+    """ Replaces rospy with a fake one, whose master has the given values. """
+    cache = FakeParamServerCache()
+
+    def get_param_cached(name):
+        # like rospy: it subscribes, then looks in the cache
+        key = name + '/'
+        if not key in cache.d:
+            value = values.get(name)
+            if value is not None:
+                cache.set(key, value)
+            subscribed.append(name)
+        if not key in cache.d:
+            raise KeyError(name)
+        return cache.d[key]
+
+    subscribed = []
+    rospy = types.ModuleType('rospy')
+    rospy.get_param_cached = get_param_cached
+    rospy.get_param = lambda name: values[name]
+    rospy.resolve_name = lambda name: '/node/' + name[1:] if name.startswith('~') else name
+    paramserver = types.ModuleType('rospy.impl.paramserver')
+    paramserver.get_param_server_cache = lambda: cache
+
+    names = ['rospy', 'rospy.impl', 'rospy.impl.paramserver']
+    previous = dict((_, sys.modules.get(_)) for _ in names)
+    sys.modules['rospy'] = rospy
+    sys.modules['rospy.impl'] = types.ModuleType('rospy.impl')
+    sys.modules['rospy.impl.paramserver'] = paramserver
+    try:
+        yield cache, subscribed
+    finally:
+        for name, module in previous.items():
+            if module is None:
+                del sys.modules[name]
+            else:
+                sys.modules[name] = module
+
+
+@comptest
+def parameter_updates_rospy_null_default():
+    # "b" has a null default, so it is not set on the parameter server
+    values = {'a': 1, 'b': None}
+    with fake_rospy({'/node/a': 1}) as (cache, subscribed):
+        server = RospyParameterServer()
+        calls = []
+        watcher = ParameterWatcher(server, values, calls.append, min_interval=0.1, batch_delay=0.01)
+        watcher.start()
+        assert sorted(subscribed) == ['/node/a', '/node/b'], subscribed
+
+        # the master notifies the node (the cache does not have "b")
+        cache.update('/node/b/', 3)
+        wait_for(lambda: len(calls) == 1)
+        assert calls[0] == {'b': 3}, calls
+
+        cache.update('/node/a/', 2)
+        wait_for(lambda: len(calls) == 2)
+        assert calls[1] == {'a': 2}, calls
+        watcher.stop()
+
+
+if __name__ == '__main__':
+    run_module_tests()
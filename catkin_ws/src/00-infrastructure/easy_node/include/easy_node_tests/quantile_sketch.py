@@ -0,0 +1,82 @@
+import random
+
+from comptests.registrar import comptest, run_module_tests
+
+from easy_node.utils.quantile_sketch import QuantileSketch
+
+
+def exact_quantile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+def check_close(sketch, values, q):
+    expected = exact_quantile(values, q)
+    found = sketch.quantile(q)
+    error = abs(found - expected)
+    assert error <= sketch.relative_accuracy * abs(expected) + 1e-12, (q, expected, found)
+
+
+@comptest
+def quantile_sketch_accuracy():
+    random.seed(1)
+    values = [random.expovariate(100.0) for _ in range(10000)]
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for v in values:
+        sketch.add(v)
+    assert sketch.count == len(values)
+    for q in [0.01, 0.25, 0.5, 0.95, 0.99]:
+        check_close(sketch, values, q)
+    assert sketch.quantile(0) == min(values)
+    assert sketch.quantile(1) == max(values)
+
+
+@comptest
+def quantile_sketch_signs():
+    values = [-3.0, -1.0, 0, 0, 2.0, 5.0, 7.0]
+    sketch = QuantileSketch()
+    for v in values:
+        sketch.add(v)
+    for q in [0.1, 0.3, 0.5, 0.7, 0.9]:
+        check_close(sketch, values, q)
+
+
+@comptest
+def quantile_sketch_bounded():
+    sketch = QuantileSketch(relative_accuracy=0.01, max_bins=64)
+    values = [1.1 ** i for i in range(1000)]
+    for v in values:
+        sketch.add(v)
+    assert len(sketch.positive) <= 64
+    # the high quantiles are not affected
+    check_close(sketch, values, 0.99)
+    assert QuantileSketch().quantile(0.5) is None
+
+
+@comptest
+def quantile_sketch_merge():
+    random.seed(2)
+    values = [random.uniform(0.001, 0.1) for _ in range(3000)]
+    sketches = []
+    for i in range(3):
+        sketch = QuantileSketch()
+        for v in values[i::3]:
+            sketch.add(v)
+        sketches.append(sketch)
+    merged = QuantileSketch()
+    for sketch in sketches:
+        merged.merge(sketch)
+    assert merged.count == len(values)
+    assert merged.max == max(values)
+    for q in [0.5, 0.95, 0.99]:
+        check_close(merged, values, q)
+    try:
+        merged.merge(QuantileSketch(relative_accuracy=0.05))
+    except ValueError:
+        pass
+    else:
+        raise Exception('Expected ValueError')
+
+
+if __name__ == '__main__':
+    run_module_tests()
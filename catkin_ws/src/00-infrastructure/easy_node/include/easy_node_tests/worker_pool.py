@@ -0,0 +1,122 @@
+import threading
+import time
+
+from comptests.registrar import comptest, run_module_tests
+
+from easy_node.utils.worker_pool import POLICY_FIFO, POLICY_LATEST, SubscriptionWorkerPool
+
+
+class Stats():
+    """ Records what the pool tells the ProcessingTimingStats. """
+
+    def __init__(self):
+        self.dropped_reasons = []
+        self.queue_lengths = []
+
+    def dropped(self, reason):
+        self.dropped_reasons.append(reason)
+
+    def queue_length(self, n):
+        self.queue_lengths.append(n)
+
+
+class Blocking():
+    """ Processes the messages only when allowed. """
+
+    def __init__(self):
+        self.processed = []
+        self.started = threading.Semaphore(0)
+        self.go = threading.Semaphore(0)
+
+    def __call__(self, data):
+        self.started.release()
+        self.go.acquire()
+        self.processed.append(data)
+
+
+def wait_for(condition, timeout=2.0):
+    t0 = time.time()
+    while not condition():
+        if time.time() - t0 > timeout:
+            raise Exception('Timeout')
+        time.sleep(0.01)
+
+
+def run(policy, queue_length, workers=1, deadline=None, n=5):
+    process = Blocking()
+    stats = Stats()
+    pool = SubscriptionWorkerPool('test', process, stats, workers=workers,
+                                  queue_length=queue_length, policy=policy,
+                                  deadline=deadline)
+    wait_for(lambda: pool.idle == workers)
+    pool.submit(0)
+    process.started.acquire()
+    # the others arrive while the worker is busy
+    for i in range(1, n):
+        pool.submit(i)
+    return pool, process, stats
+
+
+@comptest
+def worker_pool_latest():
+    pool, process, stats = run(POLICY_LATEST, queue_length=2)
+    assert max(stats.queue_lengths) == 2
+    for _ in range(3):
+        process.go.release()
+    wait_for(lambda: len(process.processed) == 3)
+    # the newest ones are processed
+    assert process.processed == [0, 3, 4], process.processed
+    assert stats.dropped_reasons == ['queue full'] * 2
+    # the queue was full, then emptied
+    assert stats.queue_lengths[-1] == 0
+    # 1 and 2 were dropped: there is nothing else to process
+    process.go.release()
+    time.sleep(0.1)
+    assert process.processed == [0, 3, 4], process.processed
+    assert pool.idle == 1
+
+
+@comptest
+def worker_pool_fifo():
+    _, process, stats = run(POLICY_FIFO, queue_length=2)
+    for _ in range(3):
+        process.go.release()
+    wait_for(lambda: len(process.processed) == 3)
+    # the oldest ones are processed
+    assert process.processed == [0, 1, 2], process.processed
+    assert stats.dropped_reasons == ['queue full'] * 2
+
+
+@comptest
+def worker_pool_no_queue():
+    # like a single thread that drops the messages while busy
+    _, process, stats = run(POLICY_LATEST, queue_length=0)
+    process.go.release()
+    wait_for(lambda: len(process.processed) == 1)
+    assert stats.dropped_reasons == ['queue full'] * 4
+
+
+@comptest
+def worker_pool_deadline():
+    _, process, stats = run(POLICY_FIFO, queue_length=2, deadline=0.1, n=3)
+    time.sleep(0.2)
+    process.go.release()
+    wait_for(lambda: stats.dropped_reasons == ['deadline'] * 2)
+    assert process.processed == [0]
+
+
+@comptest
+def worker_pool_workers():
+    _, process, stats = run(POLICY_FIFO, queue_length=0, workers=3, n=3)
+    # the other two workers took the other messages
+    process.started.acquire()
+    process.started.acquire()
+    for _ in range(3):
+        process.go.release()
+    wait_for(lambda: len(process.processed) == 3)
+    assert sorted(process.processed) == [0, 1, 2]
+    assert stats.dropped_reasons == []
+
+
+if __name__ == '__main__':
+    run_module_tests()
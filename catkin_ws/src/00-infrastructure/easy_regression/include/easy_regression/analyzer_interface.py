@@ -24,5 +24,43 @@ class AnalyzerInterface(object):
     
     def summarize_as_image(self):
         raise NotImplementedError()
+
+
+class StreamingAnalyzerInterface(AnalyzerInterface):
+    """ 
+        An analyzer that looks at one message at a time, so that
+        the framework can read each bag only once for all analyzers.
+        
+        For each log, the framework calls start(), then on_message()
+        for each message in the topics returned by get_topics(), 
+        then finalize().
+    """
+    
+    def get_topics(self):
+        """ 
+            Returns the list of topics to which the analyzer subscribes,
+            or None for all topics.
+        """
+        return None
     
-    
\ No newline at end of file
+    def start(self):
+        """ Called before the first message of a log. """
+    
+    @abstractmethod
+    def on_message(self, topic, msg, t):
+        """ Called for each message. """
+    
+    @abstractmethod
+    def finalize(self, dict_out):
+        """ 
+            Called after the last message.
+            
+            dict_out: a dict-like structure where you can store stuff.
+        """
+        
+    def analyze_log(self, bag_in, dict_out):
+        self.start()
+        for topic, msg, t in bag_in.read_messages(topics=self.get_topics()):
+            self.on_message(topic, msg, t)
+        self.finalize(dict_out)
+
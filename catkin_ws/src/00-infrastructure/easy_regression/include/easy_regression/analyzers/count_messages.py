@@ -1,13 +1,15 @@
-from easy_regression.analyzer_interface import AnalyzerInterface
+from easy_regression.analyzer_interface import StreamingAnalyzerInterface
 
-class CountMessages(AnalyzerInterface):
+class CountMessages(StreamingAnalyzerInterface):
     
-    def analyze_log(self, bag_in, dict_out):
-        n = 0
-        for _ in bag_in.read_messages():
-            n += 1
-            
-        dict_out['num_messages'] = n
+    def start(self):
+        self.n = 0
+    
+    def on_message(self, topic, msg, t):  # @UnusedVariable
+        self.n += 1
+        
+    def finalize(self, dict_out):
+        dict_out['num_messages'] = self.n
         dict_out['num_logs'] = 1
         dict_out['average_num_messages'] = 1
     
@@ -1,4 +1,5 @@
 from collections import OrderedDict
+import hashlib
 import os
 
 from duckietown_utils import logger
@@ -9,6 +10,8 @@ from duckietown_utils.text_utils import format_table_plus
 from duckietown_utils.yaml_pretty import yaml_dump_pretty
 from easy_algo.algo_db import get_easy_algo_db
 from easy_regression.analyzer_interface import AnalyzerInterface
+from easy_regression.processing_cache import bag_content_hash, get_processing_cache
+from easy_regression.streaming import AnalyzerDispatcher, dispatch_messages
 import rosbag  # @UnresolvedImport
 
 
@@ -43,6 +46,64 @@ def table_for_analyzer(results_all):
     
     return table
 
+# maximum number of results merged by one job
+MERGE_FANOUT = 16
+
+def jobs_merge_tree(context, results, analyzer, fanout=MERGE_FANOUT):
+    """
+        Creates the jobs that merge the results of the analyzer for all 
+        the logs, as a tree of job_merge() jobs, so that they can run in 
+        parallel. Returns the promise for the total.
+        
+        results: OrderedDict log name -> results (or promise)
+        
+        The logs are divided in consecutive groups at boundaries that
+        depend only on the log names (see merge_groups()), and each job 
+        is named after the first log of its group; so, when a log is added
+        or removed, only the jobs on the path to the root change, and 
+        the others are reused from the previous run.
+    """
+    if not results:
+        msg = 'No results to merge for analyzer %r.' % analyzer
+        raise ValueError(msg)
+    items = list(results.items())
+    level = 0
+    while len(items) > 1:
+        next_items = []
+        for group in merge_groups(items, fanout, level):
+            key = group[0][0]
+            if len(group) == 1:
+                next_items.append(group[0])
+                continue
+            job_id = 'merge-%d-%s' % (level, key)
+            promise = context.comp(job_merge, OrderedDict(group), analyzer, job_id=job_id)
+            next_items.append((key, promise))
+        items = next_items
+        level += 1
+    return items[0][1]
+
+def merge_groups(items, fanout, level):
+    """
+        Divides the list of (key, value) in consecutive groups of 
+        at least 2 and at most fanout elements.
+        
+        A group ends after an element if a hash of its key is divisible 
+        by fanout/2, so that changing an element moves at most the
+        boundaries of the groups around it.
+    """
+    groups = []
+    group = []
+    for key, value in items:
+        group.append((key, value))
+        h = int(hashlib.md5('%s-%s' % (level, key)).hexdigest(), 16)
+        is_boundary = h % max(1, fanout // 2) == 0
+        if len(group) >= fanout or (len(group) >= 2 and is_boundary):
+            groups.append(group)
+            group = []
+    if group:
+        groups.append(group)
+    return groups
+
 def job_merge(results, analyzer):
     """
         results: log name -> results dict
@@ -57,22 +118,74 @@ def job_merge(results, analyzer):
      
 @contract(analyzer=AnalyzerInterface)
 def merge_n(analyzer, results):
-    if len(results) == 1:
-        return results[0]
-    else:
-        first=results[0]
-        rest = merge_n(analyzer, results[1:])
-        r = OrderedDict()
-        analyzer.reduce(first, rest, r)
-        return r 
+    """ 
+        Merges the results by reducing adjacent pairs, 
+        which needs only log2(n) levels.
+    """
+    if not results:
+        raise ValueError('No results to merge.')
+    while len(results) > 1:
+        merged = []
+        for i in range(0, len(results) - 1, 2):
+            r = OrderedDict()
+            analyzer.reduce(results[i], results[i + 1], r)
+            merged.append(r)
+        if len(results) % 2 == 1:
+            merged.append(results[-1])
+        results = merged
+    return results[0]
     
-@contract(analyzer=str)
-def job_analyze(log, analyzer):
-    easy_algo_db = get_easy_algo_db()
-    analyzer_instance = easy_algo_db.create_instance('analyzer', analyzer)
-    in_bag = rosbag.Bag(log)
+@contract(analyzers='list(str)')
+def job_analyze_all(log, analyzers, log_key=None, use_cache=True):
+    """
+        Runs all the analyzers on the log, reading it only once.
+        
+        The results of the analyzers are taken from the processing cache
+        if the same log was already analyzed by the same analyzer.
+        log_key identifies the contents of the log (see 
+        ProcessingCache.analysis_key()); if not given, the contents
+        of the log are hashed. If use_cache is False, the cache is not used.
+
+        Returns a dict with fields "log_out" and "results" 
+        (analyzer name -> results), like process_and_analyze_one().
+    """
+    cache = get_processing_cache() if use_cache else None
+    keys = {}
+    results = OrderedDict()
+    if cache is not None:
+        if log_key is None:
+            log_key = bag_content_hash(log)
+        keys, results = get_cached_results(cache, log_key, analyzers, log)
+    missing = [a for a in analyzers if not a in results]
+    
+    if missing:
+        easy_algo_db = get_easy_algo_db()
+        dispatcher = AnalyzerDispatcher(OrderedDict((a, easy_algo_db.create_instance('analyzer', a))
+                                                    for a in missing))
+        in_bag = rosbag.Bag(log)
+        logger.info('Running %s on %s' % (", ".join(missing), log))
+        try:
+            results.update(dispatch_messages(in_bag, dispatcher))
+        finally:
+            in_bag.close()
+        if cache is not None:
+            for a in missing:
+                cache.put_results(keys[a], results[a])
+    
+    results = OrderedDict((a, results[a]) for a in analyzers)
+    return dict(log_out=log, results=results)
+
+def get_cached_results(cache, log_key, analyzers, log):
+    """
+        Returns the dict analyzer name -> analysis key, and the 
+        OrderedDict analyzer name -> results for those in the cache.
+    """
+    keys = {}
     results = OrderedDict()
-    logger.info('Running %s on %s' % (analyzer, log))
-    analyzer_instance.analyze_log(in_bag, results)
-    in_bag.close()
-    return results
\ No newline at end of file
+    for a in analyzers:
+        keys[a] = cache.analysis_key(log_key, a)
+        cached = cache.get_results(keys[a])
+        if cached is not None:
+            logger.info('Using cached results of %s on %s' % (a, log))
+            results[a] = cached
+    return keys, results
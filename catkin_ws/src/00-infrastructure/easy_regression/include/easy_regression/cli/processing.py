@@ -1,3 +1,4 @@
+from collections import OrderedDict
 import os
 import shutil
 
@@ -7,15 +8,27 @@ from duckietown_utils.mkdirs import d8n_make_sure_dir_exists
 from easy_algo.algo_db import get_easy_algo_db
 import rosbag  # @UnresolvedImport
 from duckietown_utils.bag_reading import BagReadProxy
+from easy_regression.cli.analysis_and_stat import get_cached_results, job_analyze_all
+from easy_regression.processing_cache import get_processing_cache, link_or_copy
+from easy_regression.streaming import (AnalyzerDispatcher, MessageStream,
+    StageThread, TeeWriter, dispatch_messages, join_stages)
 
 
-def process_one(bag_filename, t0, t1, processors, log_out):
+def process_one(bag_filename, t0, t1, processors, log_out, use_cache=True):
+    """
+        Runs the processors on the interval t0, t1 of the log.
+
+        Returns a dict with fields "log_out" and "log_key", the key that 
+        identifies the contents of log_out in the processing cache 
+        (None if the cache is not used); see analyze_processed().
+    """
     logger.info('job_one()')
     logger.info('   input: %s' % bag_filename)
     logger.info('   processors: %s' % processors)
     logger.info('   out: %s' % log_out)
     
     d8n_make_sure_dir_exists(log_out)
+    remove_previous_output(log_out)
     
     tmpdir = create_tmpdir()
     tmpfiles = []
@@ -26,6 +39,20 @@ def process_one(bag_filename, t0, t1, processors, log_out):
         tmpfiles.append(f)
         return f
         
+    cache = get_processing_cache() if use_cache else None
+    key = None
+    if cache is not None:
+        if processors:
+            key = cache.processing_key(bag_filename, t0, t1, processors)
+            cached = cache.get_processed(key)
+            if cached is not None:
+                link_or_copy(cached, log_out)
+                logger.info('I created %s' % log_out)
+                return dict(log_out=log_out, log_key=key)
+        else:
+            # log_out is a link to all of the input log
+            key = cache.processing_key(bag_filename, None, None, [])
+        
     easy_algo_db = get_easy_algo_db()
     # instantiate processors
     processors_instances = [easy_algo_db.create_instance('processor', _) 
@@ -59,6 +86,10 @@ def process_one(bag_filename, t0, t1, processors, log_out):
             logger.info('(Just creating symlink, because there '
                         'was no processing done.)')
             os.symlink(os.path.realpath(bag_filename), log_out)
+        elif cache is not None:
+            cached = cache.put_processed(key, bag_filename)
+            tmpfiles.remove(bag_filename)
+            link_or_copy(cached, log_out)
         else:
             try:
                 shutil.copy(bag_filename, log_out)
@@ -71,4 +102,119 @@ def process_one(bag_filename, t0, t1, processors, log_out):
         for f in tmpfiles:
             logger.info(' deleting %s' % f)
             os.unlink(f)
-    return log_out
+    return dict(log_out=log_out, log_key=key)
+
+
+def remove_previous_output(log_out):
+    """ 
+        Removes log_out if created by a previous execution of the job. 
+        
+        It can be a hard link to a bag in the processing cache, so it 
+        must be unlinked, not overwritten.
+    """
+    if os.path.lexists(log_out):
+        os.unlink(log_out)
+
+
+def process_and_analyze_one(bag_filename, t0, t1, processors, analyzers, log_out,
+                            use_cache=True):
+    """
+        Same as process_one() followed by job_analyze_all(), 
+        but in a single pass over the log.
+
+        The processors run in threads connected by MessageStreams, 
+        so that the messages are passed in memory; the output of the 
+        last processor is written to log_out and dispatched to the 
+        analyzers by an AnalyzerDispatcher.
+
+        Returns a dict with fields "log_out" and "results" 
+        (analyzer name -> results).
+
+        If use_cache is False, the processing cache is not used.
+    """
+    logger.info('process_and_analyze_one()')
+    logger.info('   input: %s' % bag_filename)
+    logger.info('   processors: %s' % processors)
+    logger.info('   analyzers: %s' % analyzers)
+    logger.info('   out: %s' % log_out)
+
+    d8n_make_sure_dir_exists(log_out)
+    remove_previous_output(log_out)
+
+    cache = get_processing_cache() if use_cache else None
+    results = OrderedDict()
+    if cache is not None:
+        key = cache.processing_key(bag_filename, t0, t1, processors)
+        if processors:
+            cached = cache.get_processed(key)
+            if cached is not None:
+                link_or_copy(cached, log_out)
+                return job_analyze_all(log_out, analyzers, log_key=key, use_cache=use_cache)
+        else:
+            # the analyzers read the interval t0, t1 of the input log
+            _, results = get_cached_results(cache, key, analyzers, bag_filename)
+    missing = [a for a in analyzers if not a in results]
+
+    easy_algo_db = get_easy_algo_db()
+    processors_instances = [easy_algo_db.create_instance('processor', _)
+                            for _ in processors]
+    dispatcher = AnalyzerDispatcher(OrderedDict((a, easy_algo_db.create_instance('analyzer', a))
+                                                for a in missing))
+
+    in_bag = rosbag.Bag(bag_filename)
+    out_bag = None
+    try:
+        bag = BagReadProxy(in_bag, t0, t1)
+        if not processors:
+            logger.info('(Just creating symlink, because there '
+                        'was no processing done.)')
+            os.symlink(os.path.realpath(bag_filename), log_out)
+            if missing:
+                results.update(dispatch_messages(bag, dispatcher))
+        else:
+            out_bag = rosbag.Bag(log_out, 'w')
+            stages = []
+            for i, (name, p) in enumerate(zip(processors, processors_instances)):
+                if i == len(processors) - 1:
+                    output = TeeWriter([out_bag, dispatcher])
+                else:
+                    output = MessageStream('output of processor %s' % name)
+                stream_in = bag if isinstance(bag, MessageStream) else None
+                stages.append(StageThread('processor %s' % name, p.process_log, (bag, output),
+                                          input=stream_in, output=output))
+                bag = output
+
+            dispatcher.start()
+            for stage in stages:
+                stage.start()
+            join_stages(stages)
+            results.update(dispatcher.finalize())
+    finally:
+        in_bag.close()
+        if out_bag is not None:
+            out_bag.close()
+
+    if cache is not None:
+        if processors:
+            cached = cache.put_processed(key, log_out)
+            link_or_copy(cached, log_out)
+        for a in missing:
+            cache.put_results(cache.analysis_key(key, a), results[a])
+    results = OrderedDict((a, results[a]) for a in analyzers)
+    logger.info('I created %s' % log_out)
+    return dict(log_out=log_out, results=results)
+
+def processed_log(res):
+    """ Returns the log created by process_one() or process_and_analyze_one(). """
+    return res['log_out']
+
+def analyze_processed(res, analyzers, use_cache=True):
+    """ Runs job_analyze_all() on the log created by process_one(), 
+        using its key instead of hashing its contents. """
+    return job_analyze_all(res['log_out'], analyzers, log_key=res['log_key'],
+                           use_cache=use_cache)
+
+def analyzer_results(res, analyzer):
+    """ Returns the results of one analyzer from process_and_analyze_one()
+        or job_analyze_all(). """
+    return res['results'][analyzer]
@@ -0,0 +1,259 @@
+"""
+    A content-addressed cache of the logs created by the processors
+    and of the results of the analyzers, so that running a regression
+    test again only recomputes what changed.
+
+    The output of a chain of processors is keyed by the fingerprint
+    of the input bag, the interval t0, t1 and, for each processor,
+    its constructor, its parameters, the source of its package and,
+    in the same way, the instances that its parameters refer to.
+    The results of an analyzer are keyed by the key of the analyzed
+    log (the processing key, or the hash of all the contents of the
+    bag) and by the analyzer in the same way.
+"""
+import hashlib
+import inspect
+import json
+import os
+import shutil
+
+from duckietown_utils import logger
+from duckietown_utils.caching import evict_least_recently_used
+from duckietown_utils.constants import DuckietownConstants
+from duckietown_utils.friendly_path_imp import friendly_path
+from duckietown_utils.instantiate_utils import import_name
+from duckietown_utils.mkdirs import d8n_mkdirs_thread_safe
+from duckietown_utils.path_utils import expand_all
+from duckietown_utils.safe_pickling import safe_pickle_dump, safe_pickle_load
+from easy_algo.algo_db import get_easy_algo_db
+
+__all__ = [
+    'ProcessingCache',
+    'get_processing_cache',
+    'link_or_copy',
+]
+
+PROCESSING_CACHE_DIR = '${DUCKIETOWN_ROOT}/caches/easy_regression'
+PROCESSING_CACHE_MAX_SIZE = 50 * 1024 ** 3
+
+# bytes read from the beginning and from the end of a bag
+FINGERPRINT_BLOCK = 1024 * 1024
+
+
+def get_processing_cache():
+    """ Returns the cache, or None if disabled in DuckietownConstants. """
+    global _processing_cache
+    if not DuckietownConstants.use_cache_for_regression:
+        return None
+    if _processing_cache is None:
+        _processing_cache = ProcessingCache(expand_all(PROCESSING_CACHE_DIR),
+                                            PROCESSING_CACHE_MAX_SIZE)
+    return _processing_cache
+
+_processing_cache = None
+
+
+class ProcessingCache(object):
+    """
+        Stores the bags as
+            ![dirname]/bags/![key].bag
+        and the results of the analyzers as
+            ![dirname]/results/![key].pickle
+
+        When the total size exceeds max_size, the least recently used
+        files are deleted.
+    """
+
+    def __init__(self, dirname, max_size):
+        self.dirname = dirname
+        self.max_size = max_size
+
+    def processing_key(self, bag_filename, t0, t1, processors):
+        key = [bag_fingerprint(bag_filename), t0, t1]
+        key.extend(algo_instance_hash('processor', _) for _ in processors)
+        return _sha1(key)
+
+    def analysis_key(self, log_key, analyzer):
+        """
+            log_key: the processing_key() that created the log, or
+            the bag_content_hash() of the log.
+        """
+        return _sha1([log_key, algo_instance_hash('analyzer', analyzer)])
+
+    def get_processed(self, key):
+        """ Returns the cached bag, or None. """
+        fn = self._bag_filename(key)
+        if not self._hit(fn):
+            return None
+        logger.info('Using cached processed log %s' % friendly_path(fn))
+        return fn
+
+    def put_processed(self, key, filename):
+        """
+            Moves the bag to the cache and returns its new filename.
+        """
+        fn = self._bag_filename(key)
+        d8n_mkdirs_thread_safe(os.path.dirname(fn))
+        # the move can be a copy (across file systems), the rename
+        # in the same directory is atomic
+        tmp = '%s.tmp-%s' % (fn, os.getpid())
+        shutil.move(filename, tmp)
+        os.rename(tmp, fn)
+        self._evict(keep=fn)
+        return fn
+
+    def get_results(self, key):
+        """ Returns the cached results of an analyzer, or None. """
+        fn = self._results_filename(key)
+        if not self._hit(fn):
+            return None
+        try:
+            return safe_pickle_load(fn)
+        except Exception as e:
+            msg = 'Removing cached results that I cannot read: %s\n%s' % (friendly_path(fn), e)
+            logger.error(msg)
+            os.unlink(fn)
+            return None
+
+    def put_results(self, key, results):
+        fn = self._results_filename(key)
+        safe_pickle_dump(results, fn)
+        self._evict(keep=fn)
+
+    def _bag_filename(self, key):
+        return os.path.join(self.dirname, 'bags', key + '.bag')
+
+    def _results_filename(self, key):
+        return os.path.join(self.dirname, 'results', key + '.pickle')
+
+    def _hit(self, fn):
+        if not os.path.exists(fn):
+            return False
+        try:
+            # mark it as recently used
+            os.utime(fn, None)
+        except OSError:  # evicted by another process
+            return False
+        return True
+
+    def _evict(self, keep):
+        dirnames = [os.path.join(self.dirname, _) for _ in ['bags', 'results']]
+        evict_least_recently_used(dirnames, self.max_size, keep=keep)
+
+
+def bag_fingerprint(filename):
+    """
+        Returns a hash of the size of the file and of its first and last
+        FINGERPRINT_BLOCK bytes, which contain the header and the index
+        of the bag (connections, time and number of messages of each
+        chunk). It does not depend on the name of the file, and it is
+        cheap to compute also for large bags.
+    """
+    filename = os.path.realpath(filename)
+    size = os.stat(filename).st_size
+    h = hashlib.sha1(str(size))
+    with open(filename, 'rb') as f:
+        h.update(f.read(FINGERPRINT_BLOCK))
+        if size > FINGERPRINT_BLOCK:
+            f.seek(max(FINGERPRINT_BLOCK, size - FINGERPRINT_BLOCK))
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def bag_content_hash(filename):
+    """
+        Returns a hash of all the contents of the bag.
+
+        Unlike bag_fingerprint(), it identifies the output of a processor:
+        if only the values of the messages change, the size, the header and
+        the index of the bag can stay the same.
+    """
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        while True:
+            data = f.read(FINGERPRINT_BLOCK)
+            if not data:
+                break
+            h.update(data)
+    return h.hexdigest()
+
+
+def algo_instance_hash(family_name, instance_name):
+    """
+        Returns a hash of the constructor and parameters of the
+        EasyAlgoInstance, and of the source of the package that
+        defines the constructor, so that the cached results are
+        not used after the code or the configuration changes.
+
+        A parameter that has the name of a family and whose value is
+        the name of one of its instances (e.g. "image_prep: baseline")
+        refers to that instance, which is hashed in the same way.
+
+        Changes to the code of other packages are not detected;
+        use the option --no-cache in that case.
+    """
+    return _algo_instance_hash(get_easy_algo_db(), family_name, instance_name, ())
+
+
+def _algo_instance_hash(db, family_name, instance_name, visited):
+    instance = db.get_instance(family_name, instance_name)
+    parameters = json.dumps(instance.parameters, sort_keys=True, default=repr)
+    key = [family_name, instance.constructor, parameters,
+           package_source_hash(instance.constructor)]
+    visited = visited + ((family_name, instance_name),)
+    for name, value in sorted(instance.parameters.items()):
+        if not isinstance(value, basestring) or not name in db.family_name2filename:  # @UndefinedVariable
+            continue
+        if (name, value) in visited:
+            continue
+        try:
+            h = _algo_instance_hash(db, name, value, visited)
+        except (ValueError, IndexError):
+            # not the name of an instance
+            continue
+        key.append([name, value, h])
+    return _sha1(key)
+
+
+def package_source_hash(constructor):
+    """
+        Returns a hash of the Python files of the top-level package
+        that contains the constructor, or None if it cannot be imported.
+    """
+    package_name = constructor.split('.')[0]
+    if not package_name in _package_source_hashes:
+        try:
+            package = import_name(package_name)
+            dirname = os.path.dirname(inspect.getsourcefile(package))
+        except (ValueError, TypeError, ImportError):
+            _package_source_hashes[package_name] = None
+        else:
+            h = hashlib.sha1()
+            for root, dirs, files in os.walk(dirname):
+                dirs.sort()
+                for basename in sorted(files):
+                    if not basename.endswith('.py'):
+                        continue
+                    fn = os.path.join(root, basename)
+                    h.update(os.path.relpath(fn, dirname))
+                    with open(fn, 'rb') as f:
+                        h.update(f.read())
+            _package_source_hashes[package_name] = h.hexdigest()
+    return _package_source_hashes[package_name]
+
+# package name -> hash; the code does not change while running
+_package_source_hashes = {}
+
+
+def link_or_copy(src, dst):
+    """ Creates dst as a hard link to src, or as a copy if not possible. """
+    if os.path.lexists(dst):
+        os.unlink(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy(src, dst)
+
+
+def _sha1(key):
+    return hashlib.sha1(json.dumps(key, default=repr)).hexdigest()
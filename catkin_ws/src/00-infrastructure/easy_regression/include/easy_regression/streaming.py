@@ -0,0 +1,378 @@
+"""
+    Bag-like objects to connect processors and analyzers running in
+    different threads, so that the messages are passed in memory
+    instead of through temporary bags.
+"""
+from Queue import Full, Queue  # @UnresolvedImport
+from collections import OrderedDict, namedtuple
+import threading
+import time
+import traceback
+
+from duckietown_utils import logger
+from duckietown_utils.exceptions import DTException
+from duckietown_utils.instantiate_utils import indent
+from easy_regression.analyzer_interface import StreamingAnalyzerInterface
+
+__all__ = [
+    'MessageStream',
+    'TeeWriter',
+    'copy_messages',
+    'AnalyzerDispatcher',
+    'AnalyzeLogAdapter',
+    'dispatch_messages',
+    'StageThread',
+    'join_stages',
+]
+
+# Same structure as the return value of rosbag.Bag.get_type_and_topic_info()
+TypesAndTopicsTuple = namedtuple('TypesAndTopicsTuple', ['msg_types', 'topics'])
+TopicTuple = namedtuple('TopicTuple', ['msg_type', 'message_count', 'connections', 'frequency'])
+
+_END = 'end'
+_ERROR = 'error'
+
+
+class MessageStream(object):
+    """
+        A queue of messages that is written by one thread with write(),
+        like a bag open for writing, and read by another thread with
+        read_messages(), like a bag open for reading.
+
+        The messages are read only once, as they are produced. The
+        methods that need to know all the messages (get_message_count(),
+        get_type_and_topic_info(), get_start_time(), get_end_time())
+        wait until the writer has finished, and then keep all the
+        messages in memory; they must be called before read_messages().
+    """
+
+    def __init__(self, name, maxsize=64):
+        self.name = name
+        self.queue = Queue(maxsize=maxsize)
+        # messages received before the first read_messages()
+        self.buffered = None
+        self.finished = False
+        self.reading = False
+        self.closed = False
+
+    # writer side
+
+    def write(self, topic, msg, t=None, raw=False):  # @UnusedVariable
+        if t is None:
+            from genpy import Time  # @UnresolvedImport
+            t = Time.from_sec(time.time())
+        self._put(('msg', (topic, msg, t)))
+
+    def finish(self):
+        """ Called by the framework when the writer is done. """
+        self._put((_END, None))
+
+    def fail(self, error):
+        """ Called by the framework when the writer failed. """
+        self._put((_ERROR, error))
+
+    def _put(self, item):
+        while not self.closed:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+        # the reader does not want any more messages
+
+    # reader side
+
+    def read_messages(self, topics=None, start_time=None, end_time=None, **kwargs):  # @UnusedVariable
+        if self.reading:
+            msg = 'The messages of %s can be read only once.' % self.name
+            raise ValueError(msg)
+        self.reading = True
+        if isinstance(topics, str):
+            topics = [topics]
+        for topic, msg, t in self._messages():
+            if topics and not topic in topics:
+                continue
+            if start_time is not None and t < start_time:
+                continue
+            if end_time is not None and t > end_time:
+                continue
+            yield topic, msg, t
+
+    def get_message_count(self, topic_filters=None):
+        if isinstance(topic_filters, str):
+            topic_filters = [topic_filters]
+        messages = self._get_all()
+        return len([_ for _ in messages if not topic_filters or _[0] in topic_filters])
+
+    def get_type_and_topic_info(self, topic_filters=None):
+        if isinstance(topic_filters, str):
+            topic_filters = [topic_filters]
+        msg_types = {}
+        topic2messages = {}
+        for topic, msg, _ in self._get_all():
+            if topic_filters and not topic in topic_filters:
+                continue
+            msg_types[msg._type] = msg._md5sum
+            topic2messages.setdefault(topic, []).append(msg)
+        topics = {}
+        for topic, messages in topic2messages.items():
+            topics[topic] = TopicTuple(msg_type=messages[0]._type,
+                                       message_count=len(messages),
+                                       connections=1, frequency=None)
+        return TypesAndTopicsTuple(msg_types=msg_types, topics=topics)
+
+    def get_start_time(self):
+        messages = self._get_all()
+        if not messages:
+            raise ValueError('%s is empty.' % self.name)
+        return messages[0][2].to_sec()
+
+    def get_end_time(self):
+        messages = self._get_all()
+        if not messages:
+            raise ValueError('%s is empty.' % self.name)
+        return messages[-1][2].to_sec()
+
+    def close(self):
+        self.closed = True
+
+    def _get_all(self):
+        if self.reading:
+            msg = ('The information about %s must be requested before '
+                   'reading the messages.' % self.name)
+            raise ValueError(msg)
+        if self.buffered is None:
+            self.buffered = list(self._receive())
+        return self.buffered
+
+    def _messages(self):
+        if self.buffered is not None:
+            messages = self.buffered
+            self.buffered = None
+            return iter(messages)
+        return self._receive()
+
+    def _receive(self):
+        while not self.finished:
+            what, x = self.queue.get()
+            if what == _END:
+                self.finished = True
+            elif what == _ERROR:
+                self.finished = True
+                msg = 'The writer of %s failed.' % self.name
+                raise DTException(msg)
+            else:
+                yield x
+
+
+class TeeWriter(object):
+    """
+        Writes the same messages to several bags or streams.
+
+        finish() and fail() are forwarded to the outputs that have them
+        (streams and analyzer dispatchers).
+    """
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+
+    def write(self, topic, msg, t=None, raw=False):
+        if t is None:
+            from genpy import Time  # @UnresolvedImport
+            t = Time.from_sec(time.time())
+        for output in self.outputs:
+            output.write(topic, msg, t, raw=raw)
+
+    def finish(self):
+        for output in self._streams():
+            output.finish()
+
+    def fail(self, error):
+        for output in self._streams():
+            output.fail(error)
+
+    def close(self):
+        pass
+
+    def _streams(self):
+        return [_ for _ in self.outputs if hasattr(_, 'finish')]
+
+
+def copy_messages(bag_in, bag_out):
+    for topic, msg, t in bag_in.read_messages():
+        bag_out.write(topic, msg, t)
+
+
+class StageThread(threading.Thread):
+    """
+        Runs f(*args) in a thread, reading from the stream input and
+        writing to the stream output (both optional).
+
+        At the end, the output is finished, or made to fail, so that
+        its reader does not wait forever; and the input is closed,
+        so that its writer does not wait forever.
+    """
+
+    def __init__(self, name, f, args, input=None, output=None):  # @ReservedAssignment
+        threading.Thread.__init__(self, name=name)
+        self.daemon = True
+        self.f = f
+        self.args = args
+        self.input = input
+        self.output = output
+        self.error = None
+
+    def run(self):
+        try:
+            self.f(*self.args)
+        except Exception as e:
+            self.error = traceback.format_exc()
+            logger.error('%s failed: %s' % (self.name, e))
+            if self.output is not None:
+                self.output.fail(e)
+        else:
+            if self.output is not None:
+                self.output.finish()
+        finally:
+            if self.input is not None:
+                self.input.close()
+
+
+def join_stages(stages):
+    """ Waits for all the stages; raises DTException if any failed. """
+    for stage in stages:
+        stage.join()
+    errors = [_ for _ in stages if _.error is not None]
+    if errors:
+        msg = 'Processing failed.'
+        for stage in errors:
+            msg += '\n\n' + indent(stage.error, '', '%s: ' % stage.name)
+        raise DTException(msg)
+
+
+class AnalyzerDispatcher(object):
+    """
+        Dispatches each message written to it to the analyzers that 
+        subscribed to its topic.
+
+        The analyzers that are not StreamingAnalyzerInterface are run
+        with AnalyzeLogAdapter.
+    """
+
+    def __init__(self, analyzers):
+        """ analyzers: OrderedDict name -> AnalyzerInterface """
+        self.analyzers = OrderedDict()
+        for name, analyzer in analyzers.items():
+            if not isinstance(analyzer, StreamingAnalyzerInterface):
+                analyzer = AnalyzeLogAdapter(name, analyzer)
+            self.analyzers[name] = analyzer
+        # analyzers that want all topics
+        self.for_all = []
+        # topic -> analyzers
+        self.for_topic = {}
+        for analyzer in self.analyzers.values():
+            topics = analyzer.get_topics()
+            if topics is None:
+                self.for_all.append(analyzer)
+            else:
+                for topic in topics:
+                    self.for_topic.setdefault(topic, []).append(analyzer)
+
+    def get_topics(self):
+        """ Returns the topics needed by the analyzers, or None for all. """
+        if self.for_all:
+            return None
+        return sorted(self.for_topic)
+
+    def start(self):
+        for analyzer in self.analyzers.values():
+            analyzer.start()
+
+    def write(self, topic, msg, t=None, raw=False):  # @UnusedVariable
+        for analyzer in self.for_all:
+            analyzer.on_message(topic, msg, t)
+        for analyzer in self.for_topic.get(topic, []):
+            analyzer.on_message(topic, msg, t)
+
+    def finish(self):
+        for analyzer in self._adapters():
+            analyzer.end_input()
+
+    def fail(self, error):
+        for analyzer in self._adapters():
+            analyzer.end_input(error)
+
+    def finalize(self):
+        """ Returns an OrderedDict name -> results. """
+        results = OrderedDict()
+        for name, analyzer in self.analyzers.items():
+            results[name] = OrderedDict()
+            analyzer.finalize(results[name])
+        return results
+
+    def close(self):
+        pass
+
+    def _adapters(self):
+        return [_ for _ in self.analyzers.values() if isinstance(_, AnalyzeLogAdapter)]
+
+
+class AnalyzeLogAdapter(StreamingAnalyzerInterface):
+    """
+        Makes a StreamingAnalyzerInterface out of an analyzer that only
+        implements analyze_log(): its analyze_log() runs in a thread,
+        reading the messages from a MessageStream.
+    """
+
+    def __init__(self, name, analyzer):
+        self.name = name
+        self.analyzer = analyzer
+        self.stream = None
+        self.thread = None
+        self.results = None
+        self.ended = False
+
+    def start(self):
+        self.stream = MessageStream('input of analyzer %s' % self.name)
+        self.results = OrderedDict()
+        self.ended = False
+        self.thread = StageThread('analyzer %s' % self.name, self.analyzer.analyze_log,
+                                  (self.stream, self.results), input=self.stream)
+        self.thread.start()
+
+    def on_message(self, topic, msg, t):
+        self.stream.write(topic, msg, t)
+
+    def end_input(self, error=None):
+        if self.ended:
+            return
+        self.ended = True
+        if error is None:
+            self.stream.finish()
+        else:
+            self.stream.fail(error)
+
+    def finalize(self, dict_out):
+        self.end_input()
+        join_stages([self.thread])
+        dict_out.update(self.results)
+
+    def reduce(self, dict_one, dict_two, result):
+        return self.analyzer.reduce(dict_one, dict_two, result)
+
+
+def dispatch_messages(bag, dispatcher):
+    """ 
+        Reads the messages needed by the analyzers from the bag,
+        then returns dispatcher.finalize().
+    """
+    dispatcher.start()
+    try:
+        for topic, msg, t in bag.read_messages(topics=dispatcher.get_topics()):
+            dispatcher.write(topic, msg, t)
+    except Exception as e:
+        dispatcher.fail(e)
+        raise
+    dispatcher.finish()
+    return dispatcher.finalize()
+
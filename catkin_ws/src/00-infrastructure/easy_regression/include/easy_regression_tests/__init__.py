@@ -8,6 +8,9 @@ def jobs_comptests(context):
     from . import references
     from . import evaluation
     from . import run_all
+    from . import streaming
+    from . import merge
+    from . import processing_cache
     
     from comptests.registrar import jobs_registrar_simple
     jobs_registrar_simple(context)
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+
+from comptests.registrar import comptest, run_module_tests
+
+from easy_regression.analyzer_interface import AnalyzerInterface
+from easy_regression.cli.analysis_and_stat import (jobs_merge_tree, merge_groups,
+    merge_n)
+
+
+class Concat(AnalyzerInterface):
+    """ An associative but not commutative reduce. """
+
+    def analyze_log(self, bag_in, dict_out):
+        pass
+
+    def reduce(self, dict_one, dict_two, result):
+        result['s'] = dict_one['s'] + dict_two['s']
+
+
+@comptest
+def merge_n_many():
+    # more than the recursion limit
+    results = [{'s': [i]} for i in range(5000)]
+    total = merge_n(Concat(), results)
+    assert total['s'] == list(range(5000))
+    assert merge_n(Concat(), results[:1]) is results[0]
+
+
+@comptest
+def merge_groups_stable():
+    items = [('log%04d' % i, i) for i in range(1000)]
+    groups = merge_groups(items, 8, 0)
+    assert sum(groups, []) == items
+    assert all(2 <= len(_) <= 8 for _ in groups[:-1])
+
+    # adding one element changes at most two groups
+    items2 = items[:500] + [('log0500a', None)] + items[500:]
+    groups2 = merge_groups(items2, 8, 0)
+    changed = [_ for _ in groups2 if _ not in groups]
+    assert 1 <= len(changed) <= 2, changed
+
+
+class RecordJobs(object):
+    """ Records the jobs instead of running them. """
+
+    def __init__(self):
+        self.jobs = {}
+
+    def comp(self, f, *args, **kwargs):  # @UnusedVariable
+        job_id = kwargs['job_id']
+        assert not job_id in self.jobs
+        self.jobs[job_id] = args
+        return job_id
+
+
+def jobs_for(log_names):
+    context = RecordJobs()
+    results = OrderedDict((_, {'s': [_]}) for _ in log_names)
+    root = jobs_merge_tree(context, results, 'concat', fanout=8)
+    return context.jobs, root
+
+
+@comptest
+def merge_tree_incremental():
+    log_names = ['log%04d' % i for i in range(1000)]
+    jobs1, root1 = jobs_for(log_names)
+    # each level reduces the number of results at least by half
+    assert len(jobs1) < 1000
+    assert root1 in jobs1
+
+    log_names2 = sorted(log_names + ['log0500a'])
+    jobs2, _ = jobs_for(log_names2)
+    same = [k for k in jobs2 if k in jobs1 and jobs1[k] == jobs2[k]]
+    # only the jobs on the path to the root are different
+    assert len(jobs2) - len(same) <= 2 * 5, (len(jobs2), len(same))
+
+    jobs, root = jobs_for(['log1'])
+    assert jobs == {} and root == {'s': ['log1']}
+
+
+if __name__ == '__main__':
+    run_module_tests()
@@ -0,0 +1,141 @@
+import os
+import time
+
+from comptests.registrar import comptest, run_module_tests
+
+from duckietown_utils.disk_hierarchy import create_tmpdir, dir_from_data
+from easy_algo.algo_db import EasyAlgoDB
+from easy_regression.cli.processing import remove_previous_output
+from easy_regression.processing_cache import (FINGERPRINT_BLOCK, ProcessingCache,
+    _algo_instance_hash, bag_content_hash, bag_fingerprint, link_or_copy)
+
+
+def write_file(fn, data):
+    with open(fn, 'wb') as f:
+        f.write(data)
+
+
+@comptest
+def processing_cache_fingerprint():
+    d = create_tmpdir()
+    a = os.path.join(d, 'a.bag')
+    b = os.path.join(d, 'b.bag')
+    data = 'x' * (3 * FINGERPRINT_BLOCK)
+    write_file(a, data)
+    write_file(b, data)
+    # it depends on the contents, not on the name
+    assert bag_fingerprint(a) == bag_fingerprint(b)
+    # the index at the end of the bag
+    write_file(b, data[:-1] + 'y')
+    assert bag_fingerprint(a) != bag_fingerprint(b)
+    write_file(b, data + 'x')
+    assert bag_fingerprint(a) != bag_fingerprint(b)
+    # smaller than one block
+    write_file(b, 'small')
+    assert bag_fingerprint(b) != bag_fingerprint(a)
+
+
+@comptest
+def processing_cache_content_hash():
+    d = create_tmpdir()
+    a = os.path.join(d, 'a.bag')
+    b = os.path.join(d, 'b.bag')
+    data = 'x' * (3 * FINGERPRINT_BLOCK)
+    write_file(a, data)
+    # same size, header and index: only the messages in the middle changed
+    middle = len(data) // 2
+    write_file(b, data[:middle] + 'y' + data[middle + 1:])
+    assert bag_fingerprint(a) == bag_fingerprint(b)
+    assert bag_content_hash(a) != bag_content_hash(b)
+    write_file(b, data)
+    assert bag_content_hash(a) == bag_content_hash(b)
+
+
+@comptest
+def processing_cache_put_get():
+    d = create_tmpdir()
+    cache = ProcessingCache(os.path.join(d, 'cache'), max_size=100)
+    assert cache.get_processed('k1') is None
+    assert cache.get_results('k1') is None
+
+    fn = os.path.join(d, 'out.bag')
+    write_file(fn, 'a' * 40)
+    cached = cache.put_processed('k1', fn)
+    assert not os.path.exists(fn)
+    assert cache.get_processed('k1') == cached
+
+    out = os.path.join(d, 'log_out.bag')
+    link_or_copy(cached, out)
+    assert open(out).read() == 'a' * 40
+
+    cache.put_results('k1', {'num_messages': 3})
+    assert cache.get_results('k1') == {'num_messages': 3}
+
+    # the job executed again writes a new log_out
+    remove_previous_output(out)
+    write_file(out, 'b' * 40)
+    assert open(cached).read() == 'a' * 40
+
+
+@comptest
+def processing_cache_eviction():
+    d = create_tmpdir()
+    cache = ProcessingCache(os.path.join(d, 'cache'), max_size=130)
+    for i in range(3):
+        fn = os.path.join(d, 'out%d.bag' % i)
+        write_file(fn, 'a' * 40)
+        cache.put_processed('k%d' % i, fn)
+        t = time.time() - 100 + i
+        os.utime(cache.get_processed('k%d' % i), (t, t))
+    # k0 is the least recently used
+    cache.get_processed('k0')
+    fn = os.path.join(d, 'out3.bag')
+    write_file(fn, 'a' * 40)
+    cache.put_processed('k3', fn)
+    assert cache.get_processed('k1') is None
+    for k in ['k0', 'k3']:
+        assert cache.get_processed(k) is not None
+
+
+class Stage(object):
+    pass
+
+
+def processor_hash(image_prep, threshold):
+    data = """
+"processor.easy_algo_family.yaml": |
+    description: desc
+    interface: easy_regression_tests.processing_cache.Stage
+
+"image_prep.easy_algo_family.yaml": |
+    description: desc
+    interface: easy_regression_tests.processing_cache.Stage
+
+"p.processor.yaml": |
+    description: desc
+    constructor: easy_regression_tests.processing_cache.Stage
+    parameters:
+        image_prep: %s
+
+"fast.image_prep.yaml": |
+    description: desc
+    constructor: easy_regression_tests.processing_cache.Stage
+    parameters:
+        threshold: %s
+""" % (image_prep, threshold)
+    db = EasyAlgoDB([dir_from_data(data)])
+    return _algo_instance_hash(db, 'processor', 'p', ())
+
+
+@comptest
+def processing_cache_referenced_instances():
+    h = processor_hash('fast', 1)
+    assert h == processor_hash('fast', 1)
+    # the parameters of the instance that the processor refers to
+    assert h != processor_hash('fast', 2)
+    # not the name of an instance: only the value is hashed
+    assert processor_hash('other', 1) == processor_hash('other', 2)
+
+
+if __name__ == '__main__':
+    run_module_tests()
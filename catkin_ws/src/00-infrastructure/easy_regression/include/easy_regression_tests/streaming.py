@@ -0,0 +1,167 @@
+from collections import OrderedDict
+
+from comptests.registrar import comptest, run_module_tests
+
+from duckietown_utils.exceptions import DTException
+from easy_regression.analyzer_interface import (AnalyzerInterface,
+    StreamingAnalyzerInterface)
+from easy_regression.streaming import (AnalyzerDispatcher, MessageStream,
+    StageThread, TeeWriter, copy_messages, dispatch_messages, join_stages)
+
+
+class Time(object):
+    def __init__(self, t):
+        self.t = t
+
+    def to_sec(self):
+        return self.t
+
+
+class ListBag(object):
+    """ A bag with the messages in a list of (topic, msg, t). """
+
+    def __init__(self, messages=None):
+        self.messages = list(messages or [])
+
+    def read_messages(self, topics=None):
+        return iter([_ for _ in self.messages if not topics or _[0] in topics])
+
+    def write(self, topic, msg, t=None, raw=False):  # @UnusedVariable
+        self.messages.append((topic, msg, t))
+
+
+def double(bag_in, bag_out):
+    for topic, msg, t in bag_in.read_messages():
+        bag_out.write(topic, msg * 2, t)
+
+
+def count_a(bag_in, res):
+    # the metadata is available before reading
+    res['count'] = bag_in.get_message_count('/a')
+    res['start'] = bag_in.get_start_time()
+    res['values'] = [msg for _, msg, _ in bag_in.read_messages(topics=['/a'])]
+
+
+def take_one(bag_in, res):
+    for _, msg, _ in bag_in.read_messages():
+        res['first'] = msg
+        break
+
+
+def fail(bag_in, bag_out):  # @UnusedVariable
+    raise ValueError('processor failed')
+
+
+def run_pipeline(processors, n=500):
+    source = ListBag([('/a' if i % 2 else '/b', i, Time(i)) for i in range(n)])
+    final = ListBag()
+    res1 = {}
+    res2 = {}
+    a1 = MessageStream('a1', maxsize=4)
+    a2 = MessageStream('a2', maxsize=4)
+    stages = [StageThread('a1', count_a, (a1, res1), input=a1),
+              StageThread('a2', take_one, (a2, res2), input=a2)]
+    bag = source
+    for i, p in enumerate(processors):
+        if i == len(processors) - 1:
+            output = TeeWriter([final, a1, a2])
+        else:
+            output = MessageStream('p%d' % i, maxsize=4)
+        stream_in = bag if isinstance(bag, MessageStream) else None
+        stages.append(StageThread('p%d' % i, p, (bag, output), input=stream_in, output=output))
+        bag = output
+    for stage in stages:
+        stage.start()
+    join_stages(stages)
+    return final, res1, res2
+
+
+@comptest
+def streaming_pipeline():
+    final, res1, res2 = run_pipeline([double, copy_messages, double])
+    assert [msg for _, msg, _ in final.messages] == [4 * i for i in range(500)]
+    assert res1['count'] == 250
+    assert res1['start'] == 0
+    assert res1['values'] == [4 * i for i in range(1, 500, 2)]
+    # an analyzer that stops reading does not block the others
+    assert res2['first'] == 0
+
+
+@comptest
+def streaming_pipeline_failure():
+    try:
+        run_pipeline([double, fail, double])
+    except DTException as e:
+        assert 'processor failed' in str(e)
+    else:
+        raise Exception('Expected DTException')
+
+
+class SumA(StreamingAnalyzerInterface):
+
+    def get_topics(self):
+        return ['/a']
+
+    def start(self):
+        self.topics = set()
+        self.total = 0
+
+    def on_message(self, topic, msg, t):  # @UnusedVariable
+        self.topics.add(topic)
+        self.total += msg
+
+    def finalize(self, dict_out):
+        dict_out['topics'] = sorted(self.topics)
+        dict_out['total'] = self.total
+
+    def reduce(self, dict_one, dict_two, result):
+        result['total'] = dict_one['total'] + dict_two['total']
+
+
+class CountAll(AnalyzerInterface):
+    """ An analyzer that only implements analyze_log(). """
+
+    def analyze_log(self, bag_in, dict_out):
+        dict_out['count'] = bag_in.get_message_count()
+        dict_out['last'] = list(bag_in.read_messages())[-1][1]
+
+    def reduce(self, dict_one, dict_two, result):
+        result['count'] = dict_one['count'] + dict_two['count']
+
+
+@comptest
+def streaming_dispatcher():
+    bag = ListBag([('/a' if i % 2 else '/b', i, Time(i)) for i in range(500)])
+    dispatcher = AnalyzerDispatcher(OrderedDict([('sum', SumA())]))
+    assert dispatcher.get_topics() == ['/a']
+    res = dispatch_messages(bag, dispatcher)
+    assert res['sum'] == {'topics': ['/a'], 'total': sum(range(1, 500, 2))}
+
+    analyzers = OrderedDict([('sum', SumA()), ('count', CountAll())])
+    dispatcher = AnalyzerDispatcher(analyzers)
+    assert dispatcher.get_topics() is None
+    res = dispatch_messages(bag, dispatcher)
+    assert list(res) == ['sum', 'count']
+    assert res['sum']['total'] == sum(range(1, 500, 2))
+    assert res['count'] == {'count': 500, 'last': 499}
+
+    # the adapter delegates reduce() to the wrapped analyzer
+    result = {}
+    dispatcher.analyzers['count'].reduce(res['count'], res['count'], result)
+    assert result['count'] == 1000
+
+    # again, behind processors
+    dispatcher.start()
+    final = ListBag()
+    bag_out = TeeWriter([final, dispatcher])
+    stages = [StageThread('p', double, (bag, bag_out), output=bag_out)]
+    for stage in stages:
+        stage.start()
+    join_stages(stages)
+    res = dispatcher.finalize()
+    assert res['count'] == {'count': 500, 'last': 998}
+    assert res['sum']['total'] == 2 * sum(range(1, 500, 2))
+
+
+if __name__ == '__main__':
+    run_module_tests()
@@ -5,6 +5,7 @@ import cv2
 import numpy as np
 from sensor_msgs.msg import CompressedImage,Image
 from duckietown_msgs.msg import BoolStamped
+from duckietown_utils.jpg import image_cv_from_jpg_resized
  
 
 class DecoderNode(object):
@@ -15,6 +16,8 @@ class DecoderNode(object):
         
         self.publish_freq = self.setupParam("~publish_freq",1.0)
         self.publish_duration = rospy.Duration.from_sec(1.0/self.publish_freq)
+        # If set to [H, W], images are decoded directly at this resolution
+        self.decode_shape = self.setupParam("~decode_shape",None)
         self.pub_raw = rospy.Publisher("~image/raw",Image,queue_size=1)
         self.last_stamp = rospy.Time.now()        
         self.sub_compressed_img = rospy.Subscriber("~compressed_image",CompressedImage,self.cbImg,queue_size=1)
@@ -38,8 +41,11 @@ class DecoderNode(object):
         else:
             self.last_stamp = now
         # time_start = time.time()
-        np_arr = np.fromstring(msg.data, np.uint8)
-        cv_image = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        try:
+            cv_image = image_cv_from_jpg_resized(msg.data, self.decode_shape)
+        except ValueError as e:
+            rospy.loginfo("[%s] Cannot decode image: %s" % (self.node_name, e))
+            return
         # time_1 = time.time()
         img_msg = self.bridge.cv2_to_imgmsg(cv_image, "bgr8")
         # time_2 = time.time()
@@ -1,7 +1,8 @@
-from .kmeans import getparameters2, identifyColors, runKMeans
-from .scale_and_shift import scaleandshift
+from .kmeans import getparameters2, identifyColors, runKMeans, runKMeansFast
+from .scale_and_shift import ScaleAndShiftLUT
 from anti_instagram.kmeans import CENTERS, CENTERS2
 import numpy as np
+import time
 from duckietown_utils import logger
 
 def calculate_transform(image):
@@ -13,21 +14,33 @@ def calculate_transform(image):
         parameters['scale']
         parameters['shift']
     """
+    trained4, counter4, score4 = runKMeans(image, num_colors=4, init=CENTERS2)
+    trained3, counter3, score3 = runKMeans(image, num_colors=3, init=CENTERS)
+    success, health, parameters, _ = fit_transform(trained3, counter3, score3,
+                                                   trained4, counter4, score4)
+    return success, health, parameters
+
+def fit_transform(trained3, counter3, score3, trained4, counter4, score4):
+    """
+        Fits the transform to the clusters found with 3 and 4 colors.
+        
+        Returns tuple (bool, float, parameters, float)
+        
+        success, health, parameters, cost
+    """
     centers4 = CENTERS2
-    trained4, counter4,score4 = runKMeans(image, num_colors=4, init=centers4)
     trained4 = trained4[[0,2,3],:]
     counter4 = [counter4[0],counter4[2],counter4[3]]
     centers4 = centers4[[0,2,3],:]
     centers3 = CENTERS
-    trained3, counter3,score3 = runKMeans(image, num_colors=3, init=centers3)
     decision34=(score3+3e7)>score4;
     if (decision34):
-        logger.info("picked 3 colors")
+        logger.debug("picked 3 colors")
         trained=trained3
         counter=counter3
         centers=centers3
     else:
-        logger.info("picked 4 colors")
+        logger.debug("picked 4 colors")
         trained=trained4
         counter=counter4
         centers=centers4
@@ -38,31 +51,18 @@ def calculate_transform(image):
     
     if r[0][0] == 0.0:
         # XXX: not sure what this is supposed to be
-        return False, 0.0, None
+        return False, 0.0, None, None
 
     scale = np.array([r[0][0][0],g[0][0][0],b[0][0][0]])
     shift = np.array([r[1][0], g[1][0],b[1][0]])
     
+    cost = float(np.sum(cost))
     eps = np.finfo('double').eps
     health = 1.0 / (cost + eps)
     
     parameters = dict(scale=scale, shift=shift)
     
-    return True, float(health), parameters
-
-#     # Estimates the scale and shift over multiple frame via an IIR filter with preference towards low-cost frames
-#     IIR_weight=1000/(10000+cost)
-#     #logger.info("cost = %f, IIR_weight = %f" % (cost, IIR_weight))
-#     # self.scale = [r[0][0][0],g[0][0][0],b[0][0][0]]
-#     # self.shift = [r[1][0], g[1][0],b[1][0]]
-#     deltascale = np.array([r[0][0][0],g[0][0][0],b[0][0][0]])
-#     deltashift = np.array([r[1][0], g[1][0],b[1][0]])
-#     if testframe:
-#         self.scale = deltascale
-#         self.shift = deltashift
-#     else:
-#         self.scale = (self.scale+deltascale*IIR_weight)/(1+IIR_weight)
-#         self.shift = (self.shift+deltashift*IIR_weight)/(1+IIR_weight)
+    return True, float(health), parameters, cost
 
 class ScaleAndShift():
     """ Represents the transformation """
@@ -70,10 +70,11 @@ class ScaleAndShift():
     def __init__(self, scale, shift):
         self.scale = scale
         self.shift = shift
+        self.lut = ScaleAndShiftLUT()
     
-    def __call__(self, image):
-        corrected_image = scaleandshift(image, self.scale, self.shift)
-        return corrected_image
+    def __call__(self, image, dst=None):
+        """ Returns the corrected uint8 image (see ScaleAndShiftLUT) """
+        return self.lut(image, self.scale, self.shift, dst=dst)
     
     @staticmethod
     def identity():
@@ -87,10 +88,18 @@ class AntiInstagram():
         self.scale = [1.0, 1.0, 1.0]
         self.shift = [0.0, 0.0, 0.0]
         self.health = 0
+        self.has_transform = False
+        # clusters found in the last frame, used by updateTransform()
+        self.trained3 = None
+        self.trained4 = None
+        self.lut = ScaleAndShiftLUT()
     
-    def applyTransform(self, image):
-        corrected_image = scaleandshift(image, self.scale, self.shift)
-        return corrected_image
+    def applyTransform(self, image, dst=None):
+        """
+            Returns the corrected uint8 image, saturated as by
+            cv2.convertScaleAbs. If dst is given, the result is written there.
+        """
+        return self.lut(image, self.scale, self.shift, dst=dst)
     
     def calculateTransform(self, image, testframe=False):
         success, self.health, parameters = calculate_transform(image)
@@ -98,6 +107,48 @@ class AntiInstagram():
             raise Exception('calculate_transform failed')
         self.scale = parameters['scale']
         self.shift = parameters['shift']
+        self.has_transform = True
+    
+    def updateTransform(self, image, time_budget=0.05, max_pixels=2000):
+        """
+            Cheaper version of calculateTransform() for a stream of images.
+            
+            The clusters are found with runKMeansFast(), starting from the
+            ones found in the previous frame, within time_budget seconds.
+            The transform of the frame is then averaged with the current
+            one by an IIR filter that prefers low-cost frames.
+            
+            Returns False if no transform could be fit to this frame.
+        """
+        t0 = time.time()
+        init4 = CENTERS2 if self.trained4 is None else self.trained4
+        init3 = CENTERS if self.trained3 is None else self.trained3
+        trained4, counter4, score4 = runKMeansFast(image, 4, init4, max_pixels=max_pixels,
+                                                   deadline=t0 + time_budget / 2)
+        trained3, counter3, score3 = runKMeansFast(image, 3, init3, max_pixels=max_pixels,
+                                                   deadline=t0 + time_budget)
+        self.trained4 = trained4
+        self.trained3 = trained3
+        
+        success, health, parameters, cost = fit_transform(trained3, counter3, score3,
+                                                          trained4, counter4, score4)
+        if not success:
+            return False
+        
+        deltascale = parameters['scale']
+        deltashift = parameters['shift']
+        if not self.has_transform:
+            self.scale = deltascale
+            self.shift = deltashift
+            self.has_transform = True
+        else:
+            # Estimates the scale and shift over multiple frame via an IIR
+            # filter with preference towards low-cost frames
+            IIR_weight = 1000 / (10000 + cost)
+            self.scale = (np.array(self.scale) + deltascale * IIR_weight) / (1 + IIR_weight)
+            self.shift = (np.array(self.shift) + deltashift * IIR_weight) / (1 + IIR_weight)
+        self.health = health
+        return True
     
     def calculateHealth(self):
         return self.health
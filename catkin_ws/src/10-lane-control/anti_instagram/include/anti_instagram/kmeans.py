@@ -46,6 +46,52 @@ def runKMeans(cv_img, num_colors, init):
 	return trained_centers, labelcount,score
 
 
+def runKMeansFast(cv_img, num_colors, init, max_pixels=2000, max_iter=25, deadline=None):
+	"""
+		A cheaper version of runKMeans() for a stream of images:
+
+		- it uses at most max_pixels pixels of the same cut off;
+		- it runs k-means only once, starting from init, which is meant
+		  to be the centers found in the previous frame;
+		- it stops at the deadline (a time.time() value), if given.
+
+		Returns the same values as runKMeans(), with the counts and the
+		score scaled as if all the pixels had been used.
+	"""
+	imgdata = getimgdatapts(cv_img[-100:,:,:]) # same cut off as runKMeans
+	n = imgdata.shape[0]
+	step = max(1, int(np.ceil(float(n) / max_pixels)))
+	data = imgdata[::step].astype('float64')
+	centers = np.array(init, dtype='float64')
+
+	for _iteration in range(max_iter):
+		labels, _ = _assign(data, centers)
+		new_centers = centers.copy()
+		counts = np.bincount(labels, minlength=num_colors)
+		nonempty = counts > 0
+		for c in range(3):
+			sums = np.bincount(labels, weights=data[:, c], minlength=num_colors)
+			new_centers[nonempty, c] = sums[nonempty] / counts[nonempty]
+		converged = np.max(np.abs(new_centers - centers)) < 0.5
+		centers = new_centers
+		if converged or (deadline is not None and time.time() > deadline):
+			break
+
+	labels, distances = _assign(data, centers)
+	scale = float(n) / data.shape[0]
+	labelcount = Counter()
+	for i, count in enumerate(np.bincount(labels, minlength=num_colors)):
+		labelcount[i] = count * scale
+	score = -np.sum(distances) * scale
+	return centers, labelcount, score
+
+
+def _assign(data, centers):
+	""" Returns the closest center for each point and the squared distance. """
+	d2 = np.sum((data[:, np.newaxis, :] - centers[np.newaxis, :, :]) ** 2, axis=2)
+	labels = np.argmin(d2, axis=1)
+	return labels, d2[np.arange(len(labels)), labels]
+
 def identifyColors(trained, true):
 	# print trained
 	# print np.size(trained)
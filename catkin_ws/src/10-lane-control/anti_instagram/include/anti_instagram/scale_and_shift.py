@@ -43,3 +43,57 @@ def scaleandshift1(img, scale, shift):
     img_shift = np.reshape(img_shift + np.array(shift), [h, w, 3])
 
     return img_shift
+
+def scaleandshift_lut(scale, shift, clip=False):
+    """
+        Returns the (256, 1, 3) uint8 lookup table that maps each value v
+        of channel i to saturate(|v * scale[i] + shift[i]|).
+
+        Applying it with cv2.LUT gives the same result as
+        cv2.convertScaleAbs(scaleandshift(img, scale, shift)).
+
+        If clip is True, the negative values become 0 instead of their
+        absolute value, as with
+        np.clip(scaleandshift(img, scale, shift), 0, 255).astype('uint8').
+    """
+    assert len(scale) == 3, scale
+    assert len(shift) == 3, shift
+
+    values = np.arange(256, dtype='float32')
+    lut = np.empty((256, 1, 3), dtype='uint8')
+    for i in range(3):
+        s = np.array(scale[i]).astype('float32')
+        p = np.array(shift[i]).astype('float32')
+        if clip:
+            lut[:, 0, i] = np.clip(values * s + p, 0, 255)
+        else:
+            lut[:, 0, i] = np.clip(np.rint(np.abs(values * s + p)), 0, 255)
+    return lut
+
+class ScaleAndShiftLUT():
+    """
+        Applies scale and shift to uint8 images with cv2.LUT, without
+        the float intermediate of scaleandshift().
+
+        The table is recomputed only when scale or shift change.
+        For clip, see scaleandshift_lut().
+    """
+
+    def __init__(self, clip=False):
+        self.clip = clip
+        self.key = None
+        self.lut = None
+
+    def __call__(self, img, scale, shift, dst=None):
+        """
+            Returns a uint8 image; if dst is given, the result is
+            written there, so that the same buffer can be reused.
+        """
+        import cv2
+        key = (tuple(np.array(scale, 'float32')), tuple(np.array(shift, 'float32')))
+        if key != self.key:
+            self.lut = scaleandshift_lut(scale, shift, clip=self.clip)
+            self.key = key
+        if dst is not None:
+            return cv2.LUT(img, self.lut, dst)
+        return cv2.LUT(img, self.lut)
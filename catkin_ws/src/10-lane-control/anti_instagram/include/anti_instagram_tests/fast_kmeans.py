@@ -0,0 +1,55 @@
+from comptests.registrar import run_module_tests, comptest
+
+from anti_instagram.AntiInstagram import AntiInstagram
+from anti_instagram.kmeans import CENTERS, runKMeansFast
+import numpy as np
+
+
+def synthetic_image(colors, H=120, W=160, noise=3.0, seed=0):
+    """ An image made of vertical stripes of the given BGR colors, with noise. """
+    rng = np.random.RandomState(seed)
+    image = np.zeros((H, W, 3))
+    stripes = np.array_split(np.arange(W), len(colors))
+    for color, columns in zip(colors, stripes):
+        image[:, columns, :] = color
+    image += rng.normal(0, noise, image.shape)
+    return np.clip(image, 0, 255).astype('uint8')
+
+
+@comptest
+def fast_kmeans_finds_clusters():
+    colors = np.array([[70, 50, 40], [40, 200, 210], [220, 230, 200]])
+    image = synthetic_image(colors)
+    centers, counts, score = runKMeansFast(image, 3, CENTERS, max_pixels=500)
+
+    assert np.max(np.abs(centers - colors)) < 3, centers
+    # the counts are scaled to all the pixels of the cut off
+    total = sum(counts.values())
+    assert abs(total - 100 * 160) < 1e-6, total
+    assert score < 0
+
+
+@comptest
+def fast_kmeans_respects_deadline():
+    image = synthetic_image(CENTERS)
+    # a deadline in the past allows only one iteration
+    centers, _, _ = runKMeansFast(image, 3, CENTERS + 20, deadline=0)
+    assert centers.shape == (3, 3)
+
+
+@comptest
+def update_transform_converges():
+    # the camera sees the reference colors darker
+    colors = CENTERS * 0.8 + 10
+
+    ai = AntiInstagram()
+    for seed in range(10):
+        assert ai.updateTransform(synthetic_image(colors, seed=seed))
+
+    corrected = ai.applyTransform(colors.reshape((1, 3, 3)).astype('uint8'))
+    error = np.abs(corrected.reshape((3, 3)) - CENTERS)
+    assert np.max(error) < 2, error
+
+
+if __name__ == '__main__':
+    run_module_tests()
@@ -3,7 +3,8 @@ import rospy
 from sensor_msgs.msg import CompressedImage,Image  # @UnresolvedImport
 from duckietown_msgs.msg import AntiInstagramHealth, BoolStamped, AntiInstagramTransform  # @UnresolvedImport
 from anti_instagram.AntiInstagram import *
-from duckietown_utils.jpg import image_cv_from_jpg
+from anti_instagram.scale_and_shift import ScaleAndShiftLUT
+from duckietown_utils.jpg import image_cv_from_jpg_resized
 from cv_bridge import CvBridge  # @UnresolvedImport
 from line_detector.timekeeper import TimeKeeper
 
@@ -15,6 +16,12 @@ class AntiInstagramNode():
         self.locked = False
         
         self.image_pub_switch = rospy.get_param("~publish_corrected_image",False)
+        # If set to [H, W], images are decoded directly at this resolution
+        self.decode_shape = rospy.get_param("~decode_shape", None)
+        # If true, the transform is updated with every image, not only on click
+        self.continuous = rospy.get_param("~continuous", False)
+        # Maximum time spent on each image in continuous mode
+        self.time_budget = rospy.get_param("~time_budget", 0.05)
         
         # Initialize publishers and subscribers
         self.pub_image = rospy.Publisher("~corrected_image", Image, queue_size=1)
@@ -38,23 +45,45 @@ class AntiInstagramNode():
         
         self.ai = AntiInstagram()
         self.corrected_image = Image()
+        # buffer for the corrected image, reused for every frame
+        self.corrected_buffer = None
+        # the published image is clipped to [0, 255], while 
+        # applyTransform() takes the absolute value as convertScaleAbs
+        self.corrected_lut = ScaleAndShiftLUT(clip=True)
         self.bridge = CvBridge()
         
         self.image_msg = None
-        self.click_on = False
+        # in continuous mode, the correction is on from the start
+        self.click_on = self.continuous
 
     def cbNewImage(self,image_msg):
         # memorize image
         self.image_msg = image_msg
         
+        # in continuous mode, ~click turns the updates off and on
+        update = self.continuous and self.click_on
+        if not update and not self.image_pub_switch:
+            return
+        
+        tk = TimeKeeper(image_msg)
+        # decoded once, for both the update and the corrected image
+        try:
+            cv_image = image_cv_from_jpg_resized(image_msg.data, self.decode_shape)
+        except ValueError as e:
+            rospy.loginfo('Anti_instagram cannot decode image: %s' % e)
+            return
+        tk.completed('decoded')
+        
+        if update:
+            self.updateTransform(cv_image, tk)
+        
         if self.image_pub_switch:
-            tk = TimeKeeper(image_msg)
-            cv_image = self.bridge.imgmsg_to_cv2(image_msg, "bgr8")
-            
-            corrected_image_cv2 = self.ai.applyTransform(cv_image)
+            if self.corrected_buffer is None or self.corrected_buffer.shape != cv_image.shape:
+                self.corrected_buffer = np.empty(cv_image.shape, 'uint8')
+            corrected_image_cv2 = self.corrected_lut(cv_image, self.ai.scale, self.ai.shift,
+                                                     dst=self.corrected_buffer)
             tk.completed('applyTransform')
             
-            corrected_image_cv2 = np.clip(corrected_image_cv2, 0, 255).astype(np.uint8)
             self.corrected_image = self.bridge.cv2_to_imgmsg(corrected_image_cv2, "bgr8")
             
             tk.completed('encode')
@@ -63,8 +92,8 @@ class AntiInstagramNode():
             
             tk.completed('published')
             
-            if self.verbose:
-                rospy.loginfo('ai:\n' + tk.getall())
+        if self.verbose:
+            rospy.loginfo('ai:\n' + tk.getall())
 
     def cbClick(self, _):
         # if we have seen an image:
@@ -73,6 +102,9 @@ class AntiInstagramNode():
             if self.click_on:
                 self.processImage(self.image_msg)
             else:
+                # forgets the transform, so that the corrected image and
+                # the next continuous updates start from the identity
+                self.ai = AntiInstagram()
                 self.transform.s = [0,0,0,1,1,1]
                 self.pub_transform.publish(self.transform)
                 rospy.loginfo('ai: Color transform is turned OFF!')
@@ -94,7 +126,7 @@ class AntiInstagramNode():
         
         #cv_image = self.bridge.imgmsg_to_cv2(msg,"bgr8")
         try:
-            cv_image = image_cv_from_jpg(msg.data)
+            cv_image = image_cv_from_jpg_resized(msg.data, self.decode_shape)
         except ValueError as e:
             rospy.loginfo('Anti_instagram cannot decode image: %s' % e)
             return
@@ -113,14 +145,27 @@ class AntiInstagramNode():
             rospy.loginfo("Health is not good")
     
         else:
-            self.health.J1 = self.ai.health
-            self.transform.s[0], self.transform.s[1], self.transform.s[2] = self.ai.shift
-            self.transform.s[3], self.transform.s[4], self.transform.s[5] = self.ai.scale
-            
-            self.pub_health.publish(self.health)
-            self.pub_transform.publish(self.transform)
+            self.publishTransform()
             rospy.loginfo('ai: Color transform published.')
 
+    def updateTransform(self, cv_image, tk):
+        """ Updates the transform incrementally with the decoded image """
+        if not self.ai.updateTransform(cv_image, time_budget=self.time_budget):
+            rospy.loginfo('ai: could not fit the transform to this image.')
+            return
+        tk.completed('updateTransform')
+        
+        self.publishTransform()
+        tk.completed('published transform')
+
+    def publishTransform(self):
+        self.health.J1 = self.ai.health
+        self.transform.s[0], self.transform.s[1], self.transform.s[2] = self.ai.shift
+        self.transform.s[3], self.transform.s[4], self.transform.s[5] = self.ai.scale
+        
+        self.pub_health.publish(self.health)
+        self.pub_transform.publish(self.transform)
+
 
 if __name__ == '__main__':
     # Initialize the node with rospy
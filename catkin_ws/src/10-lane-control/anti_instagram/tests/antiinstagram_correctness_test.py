@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 import unittest, rosunit
 from anti_instagram import (L1_image_distance, L2_image_distance, logger,
-    random_image, scaleandshift1, scaleandshift2, wrap_test_main)
+    random_image, scaleandshift1, scaleandshift2, wrap_test_main,
+    ScaleAndShiftLUT)
+import cv2
 import numpy as np
 
 class AntiInstagramCorrectnessTest(unittest.TestCase):
@@ -56,6 +58,36 @@ class AntiInstagramCorrectnessTest(unittest.TestCase):
         img1 = scaleandshift1(img, scale, shift)
         img2 = scaleandshift2(img, scale, shift)
         self.assert_L1_small(img1, img2)
+    def test_anti_instagram_lut(self):
+        logger.info('This is going to test that the LUT gives the same results as algorithm 2')
+
+        img = random_image(480, 640)
+        lut = ScaleAndShiftLUT()
+        dst = np.empty(img.shape, 'uint8')
+        for _ in range(3):
+            # includes negative and saturated values
+            scale = np.random.rand(3) * 2
+            shift = np.random.rand(3) * 200 - 100
+
+            expected = cv2.convertScaleAbs(scaleandshift2(img, scale, shift))
+            res = lut(img, scale, shift, dst=dst)
+            self.assertEqual(res.dtype, np.uint8)
+            self.assert_L1_small(expected, res, threshold=1)
+            self.assert_L1_small(expected, dst, threshold=1)
+
+    def test_anti_instagram_lut_clip(self):
+        logger.info('This is going to test that the clipping LUT gives the same results as np.clip')
+
+        img = random_image(480, 640)
+        lut = ScaleAndShiftLUT(clip=True)
+        for _ in range(3):
+            # includes negative and saturated values
+            scale = np.random.rand(3) * 2
+            shift = np.random.rand(3) * 200 - 100
+
+            expected = np.clip(scaleandshift2(img, scale, shift), 0, 255).astype(np.uint8)
+            res = lut(img, scale, shift)
+            self.assertTrue(np.array_equal(expected, res))
 
 if __name__ == '__main__':
     rosunit.unitrun('anti_instagram', 'antiinstagram_correctness_test', AntiInstagramCorrectnessTest)
\ No newline at end of file
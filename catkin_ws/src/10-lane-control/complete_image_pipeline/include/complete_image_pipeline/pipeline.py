@@ -5,6 +5,7 @@ import cv2
 
 from anti_instagram.AntiInstagram import AntiInstagram
 from duckietown_utils.path_utils import get_ros_package_path
+from duckietown_utils.rectification import get_rectification_maps
 from duckietown_utils.yaml_wrap import yaml_load_file
 from easy_algo.algo_db import get_easy_algo_db
 from line_detector.visual_state_fancy_display import vs_fancy_display
@@ -57,7 +58,7 @@ def run_pipeline(image, line_detector_name, image_prep_name):
 #     (h,w) = image.shape[:2]
     ci_W = ci.width
     ci_H = ci.height
-    mapx, mapy = cv2.initUndistortRectifyMap(ci.K, ci.D, ci.R, ci.P, (ci_W,ci_H), cv2.CV_32FC1)
+    mapx, mapy = get_rectification_maps(ci.K, ci.D, ci.R, ci.P, (ci_W,ci_H), cv2.CV_32FC1)
     # mapx and mapy are (h, w) matrices that tell you 
     # the x coordinate and the y coordinate for each point 
     # in the first image
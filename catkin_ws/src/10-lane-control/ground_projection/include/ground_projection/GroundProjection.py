@@ -11,6 +11,7 @@ from duckietown_utils.path_utils import get_ros_package_path
 from duckietown_utils.yaml_wrap import (yaml_load_file, yaml_write_to_file)
 import os.path
 from duckietown_utils import (logger, get_duckiefleet_root)
+from duckietown_utils.rectification import rectify_with_cache
 
 class GroundProjection():
 
@@ -26,6 +27,10 @@ class GroundProjection():
 
         self.pcm_ = PinholeCameraModel()
 
+        # optional lookup table pixel -> rectified pixel, 
+        # see precompute_rectification_table()
+        self.rectification_table = None
+
         # Load checkerboard information
         self.board_ = self.load_board_info()
 
@@ -77,6 +82,108 @@ class GroundProjection():
         point.z = 0.0
         return point
 
+    def vectors2pixels(self, vecs):
+        """ 
+            Vectorized version of vector2pixel().
+            
+            vecs: (N,2) array of normalized image coordinates (x, y)
+            Returns a (N,2) array of pixels (u, v).
+        """
+        cw = self.ci_.width
+        ch = self.ci_.height
+        pixels = np.array(vecs, dtype='float64').reshape((-1, 2)) * (cw, ch)
+        u = pixels[:,0]
+        v = pixels[:,1]
+        u[u < 0] = 0
+        u[u > cw - 1] = cw - 1
+        v[v < 0] = 0
+        # (same as vector2pixel())
+        v[v > ch - 1] = 0
+        return pixels
+
+    def vectors2ground(self, vecs):
+        """ 
+            Vectorized version of vector2ground().
+            
+            vecs: (N,2) array of normalized image coordinates (x, y)
+            Returns a (N,2) array of ground coordinates (x, y); z is 0.
+        """
+        pixels = self.vectors2pixels(vecs)
+        return self.pixels2ground(pixels)
+
+    def segments_array2ground(self, segments):
+        """ 
+            Projects on the ground the segments in an array with dtype
+            duckietown_utils.SEGMENT_DTYPE.
+            
+            Returns a copy of the array with the field "points" filled.
+        """
+        segments = np.array(segments, copy=True)
+        n = len(segments)
+        if n == 0:
+            return segments
+        vecs = segments['pixels_normalized'].reshape((2 * n, 2))
+        points = segments['points']
+        points[:, :, 0:2] = self.vectors2ground(vecs).reshape((n, 2, 2))
+        points[:, :, 2] = 0.0
+        return segments
+
+    def pixels2ground(self, pixels):
+        """ 
+            Vectorized version of pixel2ground(): all the points are 
+            rectified with one call to cv2.undistortPoints, and the 
+            homography is applied as one matrix product.
+            
+            pixels: (N,2) array of pixels (u, v)
+            Returns a (N,2) array of ground coordinates (x, y); z is 0.
+        """
+        uv_raw = np.array(pixels, dtype='float64').reshape((-1, 2))
+        if not self.rectified_input:
+            uv_raw = self.rectify_points(uv_raw)
+        uv_raw = np.hstack([uv_raw, np.ones((uv_raw.shape[0], 1))])
+        ground_points = np.dot(uv_raw, self.H.T)
+        return ground_points[:,0:2] / ground_points[:,2:3]
+
+    def rectify_points(self, pixels):
+        """ 
+            Vectorized version of PinholeCameraModel.rectifyPoint().
+            
+            If the rectification table was computed, the points are 
+            interpolated bilinearly from the table.  
+        """
+        pixels = np.array(pixels, dtype='float64').reshape((-1, 2))
+        if self.rectification_table is not None:
+            table = self.rectification_table
+            H, W = table.shape[:2]
+            u = np.clip(pixels[:,0], 0, W - 1)
+            v = np.clip(pixels[:,1], 0, H - 1)
+            u0 = np.minimum(np.floor(u).astype('int'), W - 2)
+            v0 = np.minimum(np.floor(v).astype('int'), H - 2)
+            a = (u - u0)[:,np.newaxis]
+            b = (v - v0)[:,np.newaxis]
+            return ((1-a)*(1-b)*table[v0, u0] + a*(1-b)*table[v0, u0+1] + 
+                    (1-a)*b*table[v0+1, u0] + a*b*table[v0+1, u0+1])
+        if len(pixels) == 0:
+            return pixels
+        src = pixels.reshape((-1, 1, 2))
+        dst = cv2.undistortPoints(src, self.pcm_.K, self.pcm_.D, R=self.pcm_.R, P=self.pcm_.P)
+        return dst.reshape((-1, 2))
+
+    def precompute_rectification_table(self):
+        """ 
+            Computes the rectified coordinates of every pixel of the camera
+            once, so that rectify_points() becomes a table lookup.
+            
+            Only useful for cameras with a fixed resolution; the result 
+            is exact for integer pixel coordinates and interpolated otherwise.
+        """
+        self.rectification_table = None
+        W = self.pcm_.width
+        H = self.pcm_.height
+        v, u = np.mgrid[0:H, 0:W]
+        pixels = np.vstack([u.flatten(), v.flatten()]).T
+        self.rectification_table = self.rectify_points(pixels).reshape((H, W, 2))
+
     def ground2pixel(self, point):
         ground_point = np.array([point.x, point.y, 1.0])
         image_point = np.dot(self.Hinv, ground_point)
@@ -92,13 +199,13 @@ class GroundProjection():
             pixel.u = image_point[0]
             pixel.v = image_point[1]
 
-    def rectify(self, cv_image_raw):
-        '''Undistort image'''
-        cv_image_rectified = np.zeros(np.shape(cv_image_raw))
-        mapx = np.ndarray(shape=(self.pcm_.height, self.pcm_.width, 1), dtype='float32')
-        mapy = np.ndarray(shape=(self.pcm_.height, self.pcm_.width, 1), dtype='float32')
-        mapx, mapy = cv2.initUndistortRectifyMap(self.pcm_.K, self.pcm_.D, self.pcm_.R, self.pcm_.P, (self.pcm_.width, self.pcm_.height), cv2.CV_32FC1, mapx, mapy)
-        return cv2.remap(cv_image_raw, mapx, mapy, cv2.INTER_CUBIC, cv_image_rectified)
+    def rectify(self, cv_image_raw, dst=None):
+        '''Undistort image (the rectification maps are cached).
+        
+        If dst is given, it is used as the output buffer.'''
+        size = (self.pcm_.width, self.pcm_.height)
+        return rectify_with_cache(cv_image_raw, self.pcm_.K, self.pcm_.D, self.pcm_.R, self.pcm_.P, 
+                                  size=size, dst=dst)
 
     def estimate_homography(self,cv_image):
         '''Estimate ground projection using instrinsic camera calibration parameters'''
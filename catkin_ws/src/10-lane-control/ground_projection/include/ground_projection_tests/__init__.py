@@ -0,0 +1,8 @@
+
+
+def jobs_comptests(context):  
+    
+    from . import projection
+    
+    from comptests.registrar import jobs_registrar_simple
+    jobs_registrar_simple(context)
@@ -0,0 +1,113 @@
+from comptests.registrar import comptest, run_module_tests
+
+from duckietown_msgs.msg import Pixel, Vector2D  # @UnresolvedImport
+from ground_projection.GroundProjection import GroundProjection
+from image_geometry import PinholeCameraModel  # @UnresolvedImport
+from sensor_msgs.msg import CameraInfo  # @UnresolvedImport
+import numpy as np
+
+
+# the default calibrations in duckietown/config/baseline/calibration
+HOMOGRAPHY = [-4.89775e-05, -0.0002150858, -0.1818273, 0.00099274, 1.202336e-06,
+              -0.3280241, -0.0004281805, -0.007185673, 1]
+
+
+def get_camera_info():
+    ci = CameraInfo()
+    ci.width = 640
+    ci.height = 480
+    ci.distortion_model = 'plumb_bob'
+    ci.K = [307.7379294605756, 0, 329.692367951685,
+            0, 314.9827773443905, 244.4605588877848,
+            0, 0, 1]
+    ci.D = [-0.2565888993516047, 0.04481160508242147, -0.00505275149956019,
+            0.001308569367976665, 0]
+    ci.R = [1, 0, 0, 0, 1, 0, 0, 0, 1]
+    ci.P = [210.1107940673828, 0, 327.2577820024981, 0,
+            0, 253.8408660888672, 239.9969353923052, 0,
+            0, 0, 1, 0]
+    return ci
+
+
+def get_ground_projection(rectified_input=False):
+    # __init__() would read the calibration files
+    gp = GroundProjection.__new__(GroundProjection)
+    gp.robot_name = 'test'
+    gp.rectified_input = rectified_input
+    gp.H = np.array(HOMOGRAPHY).reshape((3, 3))
+    gp.Hinv = np.linalg.inv(gp.H)
+    gp.pcm_ = PinholeCameraModel()
+    gp.rectification_table = None
+    gp.initialize_pinhole_camera_model(get_camera_info())
+    return gp
+
+
+# corners, center, fractional coordinates
+PIXELS = np.array([[0, 0], [639, 0], [0, 479], [639, 479], [320, 240],
+                   [100.25, 400.5], [530.75, 300.125], [12.5, 470.5]])
+
+
+def pixel2ground_each(gp, pixels):
+    res = []
+    for u, v in pixels:
+        pixel = Pixel()
+        # (not serialized, so the float coordinates are kept)
+        pixel.u = u
+        pixel.v = v
+        point = gp.pixel2ground(pixel)
+        res.append([point.x, point.y])
+    return np.array(res)
+
+
+@comptest
+def pixels2ground_same_as_pixel2ground():
+    for rectified_input in [False, True]:
+        gp = get_ground_projection(rectified_input)
+        expected = pixel2ground_each(gp, PIXELS)
+        res = gp.pixels2ground(PIXELS)
+        assert res.shape == (len(PIXELS), 2), res.shape
+        assert np.allclose(res, expected, rtol=1e-6, atol=1e-9), (rectified_input, res - expected)
+
+    assert gp.pixels2ground(np.zeros((0, 2))).shape == (0, 2)
+
+
+@comptest
+def vectors2ground_same_as_vector2ground():
+    gp = get_ground_projection()
+    # including some outside of the image, which are clipped
+    vecs = np.array([[0.5, 0.5], [0.1, 0.9], [0.75, 0.6],
+                     [-0.1, 0.5], [1.2, 0.7], [0.3, -0.2], [0.4, 1.5]])
+    expected = []
+    for x, y in vecs:
+        vec = Vector2D()
+        vec.x = x
+        vec.y = y
+        point = gp.vector2ground(vec)
+        expected.append([point.x, point.y])
+    res = gp.vectors2ground(vecs)
+    assert np.allclose(res, expected, rtol=1e-6, atol=1e-9), res - expected
+
+
+@comptest
+def rectification_table_same_as_undistort():
+    gp = get_ground_projection()
+    expected = np.array([gp.pcm_.rectifyPoint((u, v)) for u, v in PIXELS])
+    direct = gp.rectify_points(PIXELS)
+    assert np.allclose(direct, expected, atol=1e-6), direct - expected
+
+    gp.precompute_rectification_table()
+    assert gp.rectification_table.shape == (480, 640, 2)
+    tabled = gp.rectify_points(PIXELS)
+    integer = np.all(PIXELS == np.round(PIXELS), axis=1)
+    # exact at the pixels, interpolated in between
+    assert np.allclose(tabled[integer], expected[integer], atol=1e-6)
+    error = np.abs(tabled - expected).max()
+    assert error < 0.01, error
+
+    points = gp.pixels2ground(PIXELS)
+    expected_points = pixel2ground_each(gp, PIXELS)
+    assert np.allclose(points, expected_points, rtol=1e-4, atol=1e-5)
+
+
+if __name__ == '__main__':
+    run_module_tests()
@@ -2,12 +2,14 @@
 
 import rospy
 import cv2
-from ground_projection.srv import EstimateHomography, EstimateHomographyResponse, GetGroundCoord, GetGroundCoordResponse, GetImageCoord, GetImageCoordResponse
+from ground_projection.srv import EstimateHomography, EstimateHomographyResponse, GetGroundCoord, GetGroundCoordResponse, GetGroundCoords, GetGroundCoordsResponse, GetImageCoord, GetImageCoordResponse
 from duckietown_msgs.msg import (Pixel, Vector2D, Segment, SegmentList)
 from sensor_msgs.msg import (Image, CameraInfo)
+from geometry_msgs.msg import Point
 from cv_bridge import CvBridge
 import numpy as np
 from ground_projection.GroundProjection import GroundProjection
+from line_detector.segment_list_array import SegmentListArray
 
 
 class GroundProjectionNode(object):
@@ -28,6 +30,9 @@ class GroundProjectionNode(object):
 
         self.gp.initialize_pinhole_camera_model(camera_info)
         # Params
+        if rospy.get_param("~rectification_table", False):
+            rospy.loginfo("precomputing the rectification table")
+            self.gp.precompute_rectification_table()
 
 
         self.gp.robot_name = self.robot_name
@@ -36,12 +41,13 @@ class GroundProjectionNode(object):
 
         # Subs and Pubs
         self.pub_lineseglist_ = rospy.Publisher("~lineseglist_out",SegmentList, queue_size=1)
-        self.sub_lineseglist_ = rospy.Subscriber("~lineseglist_in",SegmentList, self.lineseglist_cb)
+        self.sub_lineseglist_ = rospy.Subscriber("~lineseglist_in",SegmentListArray, self.lineseglist_cb)
 
 
         # TODO prepare services
         self.service_homog_ = rospy.Service("~estimate_homography", EstimateHomography, self.estimate_homography_cb)
         self.service_gnd_coord_ = rospy.Service("~get_ground_coordinate", GetGroundCoord, self.get_ground_coordinate_cb)
+        self.service_gnd_coords_ = rospy.Service("~get_ground_coordinates", GetGroundCoords, self.get_ground_coordinates_cb)
         self.service_img_coord_ = rospy.Service("~get_image_coordinate", GetImageCoord, self.get_image_coordinate_cb)
 
 
@@ -53,19 +59,19 @@ class GroundProjectionNode(object):
         return gp.rectify(cv_image)
 
     def lineseglist_cb(self,seglist_msg):
-        seglist_out = SegmentList()
-        seglist_out.header = seglist_msg.header
-        for received_segment in seglist_msg.segments:
-            new_segment = Segment()
-            new_segment.points[0] = self.gp.vector2ground(received_segment.pixels_normalized[0])
-            new_segment.points[1] = self.gp.vector2ground(received_segment.pixels_normalized[1])
-            new_segment.color = received_segment.color
-            # TODO what about normal and points
-            seglist_out.segments.append(new_segment)
+        # project all the points of the frame at once
+        array = self.gp.segments_array2ground(seglist_msg.array)
+        seglist_out = SegmentListArray.from_array(array, header=seglist_msg.header)
         self.pub_lineseglist_.publish(seglist_out)
 
     def get_ground_coordinate_cb(self,req):
-        return GetGroundCoordResponse(self.gp.pixel2ground(req.normalized_uv))
+        return GetGroundCoordResponse(self.gp.vector2ground(req.normalized_uv))
+
+    def get_ground_coordinates_cb(self,req):
+        vecs = [(p.x, p.y) for p in req.normalized_uvs]
+        ground = self.gp.vectors2ground(np.array(vecs).reshape((-1, 2)))
+        gps = [Point(x=x, y=y, z=0.0) for x, y in ground]
+        return GetGroundCoordsResponse(gps)
 
     def get_image_coordinate_cb(self,req):
         return GetImageCoordResponse(self.gp.ground2pixel(req.gp))
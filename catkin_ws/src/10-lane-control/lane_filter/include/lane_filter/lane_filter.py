@@ -4,7 +4,7 @@ import numpy as np
 from .lane_filter_interface import LaneFilterInterface
 from scipy.stats import multivariate_normal
 from scipy.ndimage.filters import gaussian_filter
-from math import floor, pi, sqrt
+from math import pi, sqrt
 import copy
 
 
@@ -49,17 +49,8 @@ class LaneFilterHistogram(Configurable, LaneFilterInterface):
         d_t = self.d + v*delta_t*np.sin(self.phi)
         phi_t = self.phi + w*delta_t
 
-        p_belief = np.zeros(self.belief.shape)
-
-        # there has got to be a better/cleaner way to do this - just applying the process model to translate each cell value
-        for i in range(self.belief.shape[0]):
-            for j in range(self.belief.shape[1]):
-                if self.belief[i,j] > 0:
-                    if d_t[i,j] > self.d_max or d_t[i,j] < self.d_min or phi_t[i,j] < self.phi_min or phi_t[i,j] > self.phi_max:
-                        continue
-                    i_new = int(floor((d_t[i,j] - self.d_min)/self.delta_d))
-                    j_new = int(floor((phi_t[i,j] - self.phi_min)/self.delta_phi))
-                    p_belief[i_new,j_new] += self.belief[i,j]
+        # apply the process model to translate each cell value
+        p_belief = self._accumulate(d_t, phi_t, self.belief)
 
         s_belief = np.zeros(self.belief.shape)
         gaussian_filter(p_belief, self.cov_mask, output=s_belief, mode='constant')
@@ -80,27 +71,38 @@ class LaneFilterHistogram(Configurable, LaneFilterInterface):
         return measurement_likelihood
 
     def generate_measurement_likelihood(self, segments):
-        # initialize measurement likelihood to all zeros
-        measurement_likelihood = np.zeros(self.d.shape)
-        for segment in segments:
-            # we don't care about RED ones for now
-            if segment.color != segment.WHITE and segment.color != segment.YELLOW:
-                continue
-            # filter out any segments that are behind us
-            if segment.points[0].x < 0 or segment.points[1].x < 0:
-                continue
-            d_i,phi_i,l_i = self.generateVote(segment)
-            # if the vote lands outside of the histogram discard it
-            if d_i > self.d_max or d_i < self.d_min or phi_i < self.phi_min or phi_i>self.phi_max:
-                continue
-            i = int(floor((d_i - self.d_min)/self.delta_d))
-            j = int(floor((phi_i - self.phi_min)/self.delta_phi))
-            measurement_likelihood[i,j] = measurement_likelihood[i,j] +  1 
+        points, colors = segments_to_arrays(segments)
+        # we don't care about RED ones for now
+        keep = (colors == Segment.WHITE) | (colors == Segment.YELLOW)
+        # filter out any segments that are behind us
+        keep &= (points[:,0,0] >= 0) & (points[:,1,0] >= 0)
+        d_i, phi_i, _ = self.generateVotes(points[keep], colors[keep])
+        # votes that land outside of the histogram are discarded
+        measurement_likelihood = self._accumulate(d_i, phi_i, np.ones(d_i.shape))
         if np.linalg.norm(measurement_likelihood) == 0:            
             return None
         measurement_likelihood = measurement_likelihood/np.sum(measurement_likelihood)
         return measurement_likelihood
         
+    def _accumulate(self, d, phi, weights):
+        """ 
+            Returns the histogram on the (d, phi) grid of the points (d, phi)
+            with the given weights. Points outside the grid are discarded.
+            
+            The mass is summed in the same order as a loop over the points 
+            would do, so the result is exactly the same.
+        """
+        shape = self.d.shape
+        i = np.floor((d - self.d_min)/self.delta_d)
+        j = np.floor((phi - self.phi_min)/self.delta_phi)
+        # (the last two conditions catch points exactly on d_max / phi_max)
+        inside = ((d >= self.d_min) & (d <= self.d_max) & 
+                  (phi >= self.phi_min) & (phi <= self.phi_max) &
+                  (i < shape[0]) & (j < shape[1]))
+        flat = np.ravel_multi_index((i[inside].astype('int'), j[inside].astype('int')), shape)
+        histogram = np.bincount(flat, weights=weights[inside], minlength=shape[0]*shape[1])
+        return histogram.reshape(shape)
+
     def getEstimate(self):
         maxids = np.unravel_index(self.belief.argmax(),self.belief.shape)
         # add 0.5 because we want the center of the cell
@@ -154,8 +156,68 @@ class LaneFilterHistogram(Configurable, LaneFilterInterface):
 
         return d_i, phi_i, l_i
 
+    def generateVotes(self, points, colors):
+        """ 
+            Vectorized version of generateVote().
+            
+            points: (N,2,2) array with points[k,i] = (x, y) of point i of segment k
+            colors: (N,) array of segment colors
+            
+            Returns the arrays d, phi, l of shape (N,).
+        """
+        p1 = points[:,0,:]
+        p2 = points[:,1,:]
+        t_hat = (p2-p1)/np.sqrt(np.sum((p2-p1)**2, axis=1))[:,np.newaxis]
+        n_hat = np.vstack([-t_hat[:,1], t_hat[:,0]]).T
+        d1 = n_hat[:,0]*p1[:,0] + n_hat[:,1]*p1[:,1]
+        d2 = n_hat[:,0]*p2[:,0] + n_hat[:,1]*p2[:,1]
+        l1 = np.abs(t_hat[:,0]*p1[:,0] + t_hat[:,1]*p1[:,1])
+        l2 = np.abs(t_hat[:,0]*p2[:,0] + t_hat[:,1]*p2[:,1])
+        l_i = (l1+l2)/2
+        d_i = (d1+d2)/2
+        phi_i = np.arcsin(t_hat[:,1])
+
+        # right lane is white
+        white = colors == Segment.WHITE
+        right_edge = white & (p1[:,0] > p2[:,0])
+        left_edge = white & ~(p1[:,0] > p2[:,0])
+        d_i[right_edge] -= self.linewidth_white
+        d_i[left_edge] = -d_i[left_edge]
+        phi_i[left_edge] = -phi_i[left_edge]
+        d_i[white] -= self.lanewidth/2
+
+        # left lane is yellow
+        yellow = colors == Segment.YELLOW
+        left_edge = yellow & (p2[:,0] > p1[:,0])
+        right_edge = yellow & ~(p2[:,0] > p1[:,0])
+        d_i[left_edge] -= self.linewidth_yellow
+        phi_i[left_edge] = -phi_i[left_edge]
+        d_i[right_edge] = -d_i[right_edge]
+        d_i[yellow] = self.lanewidth/2 - d_i[yellow]
+
+        return d_i, phi_i, l_i
+
     def getSegmentDistance(self, segment):
         x_c = (segment.points[0].x + segment.points[1].x)/2
         y_c = (segment.points[0].y + segment.points[1].y)/2
         return sqrt(x_c**2 + y_c**2)
 
+
+def segments_to_arrays(segments):
+    """ 
+        Converts a list of Segment messages, or an array with dtype
+        duckietown_utils.SEGMENT_DTYPE, to the arrays 
+        points (N,2,2) and colors (N,) used by generateVotes(). 
+    """
+    if isinstance(segments, np.ndarray):
+        points = np.array(segments['points'][:, :, 0:2], dtype='float64')
+        colors = segments['color'].astype('int')
+        return points, colors
+    n = len(segments)
+    points = np.empty((n, 2, 2))
+    colors = np.empty((n,), 'int')
+    for k, segment in enumerate(segments):
+        p0, p1 = segment.points
+        points[k] = ((p0.x, p0.y), (p1.x, p1.y))
+        colors[k] = segment.color
+    return points, colors
@@ -0,0 +1,7 @@
+def jobs_comptests(context):  
+    
+    from . import predict
+    from . import votes
+    
+    from comptests.registrar import jobs_registrar_simple
+    jobs_registrar_simple(context)
@@ -0,0 +1,85 @@
+from comptests.registrar import comptest, run_module_tests
+from math import floor
+
+from lane_filter import LaneFilterHistogram
+import numpy as np
+
+
+def get_configuration(**kwargs):
+    """ The baseline configuration of the lane filter. """
+    configuration = dict(mean_d_0=0,
+                         mean_phi_0=0,
+                         sigma_d_0=0.1,
+                         sigma_phi_0=0.1,
+                         delta_d=0.02,
+                         delta_phi=0.1,
+                         d_max=0.3,
+                         d_min=-0.15,
+                         phi_min=-1.5,
+                         phi_max=1.5,
+                         cov_v=0.5,
+                         linewidth_white=0.05,
+                         linewidth_yellow=0.025,
+                         lanewidth=0.23,
+                         min_max=0.1,
+                         sigma_d_mask=1.0,
+                         sigma_phi_mask=2.0)
+    configuration.update(kwargs)
+    return configuration
+
+
+def predict_loop(f, dt, v, w):
+    """ The original (per-cell) implementation of the prediction step,
+        without the smoothing. The original raised IndexError for points 
+        landing exactly on phi_max; here they are discarded. """
+    d_t = f.d + v*dt*np.sin(f.phi)
+    phi_t = f.phi + w*dt
+    p_belief = np.zeros(f.belief.shape)
+    for i in range(f.belief.shape[0]):
+        for j in range(f.belief.shape[1]):
+            if f.belief[i,j] > 0:
+                if d_t[i,j] > f.d_max or d_t[i,j] < f.d_min or phi_t[i,j] < f.phi_min or phi_t[i,j] > f.phi_max:
+                    continue
+                i_new = int(floor((d_t[i,j] - f.d_min)/f.delta_d))
+                j_new = int(floor((phi_t[i,j] - f.phi_min)/f.delta_phi))
+                if i_new >= f.belief.shape[0] or j_new >= f.belief.shape[1]:
+                    continue
+                p_belief[i_new,j_new] += f.belief[i,j]
+    return p_belief
+
+
+def predict_vectorized(f, dt, v, w):
+    d_t = f.d + v*dt*np.sin(f.phi)
+    phi_t = f.phi + w*dt
+    return f._accumulate(d_t, phi_t, f.belief)
+
+
+def check_parity(f, dt, v, w):
+    expected = predict_loop(f, dt, v, w)
+    obtained = predict_vectorized(f, dt, v, w)
+    if not np.array_equal(expected, obtained):
+        msg = 'Vectorized prediction differs for dt=%s v=%s w=%s' % (dt, v, w)
+        msg += '\n grid: %s' % (f.d.shape,)
+        msg += '\n max abs difference: %s' % np.max(np.abs(expected - obtained))
+        raise Exception(msg)
+
+
+@comptest
+def predict_parity():
+    f = LaneFilterHistogram(get_configuration())
+    for dt, v, w in [(0.1, 0.2, 0.5), (0.03, 0.4, -1.0), (0.5, 0.0, 0.0), (0.2, -0.3, 2.0)]:
+        check_parity(f, dt, v, w)
+        f.predict(dt, v, w)
+
+
+@comptest
+def predict_parity_fine_grids():
+    for delta_d, delta_phi in [(0.01, 0.05), (0.005, 0.02)]:
+        f = LaneFilterHistogram(get_configuration(delta_d=delta_d, delta_phi=delta_phi))
+        for dt, v, w in [(0.1, 0.2, 0.5), (0.2, -0.3, 2.0)]:
+            check_parity(f, dt, v, w)
+            f.predict(dt, v, w)
+
+
+if __name__ == '__main__':
+    run_module_tests()
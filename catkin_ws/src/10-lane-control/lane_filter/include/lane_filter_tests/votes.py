@@ -0,0 +1,73 @@
+from comptests.registrar import comptest, run_module_tests
+from math import floor
+
+from duckietown_msgs.msg import Segment  # @UnresolvedImport
+from lane_filter import LaneFilterHistogram
+from lane_filter.lane_filter import segments_to_arrays
+import numpy as np
+
+from .predict import get_configuration
+
+
+def random_segments(n, seed=0):
+    """ Random segments in front of the robot, of all colors. """
+    rng = np.random.RandomState(seed)
+    segments = []
+    for _ in range(n):
+        s = Segment()
+        s.color = rng.choice([Segment.WHITE, Segment.YELLOW, Segment.RED])
+        for p in s.points:
+            p.x = rng.uniform(-0.05, 0.5)
+            p.y = rng.uniform(-0.3, 0.3)
+        segments.append(s)
+    return segments
+
+
+def likelihood_loop(f, segments):
+    """ The original (per-segment) implementation. """
+    measurement_likelihood = np.zeros(f.d.shape)
+    for segment in segments:
+        if segment.color != segment.WHITE and segment.color != segment.YELLOW:
+            continue
+        if segment.points[0].x < 0 or segment.points[1].x < 0:
+            continue
+        d_i,phi_i,_ = f.generateVote(segment)
+        if d_i > f.d_max or d_i < f.d_min or phi_i < f.phi_min or phi_i>f.phi_max:
+            continue
+        i = int(floor((d_i - f.d_min)/f.delta_d))
+        j = int(floor((phi_i - f.phi_min)/f.delta_phi))
+        measurement_likelihood[i,j] = measurement_likelihood[i,j] +  1 
+    if np.linalg.norm(measurement_likelihood) == 0:            
+        return None
+    return measurement_likelihood/np.sum(measurement_likelihood)
+
+
+@comptest
+def votes_parity():
+    f = LaneFilterHistogram(get_configuration())
+    segments = random_segments(500)
+    points, colors = segments_to_arrays(segments)
+    keep = (colors == Segment.WHITE) | (colors == Segment.YELLOW)
+    d, phi, l = f.generateVotes(points[keep], colors[keep])
+    expected = np.array([f.generateVote(s) for s, k in zip(segments, keep) if k])
+    obtained = np.vstack([d, phi, l]).T
+    if not np.allclose(expected, obtained):
+        raise Exception('generateVotes() differs from generateVote().')
+
+
+@comptest
+def likelihood_parity():
+    f = LaneFilterHistogram(get_configuration())
+    for n in [0, 1, 10, 500]:
+        segments = random_segments(n, seed=n)
+        expected = likelihood_loop(f, segments)
+        obtained = f.generate_measurement_likelihood(segments)
+        if expected is None or obtained is None:
+            if not (expected is None and obtained is None):
+                raise Exception('Expected %s, obtained %s' % (expected, obtained))
+        elif not np.allclose(expected, obtained):
+            raise Exception('Measurement likelihood differs for %d segments.' % n)
+
+
+if __name__ == '__main__':
+    run_module_tests()
@@ -4,7 +4,7 @@ from distutils.core import setup
 from catkin_pkg.python_setup import generate_distutils_setup
 
 setup_args = generate_distutils_setup(
-    packages=['lane_filter'],
+    packages=['lane_filter', 'lane_filter_tests'],
     package_dir={'': 'include'},
 )
 
@@ -5,6 +5,7 @@ from sensor_msgs.msg import Image
 from std_msgs.msg import Float32
 from duckietown_msgs.msg import SegmentList, Segment, Pixel, LanePose, BoolStamped, Twist2DStamped
 from duckietown_utils.instantiate_utils import instantiate
+from line_detector.segment_list_array import SegmentListArray
 
 class LaneFilterNode(object):
     def __init__(self):
@@ -17,7 +18,7 @@ class LaneFilterNode(object):
         self.velocity = Twist2DStamped()
         
         # Subscribers
-        self.sub = rospy.Subscriber("~segment_list", SegmentList, self.processSegments, queue_size=1)
+        self.sub = rospy.Subscriber("~segment_list", SegmentListArray, self.processSegments, queue_size=1)
         self.sub_switch = rospy.Subscriber("~switch", BoolStamped, self.cbSwitch, queue_size=1)
         self.sub_velocity = rospy.Subscriber("~car_cmd", Twist2DStamped, self.updateVelocity)
 
@@ -54,7 +55,7 @@ class LaneFilterNode(object):
         self.t_last_update = current_time
 
         # Step 2: update
-        ml = self.filter.update(segment_list_msg.segments)
+        ml = self.filter.update(segment_list_msg.array)
         if ml is not None:
             ml_img = self.getDistributionImage(ml,segment_list_msg.header.stamp)
             self.pub_ml_img.publish(ml_img)
@@ -3,7 +3,7 @@ import cv2
 from duckietown_utils.parameters import Configurable
 import numpy as np
 
-from .line_detector_interface import (Detections,
+from .line_detector_interface import (AllDetections, Detections,
                                       LineDetectorInterface)
 import copy
 
@@ -35,7 +35,16 @@ class LineDetectorHSV(Configurable, LineDetectorInterface):
         configuration = copy.deepcopy(configuration)
         Configurable.__init__(self, param_names, configuration)
 
-    def _colorFilter(self, color):
+        # structuring elements, cached by size across frames
+        self._kernels = {}
+
+    def _getKernel(self):
+        size = self.dilation_kernel_size
+        if not size in self._kernels:
+            self._kernels[size] = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size))
+        return self._kernels[size]
+
+    def _colorMask(self, color):
         # threshold colors in HSV space
         if color == 'white':
             bw = cv2.inRange(self.hsv, self.hsv_white1, self.hsv_white2)
@@ -47,16 +56,37 @@ class LineDetectorHSV(Configurable, LineDetectorInterface):
             bw = cv2.bitwise_or(bw1, bw2)
         else:
             raise Exception('Error: Undefined color strings...')
+        return bw
+
+    def _colorFilter(self, color):
+        bw = self._colorMask(color)
 
         # binary dilation
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE,(self.dilation_kernel_size, self.dilation_kernel_size))
-        bw = cv2.dilate(bw, kernel)
+        bw = cv2.dilate(bw, self._getKernel())
         
         # refine edge for certain color
         edge_color = cv2.bitwise_and(bw, self.edges)
 
         return bw, edge_color
 
+    def _colorFilterAll(self):
+        """ 
+            Same as _colorFilter() for all of AllDetections._fields, 
+            but the masks are stacked as the channels of one image, so 
+            that dilation and the AND with the edges are done in one pass. 
+        """
+        colors = AllDetections._fields
+        bw = cv2.merge([self._colorMask(color) for color in colors])
+
+        # binary dilation
+        bw = cv2.dilate(bw, self._getKernel())
+
+        # refine edge for each color
+        edges = cv2.merge([self.edges] * len(colors))
+        edge_color = cv2.bitwise_and(bw, edges)
+
+        return zip(cv2.split(bw), cv2.split(edge_color))
+
     def _findEdge(self, gray):
         edges = cv2.Canny(gray, self.canny_thresholds[0], self.canny_thresholds[1], apertureSize = 3)
         return edges
@@ -128,6 +158,14 @@ class LineDetectorHSV(Configurable, LineDetectorInterface):
         centers, normals = self._findNormal(bw, lines)
         return Detections(lines=lines, normals=normals, area=bw, centers=centers)
 
+    def detectAll(self):
+        detections = []
+        for bw, edge_color in self._colorFilterAll():
+            lines = self._HoughLine(edge_color)
+            centers, normals = self._findNormal(bw, lines)
+            detections.append(Detections(lines=lines, normals=normals, area=bw, centers=centers))
+        return AllDetections(*detections)
+
     def setImage(self, bgr):
         self.bgr = np.copy(bgr)
         self.hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
@@ -1,7 +1,7 @@
 import numpy as np
 import cv2
 
-from .line_detector_interface import Detections, LineDetectorInterface
+from .line_detector_interface import AllDetections, Detections, LineDetectorInterface
 
 from duckietown_utils.parameters import Configurable
 
@@ -30,7 +30,16 @@ class LineDetector2Dense(Configurable, LineDetectorInterface):
 
         Configurable.__init__(self, param_names, configuration)
 
-    def _colorFilter(self, color):
+        # structuring elements, cached by size across frames
+        self._kernels = {}
+
+    def _getKernel(self):
+        size = self.dilation_kernel_size
+        if not size in self._kernels:
+            self._kernels[size] = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size))
+        return self._kernels[size]
+
+    def _colorMask(self, color):
         # threshold colors in HSV space
         if color == 'white':
             bw = cv2.inRange(self.hsv, self.hsv_white1, self.hsv_white2)
@@ -42,15 +51,31 @@ class LineDetector2Dense(Configurable, LineDetectorInterface):
             bw = cv2.bitwise_or(bw1, bw2)
         else:
             raise Exception('Error: Undefined color strings...')
+        return bw
 
-        # binary dilation
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE,(self.dilation_kernel_size, self.dilation_kernel_size))
+    def _colorFilter(self, color):
+        bw = self._colorMask(color)
 
         # refine edge for certain color
-        edge_color = cv2.bitwise_and(cv2.dilate(bw, kernel), self.edges)
+        edge_color = cv2.bitwise_and(cv2.dilate(bw, self._getKernel()), self.edges)
 
         return bw, edge_color
 
+    def _colorFilterAll(self):
+        """ 
+            Same as _colorFilter() for all of AllDetections._fields, 
+            with the masks stacked as channels of one image. 
+        """
+        colors = AllDetections._fields
+        masks = [self._colorMask(color) for color in colors]
+        bw = cv2.merge(masks)
+
+        # refine edge for each color
+        edges = cv2.merge([self.edges] * len(colors))
+        edge_color = cv2.bitwise_and(cv2.dilate(bw, self._getKernel()), edges)
+
+        return zip(masks, cv2.split(edge_color))
+
     def _lineFilter(self, bw, edge_color):
         # find gradient of the bw image
         grad_x = -cv2.Sobel(bw/255, cv2.CV_32F, 1, 0, ksize=5)
@@ -103,6 +128,13 @@ class LineDetector2Dense(Configurable, LineDetectorInterface):
         lines, normals, centers = self._lineFilter(bw, edge_color)
         return Detections(lines=lines, normals=normals, area=bw, centers=centers)
 
+    def detectAll(self):
+        detections = []
+        for bw, edge_color in self._colorFilterAll():
+            lines, normals, centers = self._lineFilter(bw, edge_color)
+            detections.append(Detections(lines=lines, normals=normals, area=bw, centers=centers))
+        return AllDetections(*detections)
+
     def setImage(self, bgr):
         self.bgr = np.copy(bgr)
         self.hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
@@ -6,6 +6,10 @@ FAMILY_LINE_DETECTOR = 'line_detector'
 Detections = namedtuple('Detections', 
                         ['lines','normals','area','centers'])
 
+# The result of detectAll(): one Detections for each color
+AllDetections = namedtuple('AllDetections',
+                           ['white', 'yellow', 'red'])
+
 
 class LineDetectorInterface():
     __metaclass__ = ABCMeta
@@ -18,4 +22,11 @@ class LineDetectorInterface():
     def detectLines(self, color):
         """ Returns a tuple of class Detections """
 
-
+    @abstractmethod
+    def detectAll(self):
+        """ 
+            Detects the lines for all colors at once, sharing the
+            color segmentation work between them.
+            
+            Returns a tuple of class AllDetections. 
+        """
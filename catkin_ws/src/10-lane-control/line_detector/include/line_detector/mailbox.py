@@ -0,0 +1,40 @@
+import threading
+import time
+
+
+class Mailbox():
+    """
+        A single-slot queue between two threads, where the latest message wins:
+        putting a message while the previous one was not taken yet
+        replaces it.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.item = None
+        self.t_put = None
+
+    def put(self, item):
+        """ Returns True if a message that was not taken was dropped. """
+        with self.cond:
+            dropped = self.item is not None
+            self.item = item
+            self.t_put = time.time()
+            self.cond.notify()
+        return dropped
+
+    def get(self):
+        """
+            Blocks until a message is available.
+
+            Returns the tuple (item, residency), where residency is the
+            time in seconds that the message spent in the mailbox.
+        """
+        with self.cond:
+            while self.item is None:
+                # (not timed: in Python 2 a timed wait polls, adding latency)
+                self.cond.wait()
+            item = self.item
+            residency = time.time() - self.t_put
+            self.item = None
+        return item, residency
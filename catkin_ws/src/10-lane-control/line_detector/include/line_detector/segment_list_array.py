@@ -0,0 +1,116 @@
+import struct
+
+from duckietown_msgs.msg import Segment, SegmentList  # @UnresolvedImport
+from duckietown_utils.segments_array import (SEGMENT_DTYPE,
+    segments_array_deserialize, segments_array_from_lines,
+    segments_array_from_segments, segments_array_serialize)
+from std_msgs.msg import Header  # @UnresolvedImport
+import numpy as np
+
+
+class SegmentListArray(SegmentList):
+    """
+        A SegmentList whose segments are stored in a structured array
+        (see duckietown_utils.SEGMENT_DTYPE) instead of a list of
+        Segment objects.
+
+        It has the same type and md5sum as SegmentList, so it can be
+        published on, and be the data_class of a Subscriber to, any
+        SegmentList topic: (de)serialization is a single copy of the array.
+
+        The Segment objects are created only if the field "segments" is
+        accessed; from then on, that list is the content of the message.
+    """
+
+    def __init__(self, *args, **kwds):
+        self._array = None
+        self._segments = None
+        SegmentList.__init__(self, *args, **kwds)
+
+    @staticmethod
+    def from_array(array, header=None):
+        msg = SegmentListArray()
+        if header is not None:
+            msg.header = header
+        msg.array = array
+        return msg
+
+    @property
+    def array(self):
+        if self._array is not None:
+            return self._array
+        # do not cache: the list might still be modified
+        return segments_array_from_segments(self._segments or [])
+
+    @array.setter
+    def array(self, array):
+        self._array = array
+        self._segments = None
+
+    @property
+    def segments(self):
+        if self._segments is None and self._array is not None:
+            self._segments = segments_from_array(self._array)
+            self._array = None
+        return self._segments
+
+    @segments.setter
+    def segments(self, segments):
+        self._segments = segments
+        self._array = None
+
+    def serialize(self, buff):
+        self.header.serialize(buff)
+        segments_array_serialize(self.array, buff)
+
+    def deserialize(self, str):  # @ReservedAssignment
+        if self.header is None:
+            self.header = Header()
+        # seq, stamp.secs, stamp.nsecs, then the frame_id string
+        length, = struct.unpack_from('<I', str, 12)
+        end = 16 + length
+        self.header.deserialize(str[:end])
+        self.array, _ = segments_array_deserialize(str, end)
+        return self
+
+    def serialize_numpy(self, buff, numpy):  # @UnusedVariable
+        self.serialize(buff)
+
+    def deserialize_numpy(self, str, numpy):  # @ReservedAssignment @UnusedVariable
+        return self.deserialize(str)
+
+
+def segments_from_array(array):
+    """ Converts the array to a list of Segment messages. """
+    segments = []
+    for color, pixels, normal, points in array.tolist():
+        segment = Segment()
+        segment.color = color
+        for i in range(2):
+            segment.pixels_normalized[i].x, segment.pixels_normalized[i].y = pixels[i]
+            p = segment.points[i]
+            p.x, p.y, p.z = points[i]
+        segment.normal.x, segment.normal.y = normal
+        segments.append(segment)
+    return segments
+
+
+def segment_list_from_detections(top_cutoff, shape, white, yellow, red):
+    """
+        Returns a SegmentListArray with the lines detected in the
+        image of the given shape (H, W) cut at top_cutoff, in
+        normalized pixel coordinates.
+    """
+    s0, s1 = shape
+    arr_cutoff = np.array((0, top_cutoff, 0, top_cutoff))
+    arr_ratio = np.array((1. / s1, 1. / s0, 1. / s1, 1. / s0))
+
+    arrays = [np.zeros((0,), SEGMENT_DTYPE)]
+    for detections, color in [(white, Segment.WHITE),
+                              (yellow, Segment.YELLOW),
+                              (red, Segment.RED)]:
+        if len(detections.lines) > 0:
+            lines_normalized = (detections.lines + arr_cutoff) * arr_ratio
+            arrays.append(segments_array_from_lines(lines_normalized,
+                                                    detections.normals, color))
+    return SegmentListArray.from_array(np.concatenate(arrays))
@@ -0,0 +1,7 @@
+def jobs_comptests(context):  
+    
+    from . import mailbox
+    from . import segment_list_array
+    
+    from comptests.registrar import jobs_registrar_simple
+    jobs_registrar_simple(context)
@@ -0,0 +1,58 @@
+import threading
+import time
+
+from comptests.registrar import comptest, run_module_tests
+
+from line_detector.mailbox import Mailbox
+
+
+@comptest
+def mailbox_latest_wins():
+    mailbox = Mailbox()
+    assert mailbox.put(1) == False
+    # 1 was not taken: it is replaced
+    assert mailbox.put(2) == True
+    assert mailbox.put(3) == True
+    item, _ = mailbox.get()
+    assert item == 3
+    # the mailbox is empty again
+    assert mailbox.put(4) == False
+    item, _ = mailbox.get()
+    assert item == 4
+
+
+@comptest
+def mailbox_residency():
+    mailbox = Mailbox()
+    mailbox.put('a')
+    time.sleep(0.1)
+    item, residency = mailbox.get()
+    assert item == 'a'
+    assert 0.1 <= residency < 1.0, residency
+
+
+@comptest
+def mailbox_blocking_get():
+    mailbox = Mailbox()
+    received = []
+
+    def consumer():
+        received.append(mailbox.get())
+
+    t = threading.Thread(target=consumer)
+    t.daemon = True
+    t.start()
+    time.sleep(0.05)
+    assert not received
+    t0 = time.time()
+    mailbox.put('b')
+    t.join(5.0)
+    # woken up by put(); the bound is generous, for loaded machines
+    assert time.time() - t0 < 0.5, time.time() - t0
+    (item, residency), = received
+    assert item == 'b'
+    assert 0 <= residency < 0.5, residency
+
+
+if __name__ == '__main__':
+    run_module_tests()
@@ -0,0 +1,89 @@
+from io import BytesIO
+
+from comptests.registrar import comptest, run_module_tests
+
+from duckietown_msgs.msg import Segment, SegmentList  # @UnresolvedImport
+from duckietown_utils.segments_array import segments_array_from_lines
+from line_detector.segment_list_array import SegmentListArray, segments_from_array
+from std_msgs.msg import Header  # @UnresolvedImport
+import numpy as np
+import rospy  # @UnresolvedImport
+
+
+def get_array():
+    lines = np.array([[0.1, 0.2, 0.3, 0.4],
+                      [0.5, 0.6, 0.7, 0.8],
+                      [0.25, 0.5, 0.75, 1.0]])
+    normals = np.array([[1., 0.], [0., -1.], [0.5, 0.5]])
+    array = np.concatenate([segments_array_from_lines(lines[:2], normals[:2], Segment.WHITE),
+                            segments_array_from_lines(lines[2:], normals[2:], Segment.RED)])
+    array['points'][1] = [[1., 2., 0.], [3., 4., 0.]]
+    return array
+
+
+def get_header():
+    header = Header()
+    header.seq = 12
+    header.stamp = rospy.Time(1500000000, 123456)
+    header.frame_id = 'duckiebot/camera'
+    return header
+
+
+def serialize(msg):
+    buff = BytesIO()
+    msg.serialize(buff)
+    return buff.getvalue()
+
+
+@comptest
+def segment_list_array_round_trip():
+    array = get_array()
+    msg = SegmentListArray.from_array(array, header=get_header())
+    data = serialize(msg)
+
+    msg2 = SegmentListArray().deserialize(data)
+    assert msg2.header == get_header()
+    assert msg2.array.tobytes() == array.tobytes()
+    # serialized again in the same way
+    assert serialize(msg2) == data
+
+    # after accessing the segments, the list is the content
+    segments = msg2.segments
+    assert len(segments) == 3
+    assert segments[2].color == Segment.RED
+    assert segments[1].points[1].x == 3.
+    segments.pop()
+    assert len(SegmentListArray().deserialize(serialize(msg2)).array) == 2
+
+
+@comptest
+def segment_list_array_same_as_segment_list():
+    array = get_array()
+    msg = SegmentListArray.from_array(array, header=get_header())
+    data = serialize(msg)
+
+    # the same bytes as a SegmentList with the same segments
+    msg_list = SegmentList()
+    msg_list.header = get_header()
+    msg_list.segments = segments_from_array(array)
+    assert serialize(msg_list) == data
+
+    # which can be read by a subscriber of SegmentList
+    msg3 = SegmentList()
+    msg3.deserialize(data)
+    assert msg3.header == get_header()
+    assert len(msg3.segments) == 3
+    assert msg3.segments == msg_list.segments
+    assert SegmentListArray._md5sum == SegmentList._md5sum
+
+
+@comptest
+def segment_list_array_empty():
+    msg = SegmentListArray.from_array(get_array()[:0])
+    msg2 = SegmentListArray().deserialize(serialize(msg))
+    assert len(msg2.array) == 0
+    assert msg2.segments == []
+
+
+if __name__ == '__main__':
+    run_module_tests()
@@ -4,11 +4,13 @@ from cv_bridge import CvBridge, CvBridgeError
 from duckietown_msgs.msg import (AntiInstagramTransform, BoolStamped, Segment,
     SegmentList, Vector2D)
 from duckietown_utils.instantiate_utils import instantiate
-from duckietown_utils.jpg import image_cv_from_jpg
+from duckietown_utils.jpg import image_cv_from_jpg, image_cv_from_jpg_resized
 from geometry_msgs.msg import Point
 from sensor_msgs.msg import CompressedImage, Image
 from visualization_msgs.msg import Marker
 
+from line_detector.mailbox import Mailbox
+from line_detector.segment_list_array import segment_list_from_detections
 from line_detector.timekeeper import TimeKeeper
 import cv2
 import rospy
@@ -22,8 +24,12 @@ class LineDetectorNode(object):
     def __init__(self):
         self.node_name = "LineDetectorNode"
 
-        # Thread lock 
-        self.thread_lock = threading.Lock()
+        # Frames go through two stages, each with its own worker thread: 
+        # decode/resize/correct and detect/publish. Between the stages 
+        # there is a single-slot mailbox where the latest frame wins, so 
+        # that frame N+1 is decoded while frame N is being detected. 
+        self.mailbox_decode = Mailbox()
+        self.mailbox_detect = Mailbox()
        
         # Constructor of line detector 
         self.bridge = CvBridge()
@@ -39,6 +45,9 @@ class LineDetectorNode(object):
         # color correction
         self.ai = AntiInstagram()
 
+        # buffer reused for decoding when fast_decoding is set
+        self.decode_buffer = None
+
         # these will be added if it becomes verbose
         self.pub_edge = None
         self.pub_colorSegment = None
@@ -60,6 +69,11 @@ class LineDetectorNode(object):
 
         rospy.Timer(rospy.Duration.from_sec(2.0), self.updateParams)
 
+        for target in [self.decodeLoop, self.detectLoop]:
+            thread = threading.Thread(target=target)
+            thread.setDaemon(True)
+            thread.start()
+
 
     def updateParams(self, _event):
         old_verbose = self.verbose
@@ -70,6 +84,8 @@ class LineDetectorNode(object):
 
         self.image_size = rospy.get_param('~img_size')
         self.top_cutoff = rospy.get_param('~top_cutoff')
+        # If true, decode directly at img_size (see image_cv_from_jpg_resized)
+        self.fast_decoding = rospy.get_param('~fast_decoding', False)
 
         if self.detector is None:
             c = rospy.get_param('~detector')
@@ -94,11 +110,9 @@ class LineDetectorNode(object):
 
         if not self.active:
             return 
-        # Start a daemon thread to process the image
-        thread = threading.Thread(target=self.processImage,args=(image_msg,))
-        thread.setDaemon(True)
-        thread.start()
-        # Returns rightaway
+        # Hand the image to the decoding thread; returns rightaway
+        if self.mailbox_decode.put(image_msg):
+            self.stats.skipped()
 
     def cbTransform(self, transform_msg):
         self.ai.shift = transform_msg.s[0:3]
@@ -117,19 +131,73 @@ class LineDetectorNode(object):
             return
         self.loginfo('%3d:%s' % (self.intermittent_counter, s))
 
-    def processImage(self, image_msg):
-        if not self.thread_lock.acquire(False):
-            self.stats.skipped()
-            # Return immediately if the thread is locked
-            return
+    def decodeLoop(self):
+        while not rospy.is_shutdown():
+            image_msg, residency = self.mailbox_decode.get()
+            self.stats.queued('decode', residency)
+            try:
+                self.decodeImage_(image_msg)
+            except Exception as e:
+                rospy.logerr('[%s] Error while decoding: %s' % (self.node_name, e))
+
+    def detectLoop(self):
+        while not rospy.is_shutdown():
+            (image_msg, tk, image_cv_corr), residency = self.mailbox_detect.get()
+            self.stats.queued('detect', residency)
+            try:
+                self.processImage_(image_msg, tk, image_cv_corr)
+            except Exception as e:
+                rospy.logerr('[%s] Error while detecting: %s' % (self.node_name, e))
+
+    def decodeImage_(self, image_msg):
+        tk = TimeKeeper(image_msg)
+
+        if self.fast_decoding:
+            # Decode, resize and crop in one step
+            H, W = self.image_size
+            if self.decode_buffer is None or self.decode_buffer.shape != (H, W, 3):
+                self.decode_buffer = np.empty((H, W, 3), 'uint8')
+            try:
+                image_cv = image_cv_from_jpg_resized(image_msg.data, (H, W), 
+                                                     self.top_cutoff, dst=self.decode_buffer)
+            except ValueError as e:
+                self.loginfo('Could not decode image: %s' % e)
+                return
+
+            tk.completed('decoded+resized')
+        else:
+            # Decode from compressed image with OpenCV
+            try:
+                image_cv = image_cv_from_jpg(image_msg.data)
+            except ValueError as e:
+                self.loginfo('Could not decode image: %s' % e)
+                return
+    
+            tk.completed('decoded')
+    
+            # Resize and crop image
+            hei_original, wid_original = image_cv.shape[0:2]
+    
+            if self.image_size[0] != hei_original or self.image_size[1] != wid_original:
+                # image_cv = cv2.GaussianBlur(image_cv, (5,5), 2)
+                image_cv = cv2.resize(image_cv, (self.image_size[1], self.image_size[0]),
+                                       interpolation=cv2.INTER_NEAREST)
+            image_cv = image_cv[self.top_cutoff:,:,:]
+    
+            tk.completed('resized')
+
+        # apply color correction: AntiInstagram
+        # (a new image each time: the previous one might still be
+        # used by the detection thread)
+        image_cv_corr = self.ai.applyTransform(image_cv)
+
+        tk.completed('corrected')
 
-        try:
-            self.processImage_(image_msg)
-        finally:
-            # Release the thread lock
-            self.thread_lock.release()
+        # Hand the image to the detection thread
+        if self.mailbox_detect.put((image_msg, tk, image_cv_corr)):
+            self.stats.skipped()
 
-    def processImage_(self, image_msg):
+    def processImage_(self, image_msg, tk, image_cv_corr):
 
         self.stats.processed()
 
@@ -137,64 +205,23 @@ class LineDetectorNode(object):
             self.intermittent_log(self.stats.info())
             self.stats.reset()
 
-        tk = TimeKeeper(image_msg)
-        
         self.intermittent_counter += 1
 
-        # Decode from compressed image with OpenCV
-        try:
-            image_cv = image_cv_from_jpg(image_msg.data)
-        except ValueError as e:
-            self.loginfo('Could not decode image: %s' % e)
-            return
-
-        tk.completed('decoded')
-
-        # Resize and crop image
-        hei_original, wid_original = image_cv.shape[0:2]
-
-        if self.image_size[0] != hei_original or self.image_size[1] != wid_original:
-            # image_cv = cv2.GaussianBlur(image_cv, (5,5), 2)
-            image_cv = cv2.resize(image_cv, (self.image_size[1], self.image_size[0]),
-                                   interpolation=cv2.INTER_NEAREST)
-        image_cv = image_cv[self.top_cutoff:,:,:]
-
-        tk.completed('resized')
-
-        # apply color correction: AntiInstagram
-        image_cv_corr = self.ai.applyTransform(image_cv)
-        image_cv_corr = cv2.convertScaleAbs(image_cv_corr)
-
-        tk.completed('corrected')
+        tk.completed('dequeued')
 
         # Set the image to be detected
         self.detector.setImage(image_cv_corr)
 
         # Detect lines and normals
 
-        white = self.detector.detectLines('white')
-        yellow = self.detector.detectLines('yellow')
-        red = self.detector.detectLines('red')
+        white, yellow, red = self.detector.detectAll()
 
         tk.completed('detected')
      
-        # SegmentList constructor
-        segmentList = SegmentList()
+        # Convert to normalized pixel coordinates, in one array
+        segmentList = segment_list_from_detections(self.top_cutoff, self.image_size, white, yellow, red)
         segmentList.header.stamp = image_msg.header.stamp
         
-        # Convert to normalized pixel coordinates, and add segments to segmentList
-        arr_cutoff = np.array((0, self.top_cutoff, 0, self.top_cutoff))
-        arr_ratio = np.array((1./self.image_size[1], 1./self.image_size[0], 1./self.image_size[1], 1./self.image_size[0]))
-        if len(white.lines) > 0:
-            lines_normalized_white = ((white.lines + arr_cutoff) * arr_ratio)
-            segmentList.segments.extend(self.toSegmentMsg(lines_normalized_white, white.normals, Segment.WHITE))
-        if len(yellow.lines) > 0:
-            lines_normalized_yellow = ((yellow.lines + arr_cutoff) * arr_ratio)
-            segmentList.segments.extend(self.toSegmentMsg(lines_normalized_yellow, yellow.normals, Segment.YELLOW))
-        if len(red.lines) > 0:
-            lines_normalized_red = ((red.lines + arr_cutoff) * arr_ratio)
-            segmentList.segments.extend(self.toSegmentMsg(lines_normalized_red, red.normals, Segment.RED))
-        
         self.intermittent_log('# segments: white %3d yellow %3d red %3d' % (len(white.lines),
                 len(yellow.lines), len(red.lines)))
         
@@ -238,22 +265,6 @@ class LineDetectorNode(object):
 
     def onShutdown(self):
         self.loginfo("Shutdown.")
-            
-    def toSegmentMsg(self,  lines, normals, color):
-        
-        segmentMsgList = []
-        for x1,y1,x2,y2,norm_x,norm_y in np.hstack((lines,normals)):
-            segment = Segment()
-            segment.color = color
-            segment.pixels_normalized[0].x = x1
-            segment.pixels_normalized[0].y = y1
-            segment.pixels_normalized[1].x = x2
-            segment.pixels_normalized[1].y = y2
-            segment.normal.x = norm_x
-            segment.normal.y = norm_y
-             
-            segmentMsgList.append(segment)
-        return segmentMsgList
 
 class Stats():
     def __init__(self):
@@ -266,6 +277,8 @@ class Stats():
         self.nreceived = 0
         self.nskipped = 0
         self.nprocessed = 0
+        # stage -> (number of frames, total time, max time) in the mailbox
+        self.residency = {}
 
     def received(self):
         if self.nreceived == 0 and self.nresets == 1:
@@ -275,6 +288,10 @@ class Stats():
     def skipped(self):
         self.nskipped += 1
 
+    def queued(self, stage, residency):
+        n, total, max_ = self.residency.get(stage, (0, 0.0, 0.0))
+        self.residency[stage] = (n + 1, total + residency, max(max_, residency))
+
     def processed(self):
         if self.nprocessed == 0 and self.nresets == 1:
             rospy.loginfo('line_detector_node processing first image.')
@@ -296,6 +313,9 @@ class Stats():
              (delta, self.nreceived, fps(self.nreceived),
               self.nprocessed, fps(self.nprocessed),
               self.nskipped, fps(self.nskipped), skipped_perc))
+        for stage, (n, total, max_) in sorted(self.residency.items()):
+            m += ('\n  queue %s: residency avg %.1f ms max %.1f ms' % 
+                  (stage, 1000 * total / n, 1000 * max_))
         return m
 
 
@@ -1,7 +1,7 @@
 import cv2
 
-from duckietown_msgs.msg import (Segment, SegmentList)  # @UnresolvedImport
-from line_detector2.ldn import toSegmentMsg
+from duckietown_utils.jpg import image_cv_from_jpg_resized
+from line_detector.segment_list_array import segment_list_from_detections
 import numpy as np
 
 
@@ -10,6 +10,25 @@ class ImagePrep():
     def __init__(self, shape, top_cutoff):
         self.shape = shape
         self.top_cutoff = top_cutoff
+        # buffers reused by decode_jpg() and _process_cut()
+        self.decode_buffer = None
+        self.corrected_buffer = None
+    
+    def decode_jpg(self, context, jpg_data):
+        """ 
+            Decodes the JPG data directly at the final resolution,
+            which is faster than decoding and then resizing, but 
+            does not give the same image (the decoder averages the 
+            pixels instead of picking the nearest one).
+            
+            Returns the image to give to process(); 
+            raises ValueError if the data cannot be decoded. 
+        """
+        with context.phase('decoding+resizing'):
+            h1, w1 = self.shape
+            if self.decode_buffer is None or self.decode_buffer.shape != (h1, w1, 3):
+                self.decode_buffer = np.empty((h1, w1, 3), 'uint8')
+            return image_cv_from_jpg_resized(jpg_data, self.shape, dst=self.decode_buffer)
     
     def process(self, context, image_cv, line_detector, transform):
         """ Returns SegmentList """
@@ -27,13 +46,18 @@ class ImagePrep():
                 self.image_resized = image_cv
             self.image_cut = self.image_resized[self.top_cutoff:,:,:]
             
+        return self._process_cut(context, line_detector, transform)
             
+    def _process_cut(self, context, line_detector, transform):
         with context.phase('correcting'):
             # apply color correction: AntiInstagram
             if transform is not None:
-                _ = transform(self.image_cut)
-                # XXX
-                self.image_corrected = cv2.convertScaleAbs(_)
+                # the transforms (AntiInstagram.applyTransform, ScaleAndShift)
+                # return uint8 images and can write into a buffer
+                if (self.corrected_buffer is None or 
+                    self.corrected_buffer.shape != self.image_cut.shape):
+                    self.corrected_buffer = np.empty(self.image_cut.shape, 'uint8')
+                self.image_corrected = transform(self.image_cut, dst=self.corrected_buffer)
             else:
                 self.image_corrected = self.image_cut
  
@@ -43,9 +67,7 @@ class ImagePrep():
             line_detector.setImage(self.image_corrected)
     
             # Detect lines and normals    
-            white = line_detector.detectLines('white')
-            yellow = line_detector.detectLines('yellow')
-            red = line_detector.detectLines('red')
+            white, yellow, red = line_detector.detectAll()
             segment_list = get_segment_list_normalized(self.top_cutoff, self.shape, white, yellow, red)
             
         # SegmentList constructor
@@ -57,25 +79,5 @@ class ImagePrep():
 
 
 def get_segment_list_normalized(top_cutoff, shape, white, yellow, red):
-    segmentList = SegmentList() 
-    
-    # Convert to normalized pixel coordinates, and add segments to segmentList
-    s0, s1 = shape
-    arr_cutoff = np.array((0, top_cutoff, 0, top_cutoff))
-    arr_ratio = np.array((1./ s1, 1./ s0, 1./ s1, 1./ s0))
-    
-    if len(white.lines) > 0:
-        lines_normalized_white = ((white.lines + arr_cutoff) * arr_ratio)
-        segmentList.segments.extend(toSegmentMsg(lines_normalized_white, white.normals, Segment.WHITE))
-    
-    if len(yellow.lines) > 0:
-        lines_normalized_yellow = ((yellow.lines + arr_cutoff) * arr_ratio)
-        segmentList.segments.extend(toSegmentMsg(lines_normalized_yellow, yellow.normals, Segment.YELLOW))
-    
-    if len(red.lines) > 0:
-        lines_normalized_red = ((red.lines + arr_cutoff) * arr_ratio)
-        segmentList.segments.extend(toSegmentMsg(lines_normalized_red, red.normals, Segment.RED))
-        
-    return segmentList
-            
-            
\ No newline at end of file
+    """ Returns a SegmentListArray (see line_detector.segment_list_array) """
+    return segment_list_from_detections(top_cutoff, shape, white, yellow, red)
@@ -8,6 +8,7 @@ from duckietown_utils.jpg import image_cv_from_jpg
 from duckietown_utils.text_utils import indent
 from easy_algo.algo_db import get_easy_algo_db
 from easy_node import EasyNode
+from line_detector.segment_list_array import segment_list_from_detections
 import numpy as np
 
 from .plotting import drawLines, color_segment
@@ -73,38 +74,21 @@ class LineDetectorNode2(EasyNode):
         with context.phase('correcting'):
             # apply color correction: AntiInstagram
             image_cv_corr = self.ai.applyTransform(image_cv)
-            image_cv_corr = cv2.convertScaleAbs(image_cv_corr)
  
         with context.phase('detection'):
             # Set the image to be detected
             self.detector.setImage(image_cv_corr)
     
             # Detect lines and normals    
-            white = self.detector.detectLines('white')
-            yellow = self.detector.detectLines('yellow')
-            red = self.detector.detectLines('red')
+            white, yellow, red = self.detector.detectAll()
  
 
         with context.phase('preparing-images'):
-            # SegmentList constructor
-            segmentList = SegmentList()
+            # Convert to normalized pixel coordinates, in one array
+            top_cutoff = self.config.top_cutoff
+            shape = self.config.img_size[0], self.config.img_size[1]
+            segmentList = segment_list_from_detections(top_cutoff, shape, white, yellow, red)
             segmentList.header.stamp = image_msg.header.stamp
-   
-            # Convert to normalized pixel coordinates, and add segments to segmentList
-            top_cutoff =  self.config.top_cutoff
-            s0, s1 = self.config.img_size[0],  self.config.img_size[1]
-
-            arr_cutoff = np.array((0, top_cutoff, 0, top_cutoff))
-            arr_ratio = np.array((1./ s1, 1./ s0, 1./ s1, 1./ s0))
-            if len(white.lines) > 0:
-                lines_normalized_white = ((white.lines + arr_cutoff) * arr_ratio)
-                segmentList.segments.extend(toSegmentMsg(lines_normalized_white, white.normals, Segment.WHITE))
-            if len(yellow.lines) > 0:
-                lines_normalized_yellow = ((yellow.lines + arr_cutoff) * arr_ratio)
-                segmentList.segments.extend(toSegmentMsg(lines_normalized_yellow, yellow.normals, Segment.YELLOW))
-            if len(red.lines) > 0:
-                lines_normalized_red = ((red.lines + arr_cutoff) * arr_ratio)
-                segmentList.segments.extend(toSegmentMsg(lines_normalized_red, red.normals, Segment.RED))
     
             self.intermittent_log('# segments: white %3d yellow %3d red %3d' % (len(white.lines),
                     len(yellow.lines), len(red.lines)))
@@ -17,10 +17,17 @@ from line_detector.visual_state_fancy_display import vs_fancy_display
 
 class LineDetectorProcessor(ProcessorInterface):
     
-    @contract(image_prep='str', line_detector='str')
-    def __init__(self, image_prep, line_detector):
+    @contract(image_prep='str', line_detector='str', reduced_decoding='bool')
+    def __init__(self, image_prep, line_detector, reduced_decoding=False):
+        """ 
+            If reduced_decoding is True, the images are decoded directly 
+            at the resolution of image_prep (see ImagePrep.decode_jpg()): 
+            this is faster, but the results are not the same, and the 
+            'processed' images are rendered at that resolution. 
+        """
         self.image_prep = image_prep
         self.line_detector = line_detector
+        self.reduced_decoding = reduced_decoding
         
     def process_log(self, bag_in, bag_out):
         algo_db = get_easy_algo_db()
@@ -34,12 +41,15 @@ class LineDetectorProcessor(ProcessorInterface):
         frame = 0
         for compressed_img_msg in d8n_bag_read_with_progress(bag_in, topic):
             
-            with context.phase('decoding'):
-                try:
-                    image_cv = image_cv_from_jpg(compressed_img_msg.data)
-                except ValueError as e:
-                    msg = 'Could not decode image: %s' % e
-                    raise_wrapped(ValueError, e, msg)
+            try:
+                if self.reduced_decoding:
+                    image_cv = image_prep.decode_jpg(context, compressed_img_msg.data)
+                else:
+                    with context.phase('decoding'):
+                        image_cv = image_cv_from_jpg(compressed_img_msg.data)
+            except ValueError as e:
+                msg = 'Could not decode image: %s' % e
+                raise_wrapped(ValueError, e, msg)
                 
             segment_list = image_prep.process(context, image_cv, line_detector, transform)
             
@@ -4,6 +4,7 @@
 def jobs_comptests(context):  
     
     from . import single_image 
+    from . import detect_all
  
     
     from comptests.registrar import jobs_registrar_simple
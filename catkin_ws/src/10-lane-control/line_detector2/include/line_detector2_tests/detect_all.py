@@ -0,0 +1,37 @@
+from comptests.registrar import comptest, run_module_tests
+
+from easy_algo.algo_db import get_easy_algo_db
+from line_detector.line_detector_interface import FAMILY_LINE_DETECTOR
+import numpy as np
+
+
+def synthetic_road_image(H=120, W=160):
+    """ A gray image with a white, a yellow and a red stripe (BGR). """
+    bgr = np.zeros((H, W, 3), 'uint8')
+    bgr[:, :, :] = 60
+    bgr[:, 10:25, :] = (255, 255, 255)
+    bgr[:, 70:80, :] = (0, 220, 240)
+    bgr[90:100, :, :] = (0, 0, 230)
+    return bgr
+
+
+@comptest
+def detect_all_same_as_detect_lines():
+    algo_db = get_easy_algo_db()
+    line_detector = algo_db.create_instance(FAMILY_LINE_DETECTOR, 'baseline')
+    line_detector.setImage(synthetic_road_image())
+
+    all_detections = line_detector.detectAll()
+    for color in all_detections._fields:
+        expected = line_detector.detectLines(color)
+        obtained = getattr(all_detections, color)
+        for field in expected._fields:
+            a = np.array(getattr(expected, field))
+            b = np.array(getattr(obtained, field))
+            if not np.array_equal(a, b):
+                msg = 'detectAll() differs from detectLines(%r) in %r.' % (color, field)
+                raise Exception(msg)
+
+
+if __name__ == '__main__':
+    run_module_tests()
@@ -4,6 +4,7 @@ import numpy as np
 from duckietown_msgs.msg import SegmentList, Segment, BoolStamped, StopLineReading, LanePose, FSMState
 from std_msgs.msg import Float32
 from geometry_msgs.msg import Point
+from line_detector.segment_list_array import SegmentListArray
 import time
 import math
 
@@ -23,7 +24,7 @@ class StopLineFilterNode(object):
         self.sleep = False
 
         ## publishers and subscribers
-        self.sub_segs      = rospy.Subscriber("~segment_list", SegmentList, self.processSegments)
+        self.sub_segs      = rospy.Subscriber("~segment_list", SegmentListArray, self.processSegments)
         self.sub_lane      = rospy.Subscriber("~lane_pose",LanePose, self.processLanePose)
         self.sub_mode      = rospy.Subscriber("fsm_node/mode",FSMState, self.processStateChange)
         self.pub_stop_line_reading = rospy.Publisher("~stop_line_reading", StopLineReading, queue_size=1)
@@ -71,22 +72,15 @@ class StopLineFilterNode(object):
         if not self.active or self.sleep:
             return
 
-        good_seg_count=0
-        stop_line_x_accumulator=0.0
-        stop_line_y_accumulator=0.0
-        for segment in segment_list_msg.segments:
-            if segment.color != segment.RED:
-                continue
-            if segment.points[0].x < 0 or segment.points[1].x < 0: # the point is behind us
-                continue
-
-            p1_lane = self.to_lane_frame(segment.points[0])
-            p2_lane = self.to_lane_frame(segment.points[1])
-            avg_x = 0.5*(p1_lane[0] + p2_lane[0])
-            avg_y = 0.5*(p1_lane[1] + p2_lane[1])
-            stop_line_x_accumulator += avg_x
-            stop_line_y_accumulator += avg_y # TODO output covariance and not just mean
-            good_seg_count += 1.0
+        segments = segment_list_msg.array
+        # the red segments that are not behind us
+        points = segments['points'][segments['color'] == Segment.RED]
+        points = points[np.all(points[:, :, 0] >= 0, axis=1)]
+        good_seg_count = len(points)
+        if good_seg_count > 0:
+            # average of the midpoints of the segments, in the lane frame
+            # TODO output covariance and not just mean
+            stop_line_x, stop_line_y = self.to_lane_frame_array(points[:, :, 0:2].mean(axis=1)).mean(axis=0)
 
         stop_line_reading_msg = StopLineReading()
         stop_line_reading_msg.header.stamp = segment_list_msg.header.stamp
@@ -98,8 +92,8 @@ class StopLineFilterNode(object):
 
         stop_line_reading_msg.stop_line_detected = True
         stop_line_point = Point()
-        stop_line_point.x = stop_line_x_accumulator/good_seg_count
-        stop_line_point.y = stop_line_y_accumulator/good_seg_count
+        stop_line_point.x = stop_line_x
+        stop_line_point.y = stop_line_y
         stop_line_reading_msg.stop_line_point = stop_line_point
         stop_line_reading_msg.at_stop_line = stop_line_point.x < self.stop_distance and math.fabs(stop_line_point.y) < 0.5
         self.pub_stop_line_reading.publish(stop_line_reading_msg)
@@ -120,6 +114,14 @@ class StopLineFilterNode(object):
         p_new = p_new_homo[0:2]
         return p_new
 
+    def to_lane_frame_array(self, points):
+        """ Vectorized version of to_lane_frame() for a (N,2) array """
+        phi = self.lane_pose.phi
+        d   = self.lane_pose.d
+        R = np.array([[math.cos(phi), -math.sin(phi)],
+                      [math.sin(phi), math.cos(phi)]])
+        return np.dot(points, R.T) + np.array([0, d])
+
     def onShutdown(self):
         rospy.loginfo("[StopLineFilterNode] Shutdown.")
 
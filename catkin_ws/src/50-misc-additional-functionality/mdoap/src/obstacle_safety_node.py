@@ -12,8 +12,8 @@ class ObstacleSafetyNode:
 
         self.sub_ = rospy.Subscriber("~detection_list", ObstacleImageDetectionList, self.cbDetectionsList, queue_size=1)
 
-        rospy.wait_for_service('ground_projection/get_ground_coordinate')
-        self.ground_proj = rospy.ServiceProxy('ground_projection/get_ground_coordinate',GetGroundCoord)
+        rospy.wait_for_service('ground_projection/get_ground_coordinates')
+        self.ground_proj = rospy.ServiceProxy('ground_projection/get_ground_coordinates',GetGroundCoords)
 
         self.pub_too_close = rospy.Publisher("~object_too_close", BoolStamped, queue_size=1)
         self.pub_projections = rospy.Publisher("~detection_list_proj", ObstacleProjectedDetectionList, queue_size=1)
@@ -35,8 +35,6 @@ class ObstacleSafetyNode:
         #For ground projection uncomment the next lines
         marker_array = MarkerArray()
 
-        p = Vector2D()
-        p2 = Vector2D()
         count = 0;
 
         projection_list = ObstacleProjectedDetectionList()
@@ -48,26 +46,34 @@ class ObstacleSafetyNode:
         width = detections_msg.imwidth
         height = detections_msg.imheight
         too_close = False
+
+        # project the two bottom corners of all the obstacles in one call
+        normalized_uvs = []
         for obstacle in detections_msg.list: 
-            marker = Marker()
             rect = obstacle.bounding_box
+            p = Vector2D()
             p.x = float(rect.x)/float(width)
             p.y = float(rect.y)/float(height)
 
+            p2 = Vector2D()
             p2.x = float(rect.x + rect.w)/float(width)
             p2.y = p.y
+            normalized_uvs.extend([p, p2])
+        gps = self.ground_proj(normalized_uvs).gps if normalized_uvs else []
 
-            projected_point = self.ground_proj(p)
-            projected_point2 = self.ground_proj(p2)
+        for k, obstacle in enumerate(detections_msg.list): 
+            marker = Marker()
+            gp = gps[2*k]
+            gp2 = gps[2*k+1]
 
-            obj_width = (projected_point2.gp.y - projected_point.gp.y)**2 + (projected_point2.gp.x - projected_point.gp.x)**2
+            obj_width = (gp2.y - gp.y)**2 + (gp2.x - gp.x)**2
             obj_width = obj_width ** 0.5
             rospy.loginfo("[%s]Width of object: %f" % (self.name,obj_width))
             projection = ObstacleProjectedDetection()
-            projection.location = projected_point.gp
+            projection.location = gp
             projection.type = obstacle.type
 
-            dist = projected_point.gp.x**2 + projected_point.gp.y**2 + projected_point.gp.z**2
+            dist = gp.x**2 + gp.y**2 + gp.z**2
             dist = dist ** 0.5
 
             if dist<minDist:
@@ -75,16 +81,16 @@ class ObstacleSafetyNode:
             if dist<self.closeness_threshold:
                 # Trying not to falsely detect the lane lines as duckies that are too close
                 
-                if obstacle.type.type == ObstacleType.DUCKIE and projected_point.gp.y < 0.18:
-                    # rospy.loginfo("Duckie too close y: %f dist: %f" %(projected_point.gp.y, minDist))
+                if obstacle.type.type == ObstacleType.DUCKIE and gp.y < 0.18:
+                    # rospy.loginfo("Duckie too close y: %f dist: %f" %(gp.y, minDist))
                     too_close = True
-                elif obstacle.type.type == ObstacleType.CONE and obj_width<0.3: # and -0.0785< projected_point.gp.y < 0.18:
-                    # rospy.loginfo("Cone too close y: %f dist: %f" %(projected_point.gp.y, minDist))
+                elif obstacle.type.type == ObstacleType.CONE and obj_width<0.3: # and -0.0785< gp.y < 0.18:
+                    # rospy.loginfo("Cone too close y: %f dist: %f" %(gp.y, minDist))
                     too_close = True
             projection.distance = dist
             projection_list.list.append(projection)
             
-            #print projected_point.gp
+            #print gp
             marker.header = detections_msg.header
             marker.header.frame_id = self.veh_name
             marker.type = marker.ARROW
@@ -100,9 +106,9 @@ class ObstacleSafetyNode:
             marker.pose.orientation.y = -0.7071
             marker.pose.orientation.z = 0
             marker.pose.orientation.w = 0.7071
-            marker.pose.position.x = projected_point.gp.x
-            marker.pose.position.y = projected_point.gp.y
-            marker.pose.position.z = projected_point.gp.z 
+            marker.pose.position.x = gp.x
+            marker.pose.position.y = gp.y
+            marker.pose.position.z = gp.z 
             marker.id = count
             count = count +1
 